@@ -41,6 +41,8 @@ SCREENSHOTS_PATH = OUTPUT_PATH / "screenshots"
 # ── Reportes PDF y Correo (Fase 3) ────────────────────────
 REPORTS_PATH = OUTPUT_PATH / "reportes"
 JSON_DATOS_PATH = OUTPUT_PATH / "datos_procesados.json"
+# Metadata del JSON en un archivo aparte (lo lee /api/health sin parsear todo)
+JSON_META_FILENAME = "datos_meta.json"
 
 # Azure AD — para envío de correo vía Microsoft Graph
 AZURE_CLIENT_ID = os.getenv("AZURE_CLIENT_ID", "")
@@ -96,10 +98,20 @@ WEB_PORT = int(os.getenv("WEB_PORT", "5000"))
 WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
 TEMPLATES_PATH = PROJECT_ROOT / "templates"
 
+# Rate limit de correo compartido entre workers de gunicorn (SQLite).
+# Vacío = contador en memoria por proceso (desarrollo / tests)
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "")
+if RATE_LIMIT_DB_PATH:
+    RATE_LIMIT_DB_PATH = Path(RATE_LIMIT_DB_PATH)
+    if not RATE_LIMIT_DB_PATH.is_absolute():
+        RATE_LIMIT_DB_PATH = PROJECT_ROOT / RATE_LIMIT_DB_PATH
+
 # ── Moodle API (Fase 6) ───────────────────────────────────
 MOODLE_URL = os.getenv("MOODLE_URL", "")
 MOODLE_TOKEN = os.getenv("MOODLE_TOKEN", "")
 MOODLE_TIMEOUT = int(os.getenv("MOODLE_TIMEOUT", "30"))
+# Cursos consultados en paralelo por moodle_api_reader (llamadas I/O)
+MOODLE_MAX_WORKERS = int(os.getenv("MOODLE_MAX_WORKERS", "8"))
 MOODLE_CATEGORY_IDS = [int(x.strip()) for x in os.getenv(
     "MOODLE_CATEGORY_IDS", "3,6,10,11,14,16,17,18,19,20,24,27,28,29"
 ).split(",")]
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Recalcula los agregados denormalizados de facturas en la BD de cobranzas.
+
+monto_nc_cache y total_pagado_cache se mantienen con triggers; este script
+los reconstruye desde cero (p. ej. tras editar la BD a mano).
+"""
+
+import logging
+import sys
+from pathlib import Path
+
+# Agregar directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.cobranzas.models import DB_PATH, get_db, init_db, recalcular_agregados
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Asegura el esquema y recalcula los agregados de todas las facturas."""
+    init_db()
+    with get_db() as conn:
+        n = recalcular_agregados(conn)
+    logger.info("Agregados recalculados en %d facturas (%s)", n, DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -503,23 +503,31 @@ def listar_clientes(
     if order_by not in columnas_validas:
         order_by = "nombre"
 
-    total = conn.execute("SELECT COUNT(*) FROM clientes").fetchone()[0]
-
     sql_order = order_by if order_by == "nombre" else f"{order_by} DESC"
 
-    rows = conn.execute(
+    # El total sale de la misma consulta (COUNT(*) OVER ()): el GROUP BY con
+    # ORDER BY ya recorre todos los clientes antes de aplicar el LIMIT.
+    cursor = conn.execute(
         f"""SELECT c.*,
                    COUNT(d.id)                                         AS total_facturas,
                    COALESCE(SUM(d.monto_total), 0)                     AS total_facturado,
-                   COALESCE(SUM(d.saldo_pendiente), 0)                 AS total_pendiente
+                   COALESCE(SUM(d.saldo_pendiente), 0)                 AS total_pendiente,
+                   COUNT(*) OVER ()                                    AS total_filas
             FROM clientes c
             LEFT JOIN documentos_sii d ON c.id = d.cliente_id AND d.tipo_doc IN (33, 34)
             GROUP BY c.id
             ORDER BY {sql_order}
             LIMIT ? OFFSET ?""",
         (limit, offset),
-    ).fetchall()
+    )
+    rows = cursor.fetchall()
+    if rows:
+        total = rows[0]["total_filas"]
+    else:
+        # Página fuera de rango: no hay filas de donde leer el total
+        total = conn.execute("SELECT COUNT(*) FROM clientes").fetchone()[0] if offset else 0
+    columnas = [c[0] for c in cursor.description][:-1]   # sin total_filas
     return {
         "total": total,
-        "clientes": [dict(r) for r in rows],
+        "clientes": [dict(zip(columnas, r)) for r in rows],
     }
@@ -173,6 +173,7 @@ def aplicar_todas_ncs(
     conn: sqlite3.Connection,
     usuario: str = "sistema",
     ip: str = "",
+    only_ids: list[int] | None = None,
 ) -> dict:
     """
     Aplica TODAS las notas de crédito de la BD a sus facturas referenciadas.
@@ -181,6 +182,9 @@ def aplicar_todas_ncs(
     Es idempotente: las NCs ya aplicadas producen el mismo resultado final
     porque `recalcular_saldo` siempre suma todas las NC activas.
 
+    Con only_ids se aplican solo esas NC, en el orden dado (ver
+    `ncs_afectadas_desde` para las de una importación).
+
     Returns:
         {
             "aplicadas": int,
@@ -192,9 +196,14 @@ def aplicar_todas_ncs(
         }
     }
     """
-    ncs = conn.execute(
-        "SELECT id FROM documentos_sii WHERE tipo_doc = 61 ORDER BY fecha_docto"
-    ).fetchall()
+    if only_ids is None:
+        ncs = [
+            r["id"] for r in conn.execute(
+                "SELECT id FROM documentos_sii WHERE tipo_doc = 61 ORDER BY fecha_docto"
+            )
+        ]
+    else:
+        ncs = only_ids
 
     conteo = {
         "aplicadas": 0,
@@ -205,8 +214,8 @@ def aplicar_todas_ncs(
         "detalles": [],
     }
 
-    for row in ncs:
-        res = aplicar_nc(conn, row["id"], usuario=usuario, ip=ip)
+    for nc_id in ncs:
+        res = aplicar_nc(conn, nc_id, usuario=usuario, ip=ip)
         estado = res.get("resultado", "desconocido")
         if estado == "aplicada":
             conteo["aplicadas"] += 1
@@ -229,6 +238,29 @@ def aplicar_todas_ncs(
     return conteo
 
 
+def ncs_afectadas_desde(conn: sqlite3.Connection, id_desde: int) -> list[int]:
+    """
+    NC a aplicar tras insertar documentos con id > id_desde (ids AUTOINCREMENT,
+    crecientes): las NC nuevas y las ya existentes que referencian una factura
+    nueva (antes quedaban como "factura_no_encontrada"). Ordenadas por fecha.
+    """
+    rows = conn.execute(
+        """SELECT nc.id FROM documentos_sii nc
+           WHERE nc.tipo_doc = 61
+             AND (nc.id > :desde
+                  OR EXISTS (
+                      SELECT 1 FROM documentos_sii f
+                      WHERE f.id > :desde
+                        AND f.tipo_doc IN (33, 34)
+                        AND f.folio = nc.folio_referencia
+                        AND f.tipo_doc = nc.tipo_doc_referencia
+                  ))
+           ORDER BY nc.fecha_docto""",
+        {"desde": id_desde},
+    ).fetchall()
+    return [r["id"] for r in rows]
+
+
 # ── Consulta: NCs sin asociar ─────────────────────────────────────────────────
 
 def listar_ncs_sin_asociar(conn: sqlite3.Connection) -> list[dict]:
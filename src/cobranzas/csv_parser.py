@@ -15,7 +15,7 @@ Maneja:
 
 Uso:
     resultado = parsear_archivo(path_csv)
-    # resultado.documentos  → lista de dicts listos para insertar_documento()
+    # resultado.documentos  → lista de dicts listos para insertar_documentos()
     # resultado.errores     → lista de strings con filas problemáticas
     # resultado.periodo     → "2023-01"
     # resultado.duplicados  → int (filas omitidas por UNIQUE en la BD)
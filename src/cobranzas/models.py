@@ -7,10 +7,13 @@ Gestiona la base de datos SQLite con todas las tablas del sistema:
   - pagos: ingresos bancarios
   - pago_detalle: distribución de pagos entre facturas
   - log_auditoria: trazabilidad de todas las acciones
+  - importaciones: estado de las importaciones de CSV en segundo plano
 """
 
 import logging
+import os
 import sqlite3
+import threading
 from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
@@ -49,6 +52,9 @@ CREATE TABLE IF NOT EXISTS documentos_sii (
     curso               TEXT,
     estado              TEXT     NOT NULL DEFAULT 'Pendiente',
     saldo_pendiente     INTEGER  NOT NULL DEFAULT 0,
+    -- Agregados denormalizados, mantenidos por triggers (ver _TRIGGERS)
+    monto_nc_cache      INTEGER  NOT NULL DEFAULT 0,  -- Σ NC que referencian la factura
+    total_pagado_cache  INTEGER  NOT NULL DEFAULT 0,  -- Σ pago_detalle.monto_aplicado
     UNIQUE(tipo_doc, folio)
 );
 
@@ -57,6 +63,11 @@ CREATE INDEX IF NOT EXISTS idx_docs_periodo     ON documentos_sii(periodo_tribut
 CREATE INDEX IF NOT EXISTS idx_docs_rut         ON documentos_sii(rut_cliente);
 CREATE INDEX IF NOT EXISTS idx_docs_cliente     ON documentos_sii(cliente_id);
 CREATE INDEX IF NOT EXISTS idx_docs_fecha       ON documentos_sii(fecha_docto);
+-- Listado de facturas: filtro por tipo y orden (fecha, folio) descendente
+CREATE INDEX IF NOT EXISTS idx_docs_tipo_fecha  ON documentos_sii(tipo_doc, fecha_docto DESC, folio DESC);
+-- Suma de NC por factura referenciada (índice parcial, solo notas de crédito)
+CREATE INDEX IF NOT EXISTS idx_docs_nc_ref      ON documentos_sii(folio_referencia, tipo_doc_referencia)
+    WHERE tipo_doc = 61;
 
 -- ─── Clientes ────────────────────────────────────────────────────────────────
 CREATE TABLE IF NOT EXISTS clientes (
@@ -109,41 +120,300 @@ CREATE TABLE IF NOT EXISTS log_auditoria (
 
 CREATE INDEX IF NOT EXISTS idx_log_fecha   ON log_auditoria(fecha);
 CREATE INDEX IF NOT EXISTS idx_log_accion  ON log_auditoria(accion);
+
+-- ─── Importaciones en segundo plano ─────────────────────────────────────────
+-- Compartido entre workers de gunicorn: el POST encola en uno y el polling
+-- del estado puede llegar a otro.
+CREATE TABLE IF NOT EXISTS importaciones (
+    job_id    TEXT     PRIMARY KEY,
+    fecha     DATETIME NOT NULL,
+    usuario   TEXT,
+    estado    TEXT     NOT NULL,   -- "pending" | "done" | "error"
+    resultado TEXT,                -- resumen JSON cuando estado = "done"
+    error     TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_importaciones_fecha ON importaciones(fecha);
 """
 
 
+# Columnas agregadas después de la versión inicial del esquema: init_db() las
+# crea con ALTER TABLE en BDs existentes (nombre → definición).
+_COLUMNAS_AGREGADOS = {
+    "monto_nc_cache":     "INTEGER NOT NULL DEFAULT 0",
+    "total_pagado_cache": "INTEGER NOT NULL DEFAULT 0",
+}
+
+# Triggers que mantienen monto_nc_cache / total_pagado_cache al escribir.
+# Las eliminaciones en cascada (pagos → pago_detalle) también los disparan.
+_TRIGGERS = """
+-- NC nueva / eliminada: ajusta la factura referenciada
+CREATE TRIGGER IF NOT EXISTS trg_nc_insert
+AFTER INSERT ON documentos_sii WHEN NEW.tipo_doc = 61
+BEGIN
+    UPDATE documentos_sii SET monto_nc_cache = monto_nc_cache + NEW.monto_total
+    WHERE folio = NEW.folio_referencia AND tipo_doc = NEW.tipo_doc_referencia;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_nc_delete
+AFTER DELETE ON documentos_sii WHEN OLD.tipo_doc = 61
+BEGIN
+    UPDATE documentos_sii SET monto_nc_cache = monto_nc_cache - OLD.monto_total
+    WHERE folio = OLD.folio_referencia AND tipo_doc = OLD.tipo_doc_referencia;
+END;
+
+-- Factura importada después de sus NC (mismo lote, otro orden)
+CREATE TRIGGER IF NOT EXISTS trg_factura_insert
+AFTER INSERT ON documentos_sii WHEN NEW.tipo_doc IN (33, 34)
+BEGIN
+    UPDATE documentos_sii SET monto_nc_cache = (
+        SELECT COALESCE(SUM(monto_total), 0) FROM documentos_sii
+        WHERE tipo_doc = 61
+          AND folio_referencia = NEW.folio
+          AND tipo_doc_referencia = NEW.tipo_doc
+    )
+    WHERE id = NEW.id;
+END;
+
+-- Distribución de pagos
+CREATE TRIGGER IF NOT EXISTS trg_pago_detalle_insert
+AFTER INSERT ON pago_detalle
+BEGIN
+    UPDATE documentos_sii SET total_pagado_cache = total_pagado_cache + NEW.monto_aplicado
+    WHERE id = NEW.documento_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_pago_detalle_delete
+AFTER DELETE ON pago_detalle
+BEGIN
+    UPDATE documentos_sii SET total_pagado_cache = total_pagado_cache - OLD.monto_aplicado
+    WHERE id = OLD.documento_id;
+END;
+
+-- Índice de búsqueda de facturas (documentos_sii_fts, rowid = documentos_sii.id)
+CREATE TRIGGER IF NOT EXISTS trg_fts_factura_insert
+AFTER INSERT ON documentos_sii WHEN NEW.tipo_doc IN (33, 34)
+BEGIN
+    INSERT INTO documentos_sii_fts (rowid, folio, razon_social, cliente_nombre)
+    VALUES (NEW.id, NEW.folio, NEW.razon_social,
+            (SELECT nombre FROM clientes WHERE id = NEW.cliente_id));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_fts_factura_update
+AFTER UPDATE OF folio, razon_social, cliente_id ON documentos_sii
+WHEN NEW.tipo_doc IN (33, 34)
+BEGIN
+    UPDATE documentos_sii_fts SET
+        folio = NEW.folio,
+        razon_social = NEW.razon_social,
+        cliente_nombre = (SELECT nombre FROM clientes WHERE id = NEW.cliente_id)
+    WHERE rowid = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_fts_factura_delete
+AFTER DELETE ON documentos_sii WHEN OLD.tipo_doc IN (33, 34)
+BEGIN
+    DELETE FROM documentos_sii_fts WHERE rowid = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_fts_cliente_renombrado
+AFTER UPDATE OF nombre ON clientes
+BEGIN
+    UPDATE documentos_sii_fts SET cliente_nombre = NEW.nombre
+    WHERE rowid IN (SELECT id FROM documentos_sii WHERE cliente_id = NEW.id);
+END;
+"""
+
+# Búsqueda de texto en facturas: tabla FTS5 con su propio contenido (incluye el
+# nombre del cliente, que no está en documentos_sii). La mantienen _TRIGGERS.
+_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS documentos_sii_fts USING fts5(
+    folio, razon_social, cliente_nombre,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def reconstruir_indice_busqueda(conn: sqlite3.Connection) -> int:
+    """Regenera documentos_sii_fts desde cero. Retorna las facturas indexadas."""
+    conn.execute("DELETE FROM documentos_sii_fts")
+    cur = conn.execute(
+        """INSERT INTO documentos_sii_fts (rowid, folio, razon_social, cliente_nombre)
+           SELECT d.id, d.folio, d.razon_social, c.nombre
+           FROM documentos_sii d
+           LEFT JOIN clientes c ON d.cliente_id = c.id
+           WHERE d.tipo_doc IN (33, 34)"""
+    )
+    return cur.rowcount
+
+
+def recalcular_agregados(conn: sqlite3.Connection) -> int:
+    """
+    Recalcula monto_nc_cache y total_pagado_cache de todas las facturas.
+
+    Se usa como backfill al agregar las columnas y para reparar la BD si se
+    modificó por fuera de la aplicación. Retorna el número de facturas.
+    """
+    cur = conn.execute(
+        """UPDATE documentos_sii SET
+               monto_nc_cache = (
+                   SELECT COALESCE(SUM(nc.monto_total), 0) FROM documentos_sii nc
+                   WHERE nc.tipo_doc = 61
+                     AND nc.folio_referencia = documentos_sii.folio
+                     AND nc.tipo_doc_referencia = documentos_sii.tipo_doc
+               ),
+               total_pagado_cache = (
+                   SELECT COALESCE(SUM(pd.monto_aplicado), 0) FROM pago_detalle pd
+                   WHERE pd.documento_id = documentos_sii.id
+               )
+           WHERE tipo_doc IN (33, 34)"""
+    )
+    return cur.rowcount
+
+
 def init_db() -> None:
     """Crea la BD y todas las tablas si no existen. Idempotente."""
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
     with sqlite3.connect(DB_PATH) as conn:
         conn.executescript(_SCHEMA)
+        existentes = {
+            r[1] for r in conn.execute("PRAGMA table_info(documentos_sii)")
+        }
+        nuevas = [c for c in _COLUMNAS_AGREGADOS if c not in existentes]
+        for columna in nuevas:
+            conn.execute(
+                f"ALTER TABLE documentos_sii ADD COLUMN "
+                f"{columna} {_COLUMNAS_AGREGADOS[columna]}"
+            )
+        fts_nueva = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'documentos_sii_fts'"
+        ).fetchone() is None
+        conn.executescript(_FTS)
+        conn.executescript(_TRIGGERS)
+        if nuevas:
+            n = recalcular_agregados(conn)
+            logger.info("Agregados de cobranzas inicializados en %d facturas", n)
+        if fts_nueva:
+            n = reconstruir_indice_busqueda(conn)
+            logger.info("Índice de búsqueda de facturas creado (%d facturas)", n)
+        conn.commit()  # journal_mode no puede cambiar dentro de una transacción
+        # WAL es persistente en el archivo: basta activarlo una vez para que
+        # las lecturas concurrentes (get_db_lectura) no bloqueen a escritores.
+        conn.execute("PRAGMA journal_mode = WAL")
+        # Estadísticas para el planificador: ANALYZE completo solo la primera
+        # vez; después PRAGMA optimize, que re-analiza únicamente si hace falta.
+        tiene_stats = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        ).fetchone()
+        conn.execute("PRAGMA optimize" if tiene_stats else "ANALYZE")
         # Habilitar claves foráneas en esta conexión de inicialización
         conn.execute("PRAGMA foreign_keys = ON")
         conn.commit()
     logger.info("Base de datos de cobranzas inicializada: %s", DB_PATH)
 
 
+# Rutas de BD ya inicializadas en este proceso: evita repetir el DDL, los
+# backfills y ANALYZE/optimize si las rutas se registran más de una vez.
+_db_inicializadas: set[tuple[int, Path]] = set()
+_db_init_lock = threading.Lock()
+
+
+def init_db_una_vez() -> None:
+    """Ejecuta init_db() una sola vez por proceso y ruta de BD."""
+    clave = (os.getpid(), DB_PATH)
+    if clave in _db_inicializadas:
+        return
+    with _db_init_lock:
+        if clave in _db_inicializadas:
+            return
+        init_db()
+        _db_inicializadas.add(clave)
+
+
+# Conexiones reutilizadas por hilo (workers de gunicorn, pools de stats e
+# importación): se abren y configuran una vez en vez de en cada request.
+_local = threading.local()
+
+_PRAGMAS_CONEXION = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA journal_mode = WAL",        # WAL: mejor concurrencia con Flask
+    "PRAGMA synchronous = NORMAL",      # Seguro con WAL, menos fsync
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",     # 256 MiB: lecturas sin copiar al page cache
+    "PRAGMA cache_size = -16384",       # 16 MiB por conexión (hay una por hilo)
+)
+
+
+def _conexion_hilo(atributo: str, abrir):
+    """
+    Retorna la conexión de este hilo guardada en _local.<atributo>, abriéndola
+    con abrir() si no existe. Se reabre si cambió DB_PATH o el proceso (fork de
+    gunicorn): una conexión SQLite no debe cruzar un fork.
+    """
+    clave = (os.getpid(), DB_PATH)
+    actual = getattr(_local, atributo, None)
+    if actual is not None and actual[0] == clave:
+        return actual[1]
+    conn = abrir()
+    setattr(_local, atributo, (clave, conn))
+    return conn
+
+
+def _abrir_conexion() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row          # Filas accesibles por nombre de columna
+    for pragma in _PRAGMAS_CONEXION:
+        conn.execute(pragma)
+    return conn
+
+
+def _abrir_conexion_lectura() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        f"{DB_PATH.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA mmap_size = 268435456")
+    return conn
+
+
 @contextmanager
 def get_db():
     """
-    Context manager que entrega una conexión SQLite configurada.
+    Context manager que entrega la conexión SQLite de este hilo.
+
+    Al salir hace commit (o rollback si hubo excepción); la conexión no se
+    cierra y se reutiliza en el próximo uso desde el mismo hilo. Los usos
+    anidados comparten la transacción del más externo.
 
     Uso:
         with get_db() as conn:
             rows = conn.execute("SELECT ...").fetchall()
     """
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row          # Filas accesibles por nombre de columna
-    conn.execute("PRAGMA foreign_keys = ON")
-    conn.execute("PRAGMA journal_mode = WAL")  # WAL: mejor concurrencia con Flask
+    conn = _conexion_hilo("rw", _abrir_conexion)
+    profundidad = getattr(_local, "profundidad", 0)
+    _local.profundidad = profundidad + 1
     try:
         yield conn
-        conn.commit()
+        if profundidad == 0:
+            conn.commit()
     except Exception:
-        conn.rollback()
+        if profundidad == 0:
+            conn.rollback()
         raise
     finally:
-        conn.close()
+        _local.profundidad = profundidad
+
+
+@contextmanager
+def get_db_lectura():
+    """
+    Context manager con la conexión SQLite de solo lectura (mode=ro) del hilo.
+
+    Pensada para consultas de estadísticas que corren en paralelo desde
+    varios hilos: con WAL cada lectura ve su propio snapshot sin bloquear.
+    """
+    yield _conexion_hilo("ro", _abrir_conexion_lectura)
 
 
 # ── Tipos de documento ────────────────────────────────────────────────────────
@@ -159,6 +429,30 @@ TIPOS_RELEVANTES = frozenset(TIPOS_DOC.keys())
 
 # ── CRUD: documentos_sii ──────────────────────────────────────────────────────
 
+_SQL_INSERTAR_DOCUMENTO = """
+    INSERT OR IGNORE INTO documentos_sii (
+        tipo_doc, tipo_doc_nombre, tipo_venta,
+        rut_cliente, razon_social, folio,
+        fecha_docto, fecha_recepcion, fecha_acuse_recibo,
+        monto_exento, monto_neto, monto_iva, monto_total,
+        folio_referencia, tipo_doc_referencia,
+        periodo_tributario, archivo_origen, fecha_importacion,
+        estado, saldo_pendiente
+    ) VALUES (
+        :tipo_doc, :tipo_doc_nombre, :tipo_venta,
+        :rut_cliente, :razon_social, :folio,
+        :fecha_docto, :fecha_recepcion, :fecha_acuse_recibo,
+        :monto_exento, :monto_neto, :monto_iva, :monto_total,
+        :folio_referencia, :tipo_doc_referencia,
+        :periodo_tributario, :archivo_origen, :fecha_importacion,
+        :estado, :saldo_pendiente
+    )
+"""
+
+# Documentos por llamada a executemany en insertar_documentos()
+LOTE_INSERCION = 500
+
+
 def insertar_documento(conn: sqlite3.Connection, doc: dict) -> int | None:
     """
     Inserta un documento SII.
@@ -166,31 +460,28 @@ def insertar_documento(conn: sqlite3.Connection, doc: dict) -> int | None:
     Retorna el id del nuevo registro, o None si ya existía (UNIQUE constraint).
     Los montos se almacenan como INTEGER (pesos chilenos, sin decimales).
     """
-    sql = """
-        INSERT OR IGNORE INTO documentos_sii (
-            tipo_doc, tipo_doc_nombre, tipo_venta,
-            rut_cliente, razon_social, folio,
-            fecha_docto, fecha_recepcion, fecha_acuse_recibo,
-            monto_exento, monto_neto, monto_iva, monto_total,
-            folio_referencia, tipo_doc_referencia,
-            periodo_tributario, archivo_origen, fecha_importacion,
-            estado, saldo_pendiente
-        ) VALUES (
-            :tipo_doc, :tipo_doc_nombre, :tipo_venta,
-            :rut_cliente, :razon_social, :folio,
-            :fecha_docto, :fecha_recepcion, :fecha_acuse_recibo,
-            :monto_exento, :monto_neto, :monto_iva, :monto_total,
-            :folio_referencia, :tipo_doc_referencia,
-            :periodo_tributario, :archivo_origen, :fecha_importacion,
-            :estado, :saldo_pendiente
-        )
-    """
-    cursor = conn.execute(sql, doc)
+    cursor = conn.execute(_SQL_INSERTAR_DOCUMENTO, doc)
     if cursor.lastrowid and cursor.rowcount > 0:
         return cursor.lastrowid
     return None
 
 
+def insertar_documentos(conn: sqlite3.Connection, docs: list[dict]) -> int:
+    """
+    Inserta documentos SII en lotes de LOTE_INSERCION con executemany.
+
+    Los duplicados (UNIQUE tipo_doc + folio) se omiten en silencio.
+    Retorna cuántos documentos se insertaron efectivamente.
+    """
+    insertados = 0
+    for i in range(0, len(docs), LOTE_INSERCION):
+        cursor = conn.executemany(
+            _SQL_INSERTAR_DOCUMENTO, docs[i:i + LOTE_INSERCION]
+        )
+        insertados += cursor.rowcount
+    return insertados
+
+
 def buscar_factura_por_folio(
     conn: sqlite3.Connection, folio: int, tipo_doc: int | None = None
 ) -> sqlite3.Row | None:
@@ -328,3 +619,46 @@ def registrar_auditoria(
         "INSERT INTO log_auditoria (fecha, usuario, accion, detalle, ip) VALUES (?, ?, ?, ?, ?)",
         (datetime.now(timezone.utc).isoformat(), usuario, accion, detalle, ip),
     )
+
+
+# ── CRUD: importaciones ───────────────────────────────────────────────────────
+
+def crear_importacion(
+    conn: sqlite3.Connection,
+    job_id: str,
+    usuario: str,
+    conservar: int = 50,
+) -> None:
+    """Registra una importación pendiente y descarta las más antiguas que
+    las ``conservar`` más recientes."""
+    conn.execute(
+        "INSERT INTO importaciones (job_id, fecha, usuario, estado) VALUES (?, ?, ?, 'pending')",
+        (job_id, datetime.now(timezone.utc).isoformat(), usuario),
+    )
+    conn.execute(
+        """DELETE FROM importaciones WHERE job_id NOT IN (
+               SELECT job_id FROM importaciones ORDER BY fecha DESC LIMIT ?)""",
+        (conservar,),
+    )
+
+
+def finalizar_importacion(
+    conn: sqlite3.Connection,
+    job_id: str,
+    resultado: str | None = None,
+    error: str | None = None,
+) -> None:
+    """Marca una importación como terminada ("done") o fallida ("error" si
+    se pasa ``error``). ``resultado`` es el resumen ya serializado a JSON."""
+    conn.execute(
+        "UPDATE importaciones SET estado = ?, resultado = ?, error = ? WHERE job_id = ?",
+        ("error" if error is not None else "done", resultado, error, job_id),
+    )
+
+
+def obtener_importacion(conn: sqlite3.Connection, job_id: str) -> sqlite3.Row | None:
+    """Retorna estado, resultado y error de una importación, o None."""
+    return conn.execute(
+        "SELECT estado, resultado, error FROM importaciones WHERE job_id = ?",
+        (job_id,),
+    ).fetchone()
@@ -319,27 +319,44 @@ def listar_pagos(
     conn: sqlite3.Connection,
     limit: int = 50,
     offset: int = 0,
+    columnar: bool = False,
 ) -> dict:
     """
     Lista pagos paginados, ordenados por fecha descendente.
 
     Returns:
-        {"total": int, "pagos": list[dict]}
+        {"total": int, "pagos": list[dict]}, o con columnar=True
+        {"total": int, "columns": list[str], "data": list[tuple]}
     """
-    total = conn.execute("SELECT COUNT(*) FROM pagos").fetchone()[0]
-    rows = conn.execute(
+    # El GROUP BY + ORDER BY ya materializa todos los pagos: el total sale de
+    # la misma pasada con COUNT(*) OVER () en vez de un COUNT aparte.
+    cursor = conn.execute(
         """SELECT p.*,
-                  COUNT(pd.id) AS num_facturas
+                  COUNT(pd.id) AS num_facturas,
+                  COUNT(*) OVER () AS total_filas
            FROM pagos p
            LEFT JOIN pago_detalle pd ON p.id = pd.pago_id
            GROUP BY p.id
            ORDER BY p.fecha_pago DESC, p.id DESC
            LIMIT ? OFFSET ?""",
         (limit, offset),
-    ).fetchall()
+    )
+    rows = cursor.fetchall()
+    if rows:
+        total = rows[0]["total_filas"]
+    else:
+        # Página fuera de rango: no hay filas de donde leer el total
+        total = conn.execute("SELECT COUNT(*) FROM pagos").fetchone()[0] if offset else 0
+    columnas = [c[0] for c in cursor.description][:-1]   # sin total_filas
+    if columnar:
+        return {
+            "total": total,
+            "columns": columnas,
+            "data": [tuple(r)[:-1] for r in rows],
+        }
     return {
         "total": total,
-        "pagos": [dict(r) for r in rows],
+        "pagos": [dict(zip(columnas, r)) for r in rows],
     }
 
 
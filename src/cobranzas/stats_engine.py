@@ -24,12 +24,19 @@ from config import settings
 logger = logging.getLogger(__name__)
 
 ANIO_CORTE = settings.ANIO_CORTE_GESTION
+# Filtro "2026+" como comparación directa sobre fecha_docto (ISO), que puede
+# usar idx_docs_fecha; strftime('%Y', ...) obligaba a evaluar cada fila.
+FECHA_CORTE = f"{ANIO_CORTE}-01-01"
 
 
 # ─── Helpers ──────────────────────────────────────────────────────────────────
 
 def _rows_to_list(rows) -> list[dict]:
-    return [dict(r) for r in rows]
+    """Convierte filas sqlite3.Row a dicts leyendo los nombres de columna una sola vez."""
+    if not rows:
+        return []
+    columnas = rows[0].keys()
+    return [dict(zip(columnas, r)) for r in rows]
 
 
 def _safe_pct(numerador: int, denominador: int) -> float:
@@ -126,7 +133,7 @@ def resumen_historico(conn: sqlite3.Connection) -> dict:
            ORDER BY periodo"""
     ).fetchall()
 
-    por_mes = [dict(r) for r in por_mes_rows]
+    por_mes = _rows_to_list(por_mes_rows)
 
     total_hist = sum(a["monto_bruto"] for a in por_anio)
     total_nc   = sum(a["monto_nc"]    for a in por_anio)
@@ -221,7 +228,7 @@ def kpis_cobranza(conn: sqlite3.Connection) -> dict:
             "monto_nc_aplicado": int,
         }
     """
-    anio_str = str(ANIO_CORTE)
+    desde = FECHA_CORTE
 
     row = conn.execute(
         """SELECT
@@ -234,8 +241,8 @@ def kpis_cobranza(conn: sqlite3.Connection) -> dict:
                COALESCE(SUM(CASE WHEN estado = 'Anulada'   THEN 1 ELSE 0 END), 0) AS num_anuladas
            FROM documentos_sii
            WHERE tipo_doc IN (33, 34)
-             AND strftime('%Y', fecha_docto) >= ?""",
-        (anio_str,),
+             AND fecha_docto >= ?""",
+        (desde,),
     ).fetchone()
 
     total_facturado = row["total_facturado"]
@@ -247,8 +254,8 @@ def kpis_cobranza(conn: sqlite3.Connection) -> dict:
         """SELECT COALESCE(SUM(monto_total), 0)
            FROM documentos_sii
            WHERE tipo_doc = 61
-             AND strftime('%Y', fecha_docto) >= ?""",
-        (anio_str,),
+             AND fecha_docto >= ?""",
+        (desde,),
     ).fetchone()[0]
 
     # Días promedio de cobro (facturas ya pagadas)
@@ -261,10 +268,10 @@ def kpis_cobranza(conn: sqlite3.Connection) -> dict:
                JOIN pagos p         ON pd.pago_id      = p.id
                WHERE d.estado = 'Pagada'
                  AND d.tipo_doc IN (33, 34)
-                 AND strftime('%Y', d.fecha_docto) >= ?
+                 AND d.fecha_docto >= ?
                GROUP BY d.id
            )""",
-        (anio_str,),
+        (desde,),
     ).fetchone()[0]
 
     return {
@@ -289,14 +296,14 @@ def distribucion_estados(conn: sqlite3.Connection) -> list[dict]:
     Returns:
         [{"estado": "Pendiente", "cantidad": 5, "monto": 12000000}, ...]
     """
-    anio_str = str(ANIO_CORTE)
+    desde = FECHA_CORTE
     rows = conn.execute(
         """SELECT estado,
                   COUNT(*)                   AS cantidad,
                   COALESCE(SUM(monto_total), 0) AS monto
            FROM documentos_sii
            WHERE tipo_doc IN (33, 34)
-             AND strftime('%Y', fecha_docto) >= ?
+             AND fecha_docto >= ?
            GROUP BY estado
            ORDER BY CASE estado
                WHEN 'Pendiente' THEN 1
@@ -304,7 +311,7 @@ def distribucion_estados(conn: sqlite3.Connection) -> list[dict]:
                WHEN 'Pagada'    THEN 3
                WHEN 'Anulada'   THEN 4
                ELSE 5 END""",
-        (anio_str,),
+        (desde,),
     ).fetchall()
     return _rows_to_list(rows)
 
@@ -317,7 +324,7 @@ def cobranza_mensual(conn: sqlite3.Connection) -> list[dict]:
         [{"periodo": "2026-01", "facturado": 15000000, "cobrado": 8000000,
           "pendiente": 7000000}, ...]
     """
-    anio_str = str(ANIO_CORTE)
+    desde = FECHA_CORTE
 
     # Facturado por mes
     fact_rows = conn.execute(
@@ -326,10 +333,10 @@ def cobranza_mensual(conn: sqlite3.Connection) -> list[dict]:
                   COALESCE(SUM(saldo_pendiente), 0) AS pendiente
            FROM documentos_sii
            WHERE tipo_doc IN (33, 34)
-             AND strftime('%Y', fecha_docto) >= ?
+             AND fecha_docto >= ?
            GROUP BY periodo
            ORDER BY periodo""",
-        (anio_str,),
+        (desde,),
     ).fetchall()
 
     # Cobrado por mes de la FACTURA (no del pago) — permite comparar
@@ -339,10 +346,10 @@ def cobranza_mensual(conn: sqlite3.Connection) -> list[dict]:
                   COALESCE(SUM(pd.monto_aplicado), 0) AS cobrado
            FROM pago_detalle pd
            JOIN documentos_sii d ON pd.documento_id = d.id
-           WHERE strftime('%Y', d.fecha_docto) >= ?
+           WHERE d.fecha_docto >= ?
            GROUP BY periodo
            ORDER BY periodo""",
-        (anio_str,),
+        (desde,),
     ).fetchall()
     cobrado_map = {r["periodo"]: r["cobrado"] for r in cobrado_rows}
 
@@ -366,7 +373,7 @@ def top_otics_pendientes(conn: sqlite3.Connection, limite: int = 5) -> list[dict
         [{"rut_cliente": ..., "razon_social": ..., "saldo_pendiente": ...,
           "num_facturas_pendientes": ...}, ...]
     """
-    anio_str = str(ANIO_CORTE)
+    desde = FECHA_CORTE
     rows = conn.execute(
         """SELECT rut_cliente, razon_social,
                   COUNT(*)                        AS num_facturas_pendientes,
@@ -374,11 +381,11 @@ def top_otics_pendientes(conn: sqlite3.Connection, limite: int = 5) -> list[dict
            FROM documentos_sii
            WHERE tipo_doc IN (33, 34)
              AND estado IN ('Pendiente', 'Parcial')
-             AND strftime('%Y', fecha_docto) >= ?
+             AND fecha_docto >= ?
            GROUP BY rut_cliente
            ORDER BY saldo_total_pendiente DESC
            LIMIT ?""",
-        (anio_str, limite),
+        (desde, limite),
     ).fetchall()
     return _rows_to_list(rows)
 
@@ -398,20 +405,29 @@ def alertas_vencimiento(conn: sqlite3.Connection) -> dict:
             "total_critico":  int,   # Monto total > 90 días
         }
     """
-    anio_str = str(ANIO_CORTE)
+    desde = FECHA_CORTE
+    # El tramo de antigüedad se calcula en SQL: cada fila llega lista como
+    # item (mismas claves que la respuesta) más su tramo.
     rows = conn.execute(
-        """SELECT
-               d.id, d.folio, d.razon_social, d.fecha_docto,
-               d.monto_total, d.saldo_pendiente, d.estado,
-               c.nombre AS cliente_nombre,
-               CAST(julianday('now') - julianday(d.fecha_docto) AS INTEGER) AS dias_transcurridos
-           FROM documentos_sii d
-           LEFT JOIN clientes c ON d.cliente_id = c.id
-           WHERE d.tipo_doc IN (33, 34)
-             AND d.estado IN ('Pendiente', 'Parcial')
-             AND strftime('%Y', d.fecha_docto) >= ?
-           ORDER BY dias_transcurridos DESC""",
-        (anio_str,),
+        """SELECT id, folio, razon_social, cliente_nombre, fecha_docto,
+                  monto_total, saldo_pendiente, estado, dias,
+                  CASE WHEN dias > 90 THEN 'mas_de_90_dias'
+                       WHEN dias > 60 THEN 'entre_60_90'
+                       WHEN dias > 30 THEN 'entre_30_60'
+                       ELSE 'menos_de_30' END AS tramo
+           FROM (
+               SELECT d.id, d.folio, d.razon_social, c.nombre AS cliente_nombre,
+                      d.fecha_docto, d.monto_total, d.saldo_pendiente, d.estado,
+                      COALESCE(CAST(julianday('now') - julianday(d.fecha_docto)
+                                    AS INTEGER), 0) AS dias
+               FROM documentos_sii d
+               LEFT JOIN clientes c ON d.cliente_id = c.id
+               WHERE d.tipo_doc IN (33, 34)
+                 AND d.estado IN ('Pendiente', 'Parcial')
+                 AND d.fecha_docto >= ?
+           )
+           ORDER BY dias DESC""",
+        (desde,),
     ).fetchall()
 
     buckets: dict[str, list[dict]] = {
@@ -422,26 +438,8 @@ def alertas_vencimiento(conn: sqlite3.Connection) -> dict:
     }
 
     for r in rows:
-        dias = r["dias_transcurridos"] or 0
-        item = {
-            "id":              r["id"],
-            "folio":           r["folio"],
-            "razon_social":    r["razon_social"],
-            "cliente_nombre":  r["cliente_nombre"],
-            "fecha_docto":     r["fecha_docto"],
-            "monto_total":     r["monto_total"],
-            "saldo_pendiente": r["saldo_pendiente"],
-            "estado":          r["estado"],
-            "dias":            dias,
-        }
-        if dias > 90:
-            buckets["mas_de_90_dias"].append(item)
-        elif dias > 60:
-            buckets["entre_60_90"].append(item)
-        elif dias > 30:
-            buckets["entre_30_60"].append(item)
-        else:
-            buckets["menos_de_30"].append(item)
+        item = dict(r)
+        buckets[item.pop("tramo")].append(item)
 
     total_critico = sum(
         item["saldo_pendiente"] for item in buckets["mas_de_90_dias"]
@@ -461,7 +459,7 @@ def top_clientes(conn: sqlite3.Connection, limite: int = 10) -> list[dict]:
         [{"cliente_id": ..., "nombre": ..., "total_facturado": ...,
           "total_cobrado": ..., "total_pendiente": ..., "num_facturas": ...}, ...]
     """
-    anio_str = str(ANIO_CORTE)
+    desde = FECHA_CORTE
     rows = conn.execute(
         """SELECT
                c.id   AS cliente_id,
@@ -472,11 +470,11 @@ def top_clientes(conn: sqlite3.Connection, limite: int = 10) -> list[dict]:
            FROM clientes c
            JOIN documentos_sii d ON c.id = d.cliente_id
            WHERE d.tipo_doc IN (33, 34)
-             AND strftime('%Y', d.fecha_docto) >= ?
+             AND d.fecha_docto >= ?
            GROUP BY c.id
            ORDER BY total_facturado DESC
            LIMIT ?""",
-        (anio_str, limite),
+        (desde, limite),
     ).fetchall()
 
     result = []
@@ -503,7 +501,7 @@ def top_cursos(conn: sqlite3.Connection, limite: int = 10) -> list[dict]:
         [{"curso": ..., "total_facturado": ..., "num_facturas": ...,
           "num_clientes_distintos": ...}, ...]
     """
-    anio_str = str(ANIO_CORTE)
+    desde = FECHA_CORTE
     rows = conn.execute(
         """SELECT
                curso,
@@ -514,11 +512,11 @@ def top_cursos(conn: sqlite3.Connection, limite: int = 10) -> list[dict]:
            WHERE tipo_doc IN (33, 34)
              AND curso IS NOT NULL
              AND curso != ''
-             AND strftime('%Y', fecha_docto) >= ?
+             AND fecha_docto >= ?
            GROUP BY curso
            ORDER BY total_facturado DESC
            LIMIT ?""",
-        (anio_str, limite),
+        (desde, limite),
     ).fetchall()
     return _rows_to_list(rows)
 
@@ -538,7 +536,7 @@ def facturacion_por_cliente_detalle(
             "facturas": [dict, ...],
         }
     """
-    anio_str = str(ANIO_CORTE)
+    desde = FECHA_CORTE
 
     cliente = conn.execute(
         "SELECT * FROM clientes WHERE id = ?", (cliente_id,)
@@ -553,9 +551,9 @@ def facturacion_por_cliente_detalle(
                COALESCE(SUM(monto_total) - SUM(saldo_pendiente), 0) AS cobrado
            FROM documentos_sii
            WHERE cliente_id = ? AND tipo_doc IN (33, 34)
-             AND strftime('%Y', fecha_docto) >= ?
+             AND fecha_docto >= ?
            GROUP BY periodo ORDER BY periodo""",
-        (cliente_id, anio_str),
+        (cliente_id, desde),
     ).fetchall()
 
     por_curso = conn.execute(
@@ -566,9 +564,9 @@ def facturacion_por_cliente_detalle(
                COUNT(*)                          AS num_facturas
            FROM documentos_sii
            WHERE cliente_id = ? AND tipo_doc IN (33, 34)
-             AND strftime('%Y', fecha_docto) >= ?
+             AND fecha_docto >= ?
            GROUP BY curso ORDER BY facturado DESC""",
-        (cliente_id, anio_str),
+        (cliente_id, desde),
     ).fetchall()
 
     facturas = conn.execute(
@@ -583,9 +581,9 @@ def facturacion_por_cliente_detalle(
            ) nc_agg ON nc_agg.folio_referencia = d.folio
                    AND nc_agg.tipo_doc_referencia = d.tipo_doc
            WHERE d.cliente_id = ? AND d.tipo_doc IN (33, 34)
-             AND strftime('%Y', d.fecha_docto) >= ?
-           ORDER BY d.fecha_docto DESC""",
-        (cliente_id, anio_str),
+             AND d.fecha_docto >= ?
+           ORDER BY d.fecha_docto DESC, d.folio DESC""",
+        (cliente_id, desde),
     ).fetchall()
 
     return {
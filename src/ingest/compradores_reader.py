@@ -1,6 +1,5 @@
 """Lee compradores desde JSON o Excel (fallback)."""
 
-import json
 import logging
 from pathlib import Path
 
@@ -22,21 +21,44 @@ _COL_MAP = {
 }
 
 
+def _es_columna_mapeada(col):
+    """True si la columna del Excel tiene nombre interno en ``_COL_MAP``."""
+    return str(col).strip().lower() in _COL_MAP
+
+
+def _leer_excel_compradores(path):
+    """Lee la hoja "Compradores" con solo las columnas de ``_COL_MAP``.
+
+    ``usecols`` evita convertir las columnas que no se usan (notas, fechas,
+    etc.) y las renombra a sus nombres internos.
+    """
+    df = pd.read_excel(
+        path,
+        sheet_name="Compradores",
+        dtype=str,
+        engine="openpyxl",
+        usecols=_es_columna_mapeada,
+    )
+    return df.rename(columns=lambda col: _COL_MAP[str(col).strip().lower()])
+
+
 def _leer_desde_json():
     """Lee coordinadores (usuarios con rol=comprador) desde usuarios.json.
 
+    Pasa por user_manager para incluir también los cambios del log
+    usuarios.jsonl que aún no se compactan en usuarios.json.
+
     Returns
     -------
     pd.DataFrame | None
         DataFrame con coordinadores, o None si no existe o está vacío
     """
-    json_path = settings.USUARIOS_PATH
-    if not json_path.exists():
-        return None
+    # Import diferido: user_manager arrastra el módulo web (auth)
+    from src.web import user_manager
 
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        # Solo lectura: sin copia del caché de user_manager
+        data = user_manager._load_users_indexed(copy_result=False)[0]
 
         usuarios = data.get("usuarios", [])
         # Filtrar solo compradores (coordinadores)
@@ -123,18 +145,9 @@ def leer_compradores(path=None):
 
     logger.info("Leyendo compradores desde %s", path)
 
-    df = pd.read_excel(path, sheet_name="Compradores", dtype=str, engine="openpyxl")
+    df = _leer_excel_compradores(path)
     logger.info("Compradores: %d filas leídas", len(df))
 
-    # Normalizar nombres de columnas para mapear
-    col_rename = {}
-    for col in df.columns:
-        key = col.strip().lower()
-        if key in _COL_MAP:
-            col_rename[col] = _COL_MAP[key]
-
-    df = df.rename(columns=col_rename)
-
     # Asegurar columnas requeridas existan
     for col in ["id_curso_moodle", "comprador_nombre", "empresa", "email_comprador"]:
         if col not in df.columns:
@@ -181,15 +194,7 @@ def validar_emails_compradores(path=None):
         logger.debug("Archivo compradores no encontrado para validación: %s", path)
         return []
 
-    df = pd.read_excel(path, sheet_name="Compradores", dtype=str, engine="openpyxl")
-
-    # Normalizar nombres de columnas
-    col_rename = {}
-    for col in df.columns:
-        key = col.strip().lower()
-        if key in _COL_MAP:
-            col_rename[col] = _COL_MAP[key]
-    df = df.rename(columns=col_rename)
+    df = _leer_excel_compradores(path)
 
     for col in ["id_curso_moodle", "email_comprador"]:
         if col not in df.columns:
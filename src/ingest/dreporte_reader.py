@@ -1,6 +1,7 @@
 """Lee Dreporte.csv (participantes y progreso)."""
 
 import logging
+import os
 
 import pandas as pd
 
@@ -31,15 +32,18 @@ def leer_dreporte(path=None):
     logger.info("Dreporte: %d filas leídas", len(df))
 
     # ── Filtros ────────────────────────────────────────────
-    # Excluir suspendidos
-    df = df[df["Estado"].str.strip().str.lower() != "suspendido"].copy()
-
-    # Solo estudiantes
-    df = df[df["Rol"].str.strip().str.lower() == "estudiante"].copy()
-
-    # Excluir sin nombre
-    df = df[df["Nombre completo Participante"].notna()].copy()
-    df = df[df["Nombre completo Participante"].str.strip() != ""].copy()
+    # Una sola máscara combinada: se filtra y copia el DataFrame una vez
+    nombre = df["Nombre completo Participante"]
+    mask = (
+        # Excluir suspendidos
+        (df["Estado"].str.strip().str.lower() != "suspendido")
+        # Solo estudiantes
+        & (df["Rol"].str.strip().str.lower() == "estudiante")
+        # Excluir sin nombre
+        & nombre.notna()
+        & (nombre.str.strip() != "")
+    )
+    df = df[mask].copy()
 
     logger.info("Dreporte tras filtros: %d filas", len(df))
 
@@ -113,9 +117,17 @@ def leer_dreporte(path=None):
 def _buscar_archivo(prefijo):
     """Busca el primer CSV cuyo nombre empiece con *prefijo* en DATA_INPUT_PATH."""
     carpeta = settings.DATA_INPUT_PATH
-    for f in sorted(carpeta.iterdir()):
-        if f.name.lower().startswith(prefijo.lower()) and f.suffix.lower() == ".csv":
-            return f
+    prefijo = prefijo.lower()
+    # scandir entrega nombre y tipo sin construir ni ordenar un Path por
+    # archivo; se elige el menor nombre, igual que el orden alfabético.
+    with os.scandir(carpeta) as it:
+        candidatos = [
+            e.name for e in it
+            if e.is_file() and e.name.lower().startswith(prefijo)
+            and e.name.lower().endswith(".csv")
+        ]
+    if candidatos:
+        return carpeta / min(candidatos)
     raise FileNotFoundError(
         f"No se encontró CSV con prefijo '{prefijo}' en {carpeta}"
     )
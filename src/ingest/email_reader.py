@@ -90,18 +90,22 @@ def descargar_adjuntos_moodle():
             mail.logout()
             return resultado
 
+        # Obtener todos los emails en un solo FETCH (un round-trip IMAP)
+        status, msg_data = mail.fetch(b",".join(email_ids), "(RFC822)")
+        raw_por_id = _mensajes_por_id(msg_data) if status == "OK" else {}
+
         # Procesar cada email
         archivos_encontrados = {"Greporte.csv": False, "Dreporte.csv": False}
+        procesados = []
 
         for email_id in email_ids:
-            # Obtener email
-            status, msg_data = mail.fetch(email_id, "(RFC822)")
-            if status != "OK":
+            raw = raw_por_id.get(email_id)
+            if raw is None:
                 logger.warning("Error obteniendo email ID %s", email_id)
                 continue
 
             # Parsear email
-            msg = email.message_from_bytes(msg_data[0][1])
+            msg = email.message_from_bytes(raw)
 
             # Obtener asunto (decodificar si está en formato MIME)
             subject_header = msg.get("Subject", "")
@@ -156,10 +160,13 @@ def descargar_adjuntos_moodle():
                                 logger.error("Error guardando %s: %s", tipo_archivo, e)
                                 resultado["errores"].append(str(e))
 
-            # Marcar como leído
-            mail.store(email_id, "+FLAGS", "\\Seen")
+            procesados.append(email_id)
             resultado["emails_procesados"] += 1
 
+        # Marcar como leídos en un solo STORE
+        if procesados:
+            mail.store(b",".join(procesados), "+FLAGS", "\\Seen")
+
         # Cerrar conexión
         mail.logout()
 
@@ -186,6 +193,19 @@ def descargar_adjuntos_moodle():
         raise RuntimeError(f"Error procesando emails: {e}")
 
 
+def _mensajes_por_id(fetch_data):
+    """Mapea id de mensaje → bytes RFC822 desde la respuesta de un FETCH múltiple.
+
+    imaplib retorna tuplas ``(b'<id> (RFC822 {n}', contenido)`` intercaladas
+    con ``b')'``; el id es el primer token de la cabecera de cada tupla.
+    """
+    mensajes = {}
+    for item in fetch_data:
+        if isinstance(item, tuple) and len(item) >= 2:
+            mensajes[item[0].split(None, 1)[0]] = item[1]
+    return mensajes
+
+
 def _decodificar_header(header_value):
     """Decodifica un header de email que puede estar en formato MIME.
 
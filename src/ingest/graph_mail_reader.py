@@ -12,6 +12,7 @@ from pathlib import Path
 import requests
 
 from config import settings
+from src.reports.email_sender import obtener_token_azure
 
 logger = logging.getLogger(__name__)
 
@@ -26,9 +27,10 @@ EXPECTED_SENDER = "noreply@virtual.institutotecnipro.cl"
 SEARCH_WINDOW_HOURS = 48
 
 # URLs de Graph API
-GRAPH_TOKEN_URL = "https://login.microsoftonline.com/{tenant}/oauth2/v2.0/token"
 GRAPH_MESSAGES_URL = "https://graph.microsoft.com/v1.0/users/{mailbox}/messages"
 GRAPH_ATTACHMENTS_URL = "https://graph.microsoft.com/v1.0/users/{mailbox}/messages/{message_id}/attachments"
+GRAPH_BATCH_URL = "https://graph.microsoft.com/v1.0/$batch"
+GRAPH_BATCH_MAX = 20  # límite de sub-requests por llamada a $batch
 
 
 class GraphMailReader:
@@ -40,6 +42,9 @@ class GraphMailReader:
         self.client_id = settings.AZURE_CLIENT_ID
         self.client_secret = settings.AZURE_CLIENT_SECRET
         self.token = None
+        # Una sola sesión HTTP: búsqueda, adjuntos y marcado reutilizan la
+        # conexión TLS a graph.microsoft.com
+        self.session = requests.Session()
 
         if not all([self.tenant_id, self.client_id, self.client_secret]):
             raise RuntimeError(
@@ -48,35 +53,14 @@ class GraphMailReader:
             )
 
     def authenticate(self):
-        """Obtiene access token via client_credentials."""
-        url = GRAPH_TOKEN_URL.format(tenant=self.tenant_id)
-        data = {
-            "client_id": self.client_id,
-            "client_secret": self.client_secret,
-            "scope": "https://graph.microsoft.com/.default",
-            "grant_type": "client_credentials",
-        }
-
+        """Obtiene access token via client_credentials (cacheado en el proceso)."""
         try:
-            resp = requests.post(url, data=data, timeout=30)
-            if resp.status_code != 200:
-                error_body = resp.json() if resp.headers.get("content-type", "").startswith("application/json") else resp.text
-                error_desc = ""
-                if isinstance(error_body, dict):
-                    error_desc = error_body.get("error_description", error_body.get("error", ""))
-                raise RuntimeError(
-                    f"Error obteniendo token Azure (HTTP {resp.status_code}): {error_desc}"
-                )
-
-            self.token = resp.json().get("access_token")
-            if not self.token:
-                raise RuntimeError("Respuesta de Azure no contiene access_token")
-
+            self.token = obtener_token_azure()
             logger.info("✅ Autenticación Graph API exitosa")
             return True
 
         except Exception as e:
-            logger.error(f"❌ Error en autenticación: {e}")
+            logger.error("❌ Error en autenticación: %s", e)
             return False
 
     def _headers(self):
@@ -128,13 +112,13 @@ class GraphMailReader:
         )
 
         try:
-            resp = requests.get(url, headers=self._headers(), timeout=30)
+            resp = self.session.get(url, headers=self._headers(), timeout=30)
             if resp.status_code != 200:
-                logger.error(f"❌ Error buscando correos: {resp.status_code} - {resp.text}")
+                logger.error("❌ Error buscando correos: %s - %s", resp.status_code, resp.text)
                 return []
 
             messages = resp.json().get("value", [])
-            logger.info(f"📧 {len(messages)} correos encontrados con filtros iniciales")
+            logger.info("📧 %d correos encontrados con filtros iniciales", len(messages))
 
             # Filtro adicional por remitente
             if EXPECTED_SENDER:
@@ -144,14 +128,14 @@ class GraphMailReader:
                     if EXPECTED_SENDER.lower() in sender_email:
                         filtered.append(msg)
                     else:
-                        logger.debug(f"Descartado por remitente: {sender_email} - {msg['subject']}")
+                        logger.debug("Descartado por remitente: %s - %s", sender_email, msg["subject"])
                 messages = filtered
-                logger.info(f"📧 {len(messages)} correos después de filtro por remitente")
+                logger.info("📧 %d correos después de filtro por remitente", len(messages))
 
             return messages
 
         except Exception as e:
-            logger.error(f"❌ Excepción buscando correos: {e}")
+            logger.error("❌ Excepción buscando correos: %s", e)
             return []
 
     def download_csv_attachments(self, message_id, subject):
@@ -172,9 +156,9 @@ class GraphMailReader:
         url = GRAPH_ATTACHMENTS_URL.format(mailbox=TARGET_MAILBOX, message_id=message_id)
 
         try:
-            resp = requests.get(url, headers=self._headers(), timeout=30)
+            resp = self.session.get(url, headers=self._headers(), timeout=30)
             if resp.status_code != 200:
-                logger.error(f"❌ Error obteniendo adjuntos: {resp.status_code}")
+                logger.error("❌ Error obteniendo adjuntos: %s", resp.status_code)
                 return []
 
             attachments = resp.json().get("value", [])
@@ -186,7 +170,7 @@ class GraphMailReader:
 
                 # Solo descargar CSVs
                 if not (filename.lower().endswith(".csv") or "csv" in content_type.lower()):
-                    logger.debug(f"Saltando adjunto no-CSV: {filename}")
+                    logger.debug("Saltando adjunto no-CSV: %s", filename)
                     continue
 
                 # Decodificar contenido (viene en base64)
@@ -197,13 +181,13 @@ class GraphMailReader:
 
                 # Guardar archivo
                 output_path.write_bytes(content_bytes)
-                logger.info(f"📥 CSV descargado: {output_path.name} ({len(content_bytes)} bytes)")
+                logger.info("📥 CSV descargado: %s (%d bytes)", output_path.name, len(content_bytes))
                 downloaded.append(output_path)
 
             return downloaded
 
         except Exception as e:
-            logger.error(f"❌ Excepción descargando adjuntos: {e}")
+            logger.error("❌ Excepción descargando adjuntos: %s", e)
             return []
 
     def _determine_output_path(self, filename):
@@ -251,13 +235,57 @@ class GraphMailReader:
         data = {"isRead": True}
 
         try:
-            resp = requests.patch(url, headers=self._headers(), json=data, timeout=15)
+            resp = self.session.patch(url, headers=self._headers(), json=data, timeout=15)
             if resp.status_code in (200, 204):
-                logger.debug(f"Mensaje {message_id[:8]}... marcado como leído")
+                logger.debug("Mensaje %s... marcado como leído", message_id[:8])
             else:
-                logger.warning(f"No se pudo marcar como leído: {resp.status_code}")
+                logger.warning("No se pudo marcar como leído: %s", resp.status_code)
         except Exception as e:
-            logger.warning(f"Excepción marcando como leído: {e}")
+            logger.warning("Excepción marcando como leído: %s", e)
+
+    def mark_many_as_read(self, message_ids):
+        """Marca varios mensajes como leídos usando ``$batch``.
+
+        Agrupa hasta ``GRAPH_BATCH_MAX`` PATCH por llamada HTTP en vez de
+        un round-trip por mensaje.
+
+        Parameters
+        ----------
+        message_ids : list[str]
+            IDs de los mensajes.
+        """
+        for inicio in range(0, len(message_ids), GRAPH_BATCH_MAX):
+            lote = message_ids[inicio:inicio + GRAPH_BATCH_MAX]
+            body = {
+                "requests": [
+                    {
+                        "id": str(i),
+                        "method": "PATCH",
+                        "url": f"/users/{TARGET_MAILBOX}/messages/{message_id}",
+                        "headers": {"Content-Type": "application/json"},
+                        "body": {"isRead": True},
+                    }
+                    for i, message_id in enumerate(lote)
+                ]
+            }
+
+            try:
+                resp = self.session.post(
+                    GRAPH_BATCH_URL, headers=self._headers(), json=body, timeout=30,
+                )
+                if resp.status_code != 200:
+                    logger.warning("No se pudo marcar como leído (batch): %s", resp.status_code)
+                    continue
+                for r in resp.json().get("responses", []):
+                    if r.get("status") not in (200, 204):
+                        message_id = lote[int(r["id"])]
+                        logger.warning(
+                            "No se pudo marcar %s... como leído: %s",
+                            message_id[:8], r.get("status"),
+                        )
+                logger.debug("%d mensaje(s) marcados como leídos", len(lote))
+            except Exception as e:
+                logger.warning("Excepción marcando como leído (batch): %s", e)
 
 
 def descargar_adjuntos_moodle_graph():
@@ -276,8 +304,8 @@ def descargar_adjuntos_moodle_graph():
     """
     logger.info("=" * 60)
     logger.info("🚀 Descarga de adjuntos Moodle via Graph API")
-    logger.info(f"   Buzón: {TARGET_MAILBOX}")
-    logger.info(f"   Ventana: últimas {SEARCH_WINDOW_HOURS} horas")
+    logger.info("   Buzón: %s", TARGET_MAILBOX)
+    logger.info("   Ventana: últimas %d horas", SEARCH_WINDOW_HOURS)
     logger.info("=" * 60)
 
     try:
@@ -305,6 +333,7 @@ def descargar_adjuntos_moodle_graph():
 
         # Procesar cada correo
         all_files = []
+        procesados = []
         for msg in messages:
             msg_id = msg["id"]
             subject = msg["subject"]
@@ -312,21 +341,24 @@ def descargar_adjuntos_moodle_graph():
             sender = msg.get("from", {}).get("emailAddress", {}).get("address", "desconocido")
             is_read = msg.get("isRead", False)
 
-            logger.info(f"\n📧 Procesando: {subject}")
-            logger.info(f"   De: {sender}")
-            logger.info(f"   Recibido: {received}")
-            logger.info(f"   Leído: {'Sí' if is_read else 'No'}")
+            logger.info("\n📧 Procesando: %s", subject)
+            logger.info("   De: %s", sender)
+            logger.info("   Recibido: %s", received)
+            logger.info("   Leído: %s", "Sí" if is_read else "No")
 
             # Descargar CSVs
             csv_files = reader.download_csv_attachments(msg_id, subject)
 
             if csv_files:
                 all_files.extend(csv_files)
-                # Marcar como leído
-                reader.mark_as_read(msg_id)
-                logger.info(f"   ✅ {len(csv_files)} CSV(s) descargados")
+                procesados.append(msg_id)
+                logger.info("   ✅ %d CSV(s) descargados", len(csv_files))
             else:
-                logger.warning(f"   ⚠️ Correo sin adjuntos CSV")
+                logger.warning("   ⚠️ Correo sin adjuntos CSV")
+
+        # Marcar como leídos en una sola llamada $batch
+        if procesados:
+            reader.mark_many_as_read(procesados)
 
         # Verificar que tengamos Greporte y Dreporte
         archivos_descargados_str = [str(f.name) for f in all_files]
@@ -348,11 +380,11 @@ def descargar_adjuntos_moodle_graph():
             status = "ERROR"
             detalle = "No se descargó ningún archivo"
 
-        logger.info(f"\n{'=' * 60}")
-        logger.info(f"✅ FINALIZADO: {len(all_files)} CSV(s) descargados de {len(messages)} correo(s)")
-        logger.info(f"   Status: {status}")
-        logger.info(f"   Archivos: {archivos_descargados_str}")
-        logger.info(f"{'=' * 60}")
+        logger.info("\n%s", "=" * 60)
+        logger.info("✅ FINALIZADO: %d CSV(s) descargados de %d correo(s)", len(all_files), len(messages))
+        logger.info("   Status: %s", status)
+        logger.info("   Archivos: %s", archivos_descargados_str)
+        logger.info("%s", "=" * 60)
 
         return {
             "status": status,
@@ -361,7 +393,7 @@ def descargar_adjuntos_moodle_graph():
         }
 
     except Exception as e:
-        logger.error(f"❌ Error procesando correos: {e}", exc_info=True)
+        logger.error("❌ Error procesando correos: %s", e, exc_info=True)
         return {
             "status": "ERROR",
             "archivos_descargados": [],
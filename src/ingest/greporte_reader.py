@@ -1,6 +1,7 @@
 """Lee Greporte.csv (listado de cursos Moodle)."""
 
 import logging
+import os
 
 import pandas as pd
 
@@ -48,9 +49,17 @@ def leer_greporte(path=None):
 def _buscar_archivo(prefijo):
     """Busca el primer CSV cuyo nombre empiece con *prefijo* en DATA_INPUT_PATH."""
     carpeta = settings.DATA_INPUT_PATH
-    for f in sorted(carpeta.iterdir()):
-        if f.name.lower().startswith(prefijo.lower()) and f.suffix.lower() == ".csv":
-            return f
+    prefijo = prefijo.lower()
+    # scandir entrega nombre y tipo sin construir ni ordenar un Path por
+    # archivo; se elige el menor nombre, igual que el orden alfabético.
+    with os.scandir(carpeta) as it:
+        candidatos = [
+            e.name for e in it
+            if e.is_file() and e.name.lower().startswith(prefijo)
+            and e.name.lower().endswith(".csv")
+        ]
+    if candidatos:
+        return carpeta / min(candidatos)
     raise FileNotFoundError(
         f"No se encontró CSV con prefijo '{prefijo}' en {carpeta}"
     )
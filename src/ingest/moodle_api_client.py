@@ -4,12 +4,16 @@ Este módulo proporciona funciones para interactuar con la API REST de Moodle.
 Incluye retry logic, rate limiting y manejo robusto de errores.
 """
 
+import json
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from urllib.parse import urlencode
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from config import settings
 
@@ -20,9 +24,29 @@ RATE_LIMIT_DELAY = 0.05  # segundos entre llamadas (20 req/s, Moodle soporta 20+
 MAX_RETRIES = 2
 RETRY_DELAY = 5  # segundos
 TIMEOUT = settings.MOODLE_TIMEOUT if hasattr(settings, 'MOODLE_TIMEOUT') else 60
+COURSES_TTL = 300  # segundos que se reutiliza el catálogo de cursos
+COMPLETION_BATCH_SIZE = 25  # sub-llamadas de progreso por request (limita el largo de la URL)
 
-# Control de última llamada para rate limiting
-_last_call_time = 0.0
+# Sesión HTTP compartida: mantiene vivas las conexiones (keep-alive) a Moodle
+# o al proxy entre llamadas. El pool admite un socket por worker del reader.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_maxsize=max(10, settings.MOODLE_MAX_WORKERS)))
+_session.mount("http://", HTTPAdapter(pool_maxsize=max(10, settings.MOODLE_MAX_WORKERS)))
+
+# Rate limiting compartido entre hilos: cada llamada reserva el siguiente
+# turno libre (espaciados RATE_LIMIT_DELAY) bajo un lock
+_rate_lock = threading.Lock()
+_next_call_time = 0.0
+
+# Catálogo completo de core_course_get_courses.  En una corrida con
+# --scrape lo piden el orquestador (IDs SENCE) y luego el pipeline; cambia
+# poco, así que se reutiliza durante COURSES_TTL segundos.
+_courses_lock = threading.Lock()
+_courses_cache = {"expira": 0.0, "value": None}
+
+# tool_mobile_call_external_functions puede no estar habilitada para el
+# token; si falla una vez se vuelve a las llamadas individuales.
+_batch_disponible = True
 
 
 class MoodleAPIError(Exception):
@@ -30,6 +54,17 @@ class MoodleAPIError(Exception):
     pass
 
 
+def _esperar_turno() -> None:
+    """Bloquea hasta el próximo turno libre del rate limit (thread-safe)."""
+    global _next_call_time
+    with _rate_lock:
+        ahora = time.monotonic()
+        turno = max(ahora, _next_call_time)
+        _next_call_time = turno + RATE_LIMIT_DELAY
+    if turno > ahora:
+        time.sleep(turno - ahora)
+
+
 def moodle_api_call(function: str, params: dict[str, Any] | None = None) -> dict | list:
     """Llamada genérica a Moodle API REST con retry y error handling.
 
@@ -52,8 +87,6 @@ def moodle_api_call(function: str, params: dict[str, Any] | None = None) -> dict
     RuntimeError
         Si hay error de red o HTTP
     """
-    global _last_call_time
-
     if not settings.MOODLE_URL or not settings.MOODLE_TOKEN:
         raise RuntimeError(
             "Credenciales Moodle incompletas. "
@@ -63,10 +96,8 @@ def moodle_api_call(function: str, params: dict[str, Any] | None = None) -> dict
     if params is None:
         params = {}
 
-    # Rate limiting: esperar si la última llamada fue muy reciente
-    elapsed = time.time() - _last_call_time
-    if elapsed < RATE_LIMIT_DELAY:
-        time.sleep(RATE_LIMIT_DELAY - elapsed)
+    # Rate limiting: esperar el turno reservado para esta llamada
+    _esperar_turno()
 
     # Construir parámetros de la URL
     url_params = {
@@ -91,8 +122,7 @@ def moodle_api_call(function: str, params: dict[str, Any] | None = None) -> dict
     last_exception = None
     for intento in range(MAX_RETRIES + 1):
         try:
-            response = requests.get(url, timeout=TIMEOUT, proxies=proxies)
-            _last_call_time = time.time()
+            response = _session.get(url, timeout=TIMEOUT, proxies=proxies)
 
             if response.status_code != 200:
                 raise RuntimeError(
@@ -138,6 +168,53 @@ def moodle_api_call(function: str, params: dict[str, Any] | None = None) -> dict
     raise last_exception
 
 
+def moodle_batch_call(calls: list[tuple[str, dict]]) -> list[Any]:
+    """Ejecuta varias funciones Moodle en un solo request HTTP.
+
+    Usa ``tool_mobile_call_external_functions``, que recibe cada sub-llamada
+    como ``requests[i][function]`` + ``requests[i][arguments]`` (JSON).
+
+    Parameters
+    ----------
+    calls : list[tuple[str, dict]]
+        Pares (nombre de función, parámetros).
+
+    Returns
+    -------
+    list
+        Una respuesta por sub-llamada, en el mismo orden.  Las sub-llamadas
+        que fallaron se retornan como instancias de ``MoodleAPIError``.
+
+    Raises
+    ------
+    MoodleAPIError
+        Si la función de lote no está disponible o la respuesta no es válida
+    RuntimeError
+        Si hay error de red o HTTP
+    """
+    params = {}
+    for i, (function, arguments) in enumerate(calls):
+        params[f"requests[{i}][function]"] = function
+        params[f"requests[{i}][arguments]"] = json.dumps(arguments)
+
+    data = moodle_api_call("tool_mobile_call_external_functions", params)
+    responses = data.get("responses") if isinstance(data, dict) else None
+    if not isinstance(responses, list) or len(responses) != len(calls):
+        raise MoodleAPIError("Respuesta inesperada de tool_mobile_call_external_functions")
+
+    resultados = []
+    for (function, _), r in zip(calls, responses):
+        if r.get("error"):
+            try:
+                mensaje = json.loads(r.get("exception") or "{}").get("message", "Error desconocido")
+            except (TypeError, ValueError, AttributeError):
+                mensaje = "Error desconocido"
+            resultados.append(MoodleAPIError(f"Error Moodle {function}: {mensaje}"))
+        else:
+            resultados.append(json.loads(r["data"]) if r.get("data") else None)
+    return resultados
+
+
 def get_categories() -> dict[int, str]:
     """Obtiene todas las categorías de cursos.
 
@@ -173,7 +250,7 @@ def get_courses_by_ids(course_ids: list[int]) -> list[dict]:
     return response
 
 
-def get_courses(category_ids: list[int] | None = None) -> list[dict]:
+def get_courses(category_ids: list[int] | None = None, refresh: bool = False) -> list[dict]:
     """Obtiene cursos de Moodle, filtrando por categoría en Python.
 
     Descarga todos los cursos con core_course_get_courses y filtra localmente
@@ -184,18 +261,27 @@ def get_courses(category_ids: list[int] | None = None) -> list[dict]:
     category_ids : list[int], optional
         Lista de IDs de categorías para filtrar (incluye subcategorías).
         Si es None, retorna todos los cursos.
+    refresh : bool
+        Si es True, ignora el catálogo cacheado y lo vuelve a descargar.
 
     Returns
     -------
     list[dict]
         Lista de cursos con campos: id, fullname, shortname, categoryid, startdate, enddate
     """
-    logger.info("Obteniendo cursos desde Moodle API")
-    response = moodle_api_call("core_course_get_courses", {})
+    with _courses_lock:
+        response = _courses_cache["value"]
+        if refresh or response is None or time.monotonic() >= _courses_cache["expira"]:
+            logger.info("Obteniendo cursos desde Moodle API")
+            response = moodle_api_call("core_course_get_courses", {})
 
-    if not isinstance(response, list):
-        logger.warning("Respuesta inesperada de get_courses: %s", type(response))
-        return []
+            if not isinstance(response, list):
+                logger.warning("Respuesta inesperada de get_courses: %s", type(response))
+                return []
+
+            _courses_cache.update(value=response, expira=time.monotonic() + COURSES_TTL)
+        else:
+            logger.info("Usando catálogo de cursos cacheado")
 
     if category_ids:
         courses = [c for c in response if c.get("categoryid") in category_ids]
@@ -204,7 +290,7 @@ def get_courses(category_ids: list[int] | None = None) -> list[dict]:
             len(courses), len(response), category_ids,
         )
     else:
-        courses = response
+        courses = list(response)
         logger.info("Cursos obtenidos: %d", len(courses))
 
     return courses
@@ -377,6 +463,66 @@ def get_completion_status(courseid: int, userid: int) -> float:
         )
         return 0.0
 
+    return _calcular_progreso(courseid, userid, response)
+
+
+def get_completion_statuses(courseid: int, userids: list[int]) -> dict[int, float]:
+    """Calcula el progreso de varios estudiantes de un curso.
+
+    Agrupa hasta ``COMPLETION_BATCH_SIZE`` consultas de
+    ``core_completion_get_activities_completion_status`` por request usando
+    ``tool_mobile_call_external_functions``.  Si esa función no está
+    disponible para el token, usa ``get_completion_status`` por usuario.
+
+    Parameters
+    ----------
+    courseid : int
+        ID del curso en Moodle
+    userids : list[int]
+        IDs de los usuarios en Moodle
+
+    Returns
+    -------
+    dict[int, float]
+        Mapa {userid: porcentaje de progreso (0-100)}
+    """
+    global _batch_disponible
+
+    progresos = {}
+    for inicio in range(0, len(userids), COMPLETION_BATCH_SIZE):
+        lote = userids[inicio:inicio + COMPLETION_BATCH_SIZE]
+
+        if _batch_disponible and len(lote) > 1:
+            try:
+                respuestas = moodle_batch_call([
+                    ("core_completion_get_activities_completion_status",
+                     {"courseid": courseid, "userid": userid})
+                    for userid in lote
+                ])
+            except MoodleAPIError as e:
+                logger.info("Llamadas en lote no disponibles, se usan individuales: %s", e)
+                _batch_disponible = False
+            else:
+                for userid, response in zip(lote, respuestas):
+                    if isinstance(response, MoodleAPIError):
+                        logger.debug(
+                            "No se pudo obtener completion para curso %d, usuario %d: %s",
+                            courseid, userid, response
+                        )
+                        progresos[userid] = 0.0
+                    else:
+                        progresos[userid] = _calcular_progreso(courseid, userid, response)
+                continue
+
+        for userid in lote:
+            progresos[userid] = get_completion_status(courseid, userid)
+
+    return progresos
+
+
+def _calcular_progreso(courseid: int, userid: int, response: Any) -> float:
+    """Porcentaje de actividades completadas (state 1 o 2) de una respuesta
+    de ``core_completion_get_activities_completion_status``."""
     if not isinstance(response, dict) or "statuses" not in response:
         logger.debug(
             "Respuesta inesperada de get_completion_status para curso %d, usuario %d",
@@ -428,40 +574,51 @@ def get_all_sence_ids() -> list[str]:
         logger.warning("No se encontraron cursos en las categorías configuradas")
         return []
 
-    sence_ids_set = set()
+    # Los cursos son independientes: sus inscripciones se piden en
+    # paralelo (el rate limit de _esperar_turno sigue siendo compartido)
+    workers = max(1, min(settings.MOODLE_MAX_WORKERS, len(courses)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="moodle") as ex:
+        sence_ids_set = set().union(*ex.map(_ids_sence_curso, courses))
 
-    # Para cada curso, obtener los estudiantes y extraer sus grupos
-    for curso in courses:
-        curso_id = curso.get("id")
-        curso_nombre = curso.get("fullname", "")
+    sence_ids = sorted(sence_ids_set)
+    logger.info("IDs SENCE únicos encontrados: %d", len(sence_ids))
 
-        try:
-            estudiantes = get_enrolled_users(curso_id)
+    return sence_ids
 
-            for est in estudiantes:
-                groups = est.get("groups", [])
 
-                # El primer grupo contiene el ID SENCE
-                if groups and len(groups) > 0:
-                    id_sence = str(groups[0].get("name", "")).strip()
+def _ids_sence_curso(curso: dict) -> set[str]:
+    """IDs SENCE del primer grupo de cada estudiante de un curso.
 
-                    # Validar que sea numérico
-                    if id_sence and id_sence.isdigit():
-                        sence_ids_set.add(id_sence)
-                    else:
-                        # Intentar extraer número de formato "6731347.0"
-                        try:
-                            num = int(float(id_sence))
-                            sence_ids_set.add(str(num))
-                        except (ValueError, TypeError):
-                            continue
-
-        except Exception as e:
-            logger.warning("Error obteniendo IDs SENCE del curso %d (%s): %s",
-                          curso_id, curso_nombre, e)
-            continue
-
-    sence_ids = sorted(sence_ids_set)
-    logger.info("IDs SENCE únicos encontrados: %d", len(sence_ids))
+    Un error del curso se registra y retorna un conjunto vacío, para no
+    interrumpir los demás cursos.
+    """
+    curso_id = curso.get("id")
+    curso_nombre = curso.get("fullname", "")
+    ids = set()
 
-    return sence_ids
+    try:
+        estudiantes = get_enrolled_users(curso_id)
+
+        for est in estudiantes:
+            groups = est.get("groups", [])
+
+            # El primer grupo contiene el ID SENCE
+            if groups and len(groups) > 0:
+                id_sence = str(groups[0].get("name", "")).strip()
+
+                # Validar que sea numérico
+                if id_sence and id_sence.isdigit():
+                    ids.add(id_sence)
+                else:
+                    # Intentar extraer número de formato "6731347.0"
+                    try:
+                        num = int(float(id_sence))
+                        ids.add(str(num))
+                    except (ValueError, TypeError):
+                        continue
+
+    except Exception as e:
+        logger.warning("Error obteniendo IDs SENCE del curso %d (%s): %s",
+                      curso_id, curso_nombre, e)
+
+    return ids
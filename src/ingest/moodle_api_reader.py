@@ -5,7 +5,9 @@ consultando directamente la API REST de Moodle.
 """
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 
 import pandas as pd
 
@@ -47,16 +49,21 @@ def leer_datos_moodle(course_ids=None) -> pd.DataFrame:
     """
     logger.info("Iniciando lectura desde Moodle API")
 
-    # 1. Obtener datos maestros (categorías y cursos)
+    # 1. Obtener datos maestros (categorías y cursos): son independientes,
+    # así que se piden en paralelo
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="moodle") as ex:
+        fut_categories = ex.submit(api.get_categories)
+        fut_courses = ex.submit(api.get_courses, settings.MOODLE_CATEGORY_IDS)
+
     try:
-        categories = api.get_categories()
+        categories = fut_categories.result()
         logger.info("Categorías obtenidas: %d", len(categories))
     except Exception as e:
         logger.error("Error obteniendo categorías: %s", e)
         raise RuntimeError("No se pueden obtener categorías de Moodle") from e
 
     try:
-        courses = api.get_courses(settings.MOODLE_CATEGORY_IDS)
+        courses = fut_courses.result()
         logger.info(
             "Cursos obtenidos: %d en categorías %s",
             len(courses), settings.MOODLE_CATEGORY_IDS
@@ -74,73 +81,20 @@ def leer_datos_moodle(course_ids=None) -> pd.DataFrame:
         # Retornar DataFrame vacío con columnas esperadas
         return pd.DataFrame(columns=_get_column_names())
 
-    # 2. Procesar cada curso
-    filas = []
-    total_estudiantes = 0
-
-    for idx, curso in enumerate(courses, 1):
-        curso_id = curso.get("id")
-        curso_nombre = curso.get("fullname", "")
-        logger.info(
-            "[%d/%d] Procesando curso: %s (ID: %d)",
-            idx, len(courses), curso_nombre, curso_id
-        )
-
-        try:
-            # Obtener estudiantes del curso
-            estudiantes = api.get_enrolled_users(curso_id)
-            logger.debug("  Estudiantes en curso %d: %d", curso_id, len(estudiantes))
-
-            if not estudiantes:
-                # Curso sin estudiantes: agregar fila vacía
-                fila_vacia = _construir_fila_curso_vacio(curso, categories)
-                filas.append(fila_vacia)
-                continue
-
-            # Obtener notas de todos los estudiantes del curso
-            grades = api.get_grades(curso_id)
-
-            # Deduplicar estudiantes por user ID (Moodle puede devolver
-            # un mismo usuario con múltiples inscripciones)
-            seen_user_ids = set()
-
-            # Para cada estudiante: obtener progreso y construir fila
-            for est in estudiantes:
-                try:
-                    userid = est.get("id")
-
-                    # Saltar si ya procesamos este usuario en este curso
-                    if userid in seen_user_ids:
-                        logger.warning(
-                            "  Estudiante duplicado ignorado en curso %d: user_id=%s (%s)",
-                            curso_id, userid, est.get("fullname", "?")
-                        )
-                        continue
-                    seen_user_ids.add(userid)
-
-                    progreso = api.get_completion_status(curso_id, userid)
-                    grade_data = grades.get(userid, {
-                        "nota_final": None,
-                        "evaluaciones_rendidas": 0,
-                        "total_evaluaciones": 0,
-                        "promedio_evaluadas": None,
-                        "resumen_evaluaciones": "0/0"
-                    })
-
-                    fila = _construir_fila(curso, est, progreso, grade_data, categories)
-                    filas.append(fila)
-                    total_estudiantes += 1
-
-                except Exception as e:
-                    logger.warning(
-                        "  Error procesando estudiante %s en curso %d: %s",
-                        est.get("fullname", "?"), curso_id, e
-                    )
-                    # Continuar con el siguiente estudiante
-
-        except Exception as e:
-            logger.error("Error procesando curso %d (%s): %s", curso_id, curso_nombre, e)
-            # Continuar con el siguiente curso
+    # 2. Procesar cursos en paralelo: cada uno son llamadas HTTP
+    # independientes, y el rate limit de moodle_api_client es compartido.
+    # ex.map conserva el orden original de los cursos.
+    total_cursos = len(courses)
+    workers = max(1, min(settings.MOODLE_MAX_WORKERS, total_cursos))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="moodle") as ex:
+        resultados = list(ex.map(
+            partial(_procesar_curso, total_cursos=total_cursos, categories=categories),
+            range(1, total_cursos + 1),
+            courses,
+        ))
+
+    filas = [fila for filas_curso, _ in resultados for fila in filas_curso]
+    total_estudiantes = sum(n for _, n in resultados)
 
     # 3. Construir DataFrame
     if not filas:
@@ -157,6 +111,99 @@ def leer_datos_moodle(course_ids=None) -> pd.DataFrame:
     return df
 
 
+def _procesar_curso(
+    idx: int,
+    curso: dict,
+    total_cursos: int,
+    categories: dict[int, str]
+) -> tuple[list[dict], int]:
+    """Consulta estudiantes, notas y progreso de un curso.
+
+    Returns
+    -------
+    tuple[list[dict], int]
+        Filas del curso y cantidad de estudiantes procesados. Un error a
+        nivel de curso se registra y retorna las filas obtenidas hasta ahí.
+    """
+    curso_id = curso.get("id")
+    curso_nombre = curso.get("fullname", "")
+    logger.info(
+        "[%d/%d] Procesando curso: %s (ID: %d)",
+        idx, total_cursos, curso_nombre, curso_id
+    )
+
+    filas = []
+    total_estudiantes = 0
+
+    try:
+        # Obtener estudiantes del curso
+        estudiantes = api.get_enrolled_users(curso_id)
+        logger.debug("  Estudiantes en curso %d: %d", curso_id, len(estudiantes))
+
+        if not estudiantes:
+            # Curso sin estudiantes: agregar fila vacía
+            filas.append(_construir_fila_curso_vacio(curso, categories))
+            return filas, 0
+
+        # Obtener notas de todos los estudiantes del curso
+        grades = api.get_grades(curso_id)
+
+        # Progreso de todos los estudiantes en lotes; si falla, se consulta
+        # por estudiante más abajo
+        userids = list(dict.fromkeys(est.get("id") for est in estudiantes))
+        try:
+            progresos = api.get_completion_statuses(curso_id, userids)
+        except Exception as e:
+            logger.warning("  Error obteniendo progreso en lote del curso %d: %s", curso_id, e)
+            progresos = {}
+
+        # Deduplicar estudiantes por user ID (Moodle puede devolver
+        # un mismo usuario con múltiples inscripciones)
+        seen_user_ids = set()
+
+        # Para cada estudiante: obtener progreso y construir fila
+        for est in estudiantes:
+            try:
+                userid = est.get("id")
+
+                # Saltar si ya procesamos este usuario en este curso
+                if userid in seen_user_ids:
+                    logger.warning(
+                        "  Estudiante duplicado ignorado en curso %d: user_id=%s (%s)",
+                        curso_id, userid, est.get("fullname", "?")
+                    )
+                    continue
+                seen_user_ids.add(userid)
+
+                progreso = progresos.get(userid)
+                if progreso is None:
+                    progreso = api.get_completion_status(curso_id, userid)
+                grade_data = grades.get(userid, {
+                    "nota_final": None,
+                    "evaluaciones_rendidas": 0,
+                    "total_evaluaciones": 0,
+                    "promedio_evaluadas": None,
+                    "resumen_evaluaciones": "0/0"
+                })
+
+                fila = _construir_fila(curso, est, progreso, grade_data, categories)
+                filas.append(fila)
+                total_estudiantes += 1
+
+            except Exception as e:
+                logger.warning(
+                    "  Error procesando estudiante %s en curso %d: %s",
+                    est.get("fullname", "?"), curso_id, e
+                )
+                # Continuar con el siguiente estudiante
+
+    except Exception as e:
+        logger.error("Error procesando curso %d (%s): %s", curso_id, curso_nombre, e)
+        # Continuar con el siguiente curso
+
+    return filas, total_estudiantes
+
+
 def _construir_fila(
     curso: dict,
     estudiante: dict,
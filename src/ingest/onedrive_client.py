@@ -7,49 +7,25 @@ desde SharePoint a las rutas locales de data/.
 
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import requests
 
 from config import settings
+from src.reports.email_sender import obtener_token_azure
 
 logger = logging.getLogger(__name__)
 
-GRAPH_TOKEN_URL = "https://login.microsoftonline.com/{tenant}/oauth2/v2.0/token"
 GRAPH_DRIVE_URL = "https://graph.microsoft.com/v1.0/sites/{site_id}/drive"
 
 
 def _obtener_token():
-    """Obtiene access token de Azure AD."""
-    client_id = settings.AZURE_CLIENT_ID
-    tenant_id = settings.AZURE_TENANT_ID
-    client_secret = settings.AZURE_CLIENT_SECRET
-
-    if not all([client_id, tenant_id, client_secret]):
-        raise RuntimeError("Credenciales Azure incompletas para OneDrive")
-
-    resp = requests.post(
-        GRAPH_TOKEN_URL.format(tenant=tenant_id),
-        data={
-            "client_id": client_id,
-            "client_secret": client_secret,
-            "scope": "https://graph.microsoft.com/.default",
-            "grant_type": "client_credentials",
-        },
-        timeout=30,
-    )
-
-    if resp.status_code != 200:
-        raise RuntimeError(f"Error obteniendo token Azure: HTTP {resp.status_code}")
+    """Obtiene access token de Azure AD (cacheado, ver email_sender)."""
+    return obtener_token_azure()
 
-    token = resp.json().get("access_token")
-    if not token:
-        raise RuntimeError("Token Azure vacío")
 
-    return token
-
-
-def _download_file(token, site_id, folder_path, filename, dest_path):
+def _download_file(token, site_id, folder_path, filename, dest_path, http=requests):
     """Descarga un archivo de SharePoint/OneDrive vía Graph API.
 
     Parameters
@@ -64,6 +40,9 @@ def _download_file(token, site_id, folder_path, filename, dest_path):
         Nombre del archivo a descargar.
     dest_path : Path
         Ruta local de destino.
+    http : module | requests.Session
+        ``requests`` o una ``requests.Session`` abierta para reutilizar la
+        conexión entre descargas.
     """
     headers = {"Authorization": f"Bearer {token}"}
 
@@ -77,7 +56,7 @@ def _download_file(token, site_id, folder_path, filename, dest_path):
         f"/drive/root:/{encoded_path}:/content"
     )
 
-    resp = requests.get(url, headers=headers, timeout=60, allow_redirects=True)
+    resp = http.get(url, headers=headers, timeout=60, allow_redirects=True)
 
     if resp.status_code != 200:
         raise RuntimeError(
@@ -140,12 +119,18 @@ def download_moodle_csvs():
         (compradores_folder, "compradores_tecnipro.xlsx", settings.COMPRADORES_PATH),
     ]
 
-    ok = 0
-    for folder, filename, dest in archivos:
+    # Descargas independientes (solo espera de red): en paralelo sobre la
+    # misma sesión, el tiempo total queda en el de la más lenta
+    def descargar(archivo):
+        folder, filename, dest = archivo
         try:
-            _download_file(token, site_id, folder, filename, dest)
-            ok += 1
+            _download_file(token, site_id, folder, filename, dest, http=http)
+            return True
         except Exception as e:
             logger.error("Error descargando %s: %s", filename, e)
+            return False
+
+    with requests.Session() as http, ThreadPoolExecutor(max_workers=len(archivos)) as ex:
+        ok = sum(ex.map(descargar, archivos))
 
     logger.info("OneDrive: %d/%d archivos descargados", ok, len(archivos))
@@ -1,5 +1,7 @@
 """Lee TODOS los CSV de SENCE de una carpeta."""
 
+import io
+import itertools
 import logging
 from pathlib import Path
 
@@ -74,9 +76,8 @@ def _leer_archivo_sence(archivo):
     # ── Detectar si es Excel disfrazado de CSV ──────────────
     es_excel = False
     try:
-        cabecera = archivo.read_bytes()[:4]
-        if cabecera[:2] == b"PK":
-            es_excel = True
+        with open(archivo, "rb") as f:
+            es_excel = f.read(2) == b"PK"
     except Exception:
         pass
 
@@ -86,9 +87,11 @@ def _leer_archivo_sence(archivo):
     # ── Lectura normal como CSV ─────────────────────────────
     # Intentar leer con utf-8 primero, luego latin-1
     contenido = None
+    encoding = None
     for enc in ("utf-8", "latin-1"):
         try:
             contenido = archivo.read_text(encoding=enc)
+            encoding = enc
             break
         except (UnicodeDecodeError, ValueError):
             continue
@@ -97,8 +100,11 @@ def _leer_archivo_sence(archivo):
         logger.warning("No se pudo leer %s con ningún encoding", archivo.name)
         return None
 
-    # Verificar si está vacío o tiene mensaje "No hay datos"
-    lineas = [l for l in contenido.strip().splitlines() if l.strip()]
+    # Verificar si está vacío o tiene mensaje "No hay datos".  Basta con las
+    # dos primeras líneas no vacías: no se arma la lista completa de líneas.
+    no_vacias = (l for l in io.StringIO(contenido) if l.strip())
+    lineas = list(itertools.islice(no_vacias, 2))
+    del contenido
     if not lineas:
         logger.debug("Archivo SENCE vacío: %s", archivo.name)
         return None
@@ -114,7 +120,7 @@ def _leer_archivo_sence(archivo):
             archivo,
             header=None,
             names=SENCE_COLUMNS,
-            encoding=_detectar_encoding(archivo),
+            encoding=encoding,
             dtype=str,
         )
     except Exception as e:
@@ -191,12 +197,13 @@ def _leer_excel_sence(archivo, id_sence):
     # Filtrar filas sin fecha válida de conectividad
     if col_fecha is not None:
         fecha_col = df[col_fecha]
+        fecha_str = fecha_col.astype(str)
         # notna() detecta celdas vacías reales (NaN float); str check filtra
         # strings "nan", "nat", "" que pueden quedar con dtype=str en read_excel
         fecha_valida = (
             fecha_col.notna()
-            & (fecha_col.astype(str).str.strip() != "")
-            & (~fecha_col.astype(str).str.lower().isin(["nan", "nat", "none"]))
+            & (fecha_str.str.strip() != "")
+            & (~fecha_str.str.lower().isin(["nan", "nat", "none"]))
         )
         mask = mask & fecha_valida
         logger.debug(
@@ -238,15 +245,6 @@ def _buscar_columna(df, patron):
     return None
 
 
-def _detectar_encoding(archivo):
-    """Intenta utf-8; si falla retorna latin-1."""
-    try:
-        archivo.read_text(encoding="utf-8")
-        return "utf-8"
-    except (UnicodeDecodeError, ValueError):
-        return "latin-1"
-
-
 def _df_vacio():
     """Retorna un DataFrame vacío con las columnas esperadas."""
     return pd.DataFrame(columns=["LLave", "IDUser", "IDSence", "N_Ingresos", "DJ"])
@@ -18,6 +18,7 @@ Modos de ejecución:
 import argparse
 import asyncio
 import logging
+import os
 import sys
 
 from config import settings
@@ -131,10 +132,16 @@ def run_pipeline(course_ids=None):
     try:
         from pathlib import Path as _Path
         sence_folder = _Path(settings.SENCE_CSV_PATH)
-        archivos_sence = list(sence_folder.glob("*.csv")) if sence_folder.exists() else []
-        if archivos_sence:
+        mtimes_sence = []
+        if sence_folder.exists():
+            with os.scandir(sence_folder) as it:
+                mtimes_sence = [
+                    e.stat().st_mtime for e in it
+                    if e.name.endswith(".csv") and e.is_file()
+                ]
+        if mtimes_sence:
             from datetime import datetime as _dt, timezone as _tz
-            mtime = max(f.stat().st_mtime for f in archivos_sence)
+            mtime = max(mtimes_sence)
             fecha_sence = _dt.fromtimestamp(mtime, tz=_tz.utc).isoformat(timespec="seconds")
             logger.info("Fecha última actualización SENCE: %s", fecha_sence)
     except Exception as e:
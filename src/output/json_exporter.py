@@ -1,5 +1,6 @@
 """Genera JSON consolidado para el dashboard."""
 
+import gzip
 import json
 import logging
 from datetime import datetime, timezone
@@ -39,6 +40,16 @@ def exportar_json(df, output_path=None, fecha_sence=None):
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(estructura, f, ensure_ascii=False, indent=2, default=str)
 
+    # Copia comprimida una sola vez: el dashboard la sirve con Content-Encoding: gzip
+    gz_path = output_path.with_name(output_path.name + ".gz")
+    with gzip.open(gz_path, "wb", compresslevel=6) as f:
+        f.write(output_path.read_bytes())
+
+    # Sidecar con solo la metadata, escrito después del JSON principal
+    meta_path = output_path.with_name(settings.JSON_META_FILENAME)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(estructura["metadata"], f, ensure_ascii=False, default=str)
+
     logger.info("JSON exportado a %s", output_path)
     return estructura
 
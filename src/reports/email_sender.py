@@ -5,6 +5,7 @@ import logging
 import time
 from pathlib import Path
 
+import orjson
 import requests
 
 from config import settings
@@ -18,10 +19,39 @@ MAX_RETRIES = 1
 RETRY_DELAY = 10       # segundos
 DELAY_ENTRE_ENVIOS = 2  # segundos
 
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+# El token de client_credentials dura ~1 hora: se reutiliza hasta TOKEN_MARGEN
+# segundos antes de que expire. Clave: (tenant, client_id, scope).
+TOKEN_MARGEN = 60  # segundos
+_token_cache = {}
+
+
+def decodificar_jwt(token):
+    """Retorna el payload (claims) de un JWT sin verificar la firma.
+
+    Solo para leer metadatos como ``exp``; no usar para validar tokens.
+    orjson parsea directamente los bytes decodificados, sin pasar por str.
+    """
+    payload = token.split(".")[1]
+    return orjson.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+
+
+def _expiracion_token(token, payload):
+    """Epoch de expiración: ``expires_in`` de la respuesta o el claim ``exp``."""
+    if payload.get("expires_in"):
+        return time.time() + int(payload["expires_in"])
+    try:
+        return float(decodificar_jwt(token)["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return 0.0
+
 
 def obtener_token_azure():
     """Obtiene access token de Azure AD usando client credentials.
 
+    El token se cachea en el proceso y se reutiliza mientras no esté por
+    expirar, así varios envíos (o módulos) no repiten el POST a Azure AD.
+
     Returns
     -------
     str
@@ -42,11 +72,16 @@ def obtener_token_azure():
             "AZURE_TENANT_ID, AZURE_CLIENT_SECRET en .env"
         )
 
+    clave = (tenant_id, client_id, GRAPH_SCOPE)
+    cacheado = _token_cache.get(clave)
+    if cacheado and time.time() < cacheado[1] - TOKEN_MARGEN:
+        return cacheado[0]
+
     url = GRAPH_TOKEN_URL.format(tenant=tenant_id)
     data = {
         "client_id": client_id,
         "client_secret": client_secret,
-        "scope": "https://graph.microsoft.com/.default",
+        "scope": GRAPH_SCOPE,
         "grant_type": "client_credentials",
     }
 
@@ -61,10 +96,12 @@ def obtener_token_azure():
             f"Error obteniendo token Azure (HTTP {resp.status_code}): {error_desc}"
         )
 
-    token = resp.json().get("access_token")
+    payload = resp.json()
+    token = payload.get("access_token")
     if not token:
         raise RuntimeError("Respuesta de Azure no contiene access_token")
 
+    _token_cache[clave] = (token, _expiracion_token(token, payload))
     logger.info("Token Azure obtenido correctamente")
     return token
 
@@ -276,6 +313,78 @@ def enviar_correo(destinatario, asunto, cuerpo_html, adjunto_path=None,
             {"emailAddress": {"address": cc}}
         ]
 
+    return _post_send_mail(requests, token, remitente, message, lista_emails)
+
+
+def enviar_correos_individuales(destinatarios, asunto, cuerpo_html, cc=None, dry_run=False):
+    """Envía un correo separado a cada destinatario con un solo token y conexión.
+
+    A diferencia de ``enviar_correo`` con varios destinatarios, ninguno ve
+    las direcciones de los demás.  El token Azure se pide una vez y los POST
+    a Graph reutilizan la misma conexión HTTPS (``requests.Session``).
+
+    Parameters
+    ----------
+    destinatarios : list[str]
+        Emails de destino (cada elemento puede traer varios separados por coma).
+    cc : str | None
+        Email(s) en copia, separados por coma.
+    asunto, cuerpo_html, dry_run
+        Igual que en ``enviar_correo``.
+
+    Returns
+    -------
+    dict
+        'status' ('OK' si todos se enviaron, 'ERROR' si alguno falló) y 'detalle'.
+    """
+    lista_emails = [e for d in destinatarios for e in _parsear_emails(d)]
+    if not lista_emails:
+        return {"status": "ERROR", "detalle": f"Emails destinatarios inválidos: {destinatarios}"}
+
+    if dry_run:
+        logger.info("[DRY-RUN] %d correos NO enviados (asunto: %s)", len(lista_emails), asunto)
+        return {"status": "DRY-RUN", "detalle": "Correos no enviados (modo prueba)"}
+
+    try:
+        token = obtener_token_azure()
+    except RuntimeError as e:
+        return {"status": "ERROR", "detalle": str(e)}
+
+    remitente = settings.EMAIL_REMITENTE
+    if not remitente:
+        return {"status": "ERROR", "detalle": "EMAIL_REMITENTE no configurado en .env"}
+
+    # Partes comunes a todos los mensajes, construidas una sola vez
+    body = {"contentType": "HTML", "content": cuerpo_html}
+    cc_recipients = [{"emailAddress": {"address": e}} for e in _parsear_emails(cc)]
+
+    errores = []
+    with requests.Session() as http:
+        for email in lista_emails:
+            message = {
+                "subject": asunto,
+                "body": body,
+                "toRecipients": [{"emailAddress": {"address": email}}],
+            }
+            if cc_recipients:
+                message["ccRecipients"] = cc_recipients
+            resultado = _post_send_mail(http, token, remitente, message, [email])
+            if resultado["status"] != "OK":
+                errores.append(f"{email}: {resultado['detalle']}")
+
+    if errores:
+        return {
+            "status": "ERROR",
+            "detalle": f"{len(errores)}/{len(lista_emails)} fallidos — " + "; ".join(errores),
+        }
+    return {"status": "OK", "detalle": f"Enviados {len(lista_emails)} correos individuales"}
+
+
+def _post_send_mail(http, token, remitente, message, lista_emails):
+    """POST a Graph sendMail con reintento.
+
+    ``http`` es el módulo ``requests`` o una ``requests.Session`` abierta.
+    """
     url = GRAPH_SEND_MAIL_URL.format(user=remitente)
     headers = {
         "Authorization": f"Bearer {token}",
@@ -286,7 +395,7 @@ def enviar_correo(destinatario, asunto, cuerpo_html, adjunto_path=None,
     # Enviar con retry
     for intento in range(MAX_RETRIES + 1):
         try:
-            resp = requests.post(url, json=payload, headers=headers, timeout=30)
+            resp = http.post(url, json=payload, headers=headers, timeout=30)
 
             if resp.status_code == 202:
                 logger.info("Correo enviado a %s", lista_emails)
@@ -135,17 +135,15 @@ class ScraperOrchestrator:
 
         # Modo CSV: obtener IDs desde Dreporte.csv
         logger.info("Modo CSV: obteniendo IDs SENCE desde Dreporte.csv")
-        dreporte_path = settings.DATA_INPUT_PATH
-        dreporte_file = None
-        for f in sorted(dreporte_path.iterdir()):
-            if f.name.lower().startswith("d") and f.suffix.lower() == ".csv":
-                dreporte_file = f
-                break
+        from src.ingest.dreporte_reader import _buscar_archivo
 
-        if dreporte_file is None:
+        dreporte_path = settings.DATA_INPUT_PATH
+        try:
+            dreporte_file = _buscar_archivo("D")
+        except FileNotFoundError:
             raise FileNotFoundError(
                 f"No se encontró Dreporte.csv en {dreporte_path}"
-            )
+            ) from None
 
         df = pd.read_csv(dreporte_file, encoding="utf-8-sig", dtype=str)
         raw_ids = df["IDSence"].dropna().unique()
@@ -1,10 +1,13 @@
 """Servidor web Flask para el dashboard de Tecnipro."""
 
+import gzip
 import logging
 import secrets
 from datetime import timedelta
 
+import orjson
 from flask import Flask, session, request, abort
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 
 from config import settings
@@ -13,6 +16,28 @@ from src.web.auth import login_manager
 logger = logging.getLogger(__name__)
 
 
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Proveedor JSON de Flask sobre orjson (jsonify, request.get_json, sesión).
+
+    Las fechas pasan por DefaultJSONProvider.default, igual que antes (formato
+    HTTP), y lo que orjson no conoce (Decimal, UUID...) también. Las claves no
+    se ordenan: las respuestas conservan el orden en que se arman los dicts.
+    """
+
+    sort_keys = False
+    _OPCIONES = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj, **kwargs):
+        opciones = self._OPCIONES
+        if kwargs.get("indent"):
+            opciones |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=opciones).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 def create_app():
     """Factory para crear la aplicación Flask."""
     app = Flask(
@@ -20,6 +45,8 @@ def create_app():
         template_folder=str(settings.TEMPLATES_PATH),
     )
 
+    app.json = OrjsonProvider(app)
+
     # Secret key para sesiones
     app.secret_key = settings.SECRET_KEY
 
@@ -80,6 +107,35 @@ def create_app():
         response.headers["X-Content-Type-Options"] = "nosniff"
         return response
 
+    # Compresión gzip de respuestas JSON (facturas, dashboard, catálogos)
+    COMPRESS_MIN_SIZE = 1024
+
+    @app.after_request
+    def compress_json(response):
+        if (
+            response.mimetype != "application/json"
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or response.is_streamed
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        if "gzip" not in request.accept_encodings:
+            return response
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+        # La versión gzip no es idéntica byte a byte: un ETag fuerte no puede
+        # compartirse entre codificaciones (If-None-Match compara en débil)
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
     # Registrar rutas
     from src.web.routes import register_routes
     register_routes(app)
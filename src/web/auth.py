@@ -1,6 +1,5 @@
 """Autenticación con Flask-Login — usuarios desde JSON."""
 
-import json
 import logging
 import time
 from collections import defaultdict
@@ -32,6 +31,8 @@ class User(UserMixin):
         self.nombre = nombre
         self.rol = rol
         self.cursos = cursos or []
+        # Conjunto inmutable de ids para filtrar datos en O(1) por curso
+        self.cursos_set = frozenset(int(c) for c in self.cursos)
         self.password_hash = password_hash
 
     def to_dict(self):
@@ -44,23 +45,21 @@ class User(UserMixin):
         }
 
 
-def _load_users_file():
-    """Lee usuarios.json y retorna la lista de dicts."""
-    path = settings.USUARIOS_PATH
-    if not path.exists():
-        logger.warning("Archivo de usuarios no encontrado: %s", path)
-        return []
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data.get("usuarios", [])
+def _load_users_index():
+    """Lee usuarios.json (más el log usuarios.jsonl) y retorna {email.lower(): dict}."""
+    # Import diferido: user_manager importa hash_password desde este módulo
+    from src.web import user_manager
+
+    # Solo lectura: sin copia del caché de user_manager
+    index = user_manager._load_users_indexed(copy_result=False)[1]
+    if not index and not settings.USUARIOS_PATH.exists():
+        logger.warning("Archivo de usuarios no encontrado: %s", settings.USUARIOS_PATH)
+    return index
 
 
 def _find_user_data(email):
     """Busca un usuario por email en el JSON."""
-    for u in _load_users_file():
-        if u["email"].lower() == email.lower():
-            return u
-    return None
+    return _load_users_index().get(email.lower())
 
 
 @login_manager.user_loader
@@ -103,11 +102,16 @@ def verify_password(email, password):
     return None
 
 
-def hash_password(password):
-    """Genera hash bcrypt de una contraseña."""
+# Costo bcrypt por defecto. checkpw lee el costo desde el propio hash, así que
+# hashes generados con otro costo (--bcrypt-rounds) siguen verificando.
+BCRYPT_ROUNDS = 12
+
+
+def hash_password(password, rounds=None):
+    """Genera hash bcrypt de una contraseña (rounds=None usa BCRYPT_ROUNDS)."""
     return bcrypt.hashpw(
         password.encode("utf-8"),
-        bcrypt.gensalt(rounds=12),
+        bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS),
     ).decode("utf-8")
 
 
@@ -9,6 +9,7 @@ from pathlib import Path
 import requests
 
 from config import settings
+from src.reports.email_sender import obtener_token_azure
 from src.web import user_manager
 
 logger = logging.getLogger(__name__)
@@ -17,7 +18,6 @@ logger = logging.getLogger(__name__)
 _reset_tokens_path = settings.PROJECT_ROOT / "data" / "config" / "reset_tokens.json"
 TOKEN_EXPIRY_SECONDS = 3600  # 1 hora
 
-GRAPH_TOKEN_URL = "https://login.microsoftonline.com/{tenant}/oauth2/v2.0/token"
 GRAPH_SEND_MAIL_URL = "https://graph.microsoft.com/v1.0/users/{user}/sendMail"
 
 
@@ -120,31 +120,8 @@ def invalidar_token_reset(token):
 
 
 def _obtener_token_azure():
-    """Obtiene access token de Azure AD."""
-    client_id = settings.AZURE_CLIENT_ID
-    tenant_id = settings.AZURE_TENANT_ID
-    client_secret = settings.AZURE_CLIENT_SECRET
-
-    if not all([client_id, tenant_id, client_secret]):
-        raise RuntimeError(
-            "Credenciales Azure incompletas. Verificar AZURE_CLIENT_ID, "
-            "AZURE_TENANT_ID, AZURE_CLIENT_SECRET en .env"
-        )
-
-    url = GRAPH_TOKEN_URL.format(tenant=tenant_id)
-    data = {
-        "client_id": client_id,
-        "client_secret": client_secret,
-        "scope": "https://graph.microsoft.com/.default",
-        "grant_type": "client_credentials",
-    }
-
-    resp = requests.post(url, data=data, timeout=30)
-
-    if resp.status_code != 200:
-        raise RuntimeError(f"Error obteniendo token Azure (HTTP {resp.status_code})")
-
-    return resp.json().get("access_token")
+    """Obtiene access token de Azure AD (cacheado, ver email_sender)."""
+    return obtener_token_azure()
 
 
 def enviar_email_credenciales(email, nombre, password, base_url):
@@ -243,9 +220,9 @@ def enviar_email_credenciales(email, nombre, password, base_url):
             return True
         else:
             logger.error(
-                "Error enviando email de credenciales (HTTP %d): %s",
+                "Error enviando email de credenciales (HTTP %d): %.200s",
                 resp.status_code,
-                resp.text[:200]
+                resp.text
             )
             return False
 
@@ -350,9 +327,9 @@ def enviar_email_reset(email, token, base_url):
             return True
         else:
             logger.error(
-                "Error enviando email de reset (HTTP %d): %s",
+                "Error enviando email de reset (HTTP %d): %.200s",
                 resp.status_code,
-                resp.text[:200]
+                resp.text
             )
             return False
 
@@ -1,62 +1,516 @@
 """Rutas del servidor web del dashboard."""
 
+import gzip
+import hashlib
+import html
 import json
 from datetime import datetime as _dt
 import logging
+import os
+import re
 import secrets
+import sqlite3
 import string
+import subprocess
+import sys
+import tempfile
+import threading
 import time
-from collections import defaultdict
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 from pathlib import Path
 
-from flask import jsonify, redirect, render_template, request, session, url_for
+import orjson
+from flask import (
+    Response, jsonify, redirect, render_template, request, send_file, session,
+    url_for,
+)
 from flask_login import current_user, login_required, login_user, logout_user
 
 from config import settings
+from src.reports.email_sender import enviar_correos_individuales
 from src.web.auth import check_login_rate_limit, hash_password, verify_password
 from src.web import password_reset, user_manager
 
 logger = logging.getLogger(__name__)
 
-# Rate limiting para envío de correo: máximo 10 por minuto
-_email_timestamps = defaultdict(list)
+# Rate limiting para envío de correo: máximo 10 por minuto.
+# Contador de ventana deslizante aproximada: por IP solo se guarda
+# (id_ventana, envíos_ventana_actual, envíos_ventana_anterior)
 RATE_LIMIT_MAX = 10
 RATE_LIMIT_WINDOW = 60  # segundos
+RATE_LIMIT_GC_EVERY = 1024  # llamadas entre limpiezas de IPs inactivas
+RATE_LIMIT_MAX_IPS = 10_000  # tope de IPs en memoria (se descarta la menos reciente)
+_window_state = {}  # ip -> (id_ventana, actual, anterior); orden de inserción = LRU
+_rate_limit_calls = [0]
+_rate_limit_lock = threading.Lock()
+# Con RATE_LIMIT_DB_PATH: BDs cuyo esquema ya se creó en este proceso y
+# conexión reutilizada por hilo, para dejar fuera del camino caliente el DDL
+_rate_limit_db_listas = set()
+_rate_limit_db_lock = threading.Lock()
+_rate_limit_local = threading.local()
+
+# Pool para enviar correos sin bloquear el worker de gunicorn
+_mail_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="mail")
+EMAIL_LOTE = 50  # destinatarios por tarea del pool (un fallo no frena al resto)
+# Estado de cada envío en OUTPUT_PATH/mail_status_<job_id>.json: el polling
+# puede llegar a otro worker de gunicorn. Los archivos con más de
+# MAIL_STATUS_TTL se borran, a lo más una vez cada MAIL_PRUNE_INTERVAL.
+MAIL_STATUS_TTL = 24 * 3600  # segundos
+MAIL_PRUNE_INTERVAL = 600  # segundos
+_mail_prune = {"proxima": 0.0}
+_mail_prune_lock = threading.Lock()
+
+# Health check: respuesta cacheable por proxies/balanceadores y memo en proceso
+HEALTH_MAX_AGE = 30  # segundos (Cache-Control)
+HEALTH_TTL = 10  # segundos que se reutiliza fecha_datos sin consultar el caché de datos
+_health_cache = {"key": None, "expira": 0.0, "fecha_datos": None}
+
+# fecha_procesamiento al inicio del JSON (metadata es la primera clave)
+_FECHA_PROCESAMIENTO_RE = re.compile(rb'"fecha_procesamiento"\s*:\s*"([^"]*)"')
+HEALTH_SCAN_BYTES = 4096
+
+# Email sintácticamente válido; _EMAILS_RE valida una lista unida por "\n"
+# en una sola pasada del motor de regex (sin un match por dirección)
+_EMAIL_RE = re.compile(r"[^\s@,]+@[^\s@,]+\.[^\s@,]+")
+_EMAILS_RE = re.compile(r"(?:[^\s@,]+@[^\s@,]+\.[^\s@,]+\n)*")
+
+# job_id de refresh: hex corto (evita path traversal en refresh_status_<id>.json)
+_JOB_ID_RE = re.compile(r"^[a-f0-9]{1,32}$")
+
+# Saltos de línea del cuerpo de correo: "\n\n" separa párrafos, "\n" es <br>
+_SALTOS_RE = re.compile(r"\n\n?")
+_SALTOS_HTML = {"\n\n": "</p><p>", "\n": "<br>"}
 
 # Caché en memoria para datos_procesados.json (evita leer disco en cada request)
-_datos_cache = {"data": None, "mtime": 0.0}
+# "vistas" guarda {"etag", "body", "gz"} ya serializados por conjunto de cursos
+# visibles ("gz" se llena con el primer cliente que acepta gzip)
+# "indice" mapea id_moodle (int) -> (posición, curso) para filtrar por usuario
+_datos_cache = {"key": None, "data": None, "vistas": {}, "indice": {}}
+_datos_lock = threading.Lock()
+VISTA_GZIP_MIN_SIZE = 1024  # bytes; igual que COMPRESS_MIN_SIZE de app.py
 
 
 def _get_datos_cached(json_path):
-    """Lee JSON del disco solo si el archivo cambió (check mtime)."""
+    """Lee JSON del disco solo si el archivo cambió (check mtime + tamaño)."""
     try:
-        mtime = json_path.stat().st_mtime
+        st = json_path.stat()
     except FileNotFoundError:
         return None
-    if _datos_cache["data"] is not None and mtime == _datos_cache["mtime"]:
+    # El tamaño detecta reescrituras dentro de la misma resolución de mtime
+    key = (str(json_path), st.st_mtime_ns, st.st_size)
+    if _datos_cache["data"] is not None and key == _datos_cache["key"]:
         return _datos_cache["data"]
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    _datos_cache["data"] = data
-    _datos_cache["mtime"] = mtime
+    with _datos_lock:
+        # Otro thread pudo haber recargado mientras esperábamos el lock
+        if _datos_cache["data"] is not None and key == _datos_cache["key"]:
+            return _datos_cache["data"]
+        # orjson parsea bytes directamente (sin decodificar a str antes)
+        data = orjson.loads(json_path.read_bytes())
+        _datos_cache["data"] = data
+        _datos_cache["vistas"] = {}
+        _datos_cache["indice"] = _indexar_cursos(data)
+        _datos_cache["key"] = key
     return data
 
 
+def _indexar_cursos(datos):
+    """Construye {id_moodle: (posición, curso)} para los cursos con id numérico."""
+    indice = {}
+    for pos, c in enumerate(datos.get("cursos", [])):
+        try:
+            indice[int(c.get("id_moodle", 0))] = (pos, c)
+        except (TypeError, ValueError):
+            continue
+    return indice
+
+
+def _seleccionar_cursos(datos, cursos):
+    """Retorna los cursos de ``datos`` cuyo id está en ``cursos``.
+
+    Usa el índice del caché cuando ``datos`` es la versión cacheada, de modo
+    que el costo depende de los cursos del usuario y no del total. Mantiene
+    el orden original del archivo.
+    """
+    if datos is _datos_cache["data"]:
+        indice = _datos_cache["indice"]
+    else:
+        indice = _indexar_cursos(datos)
+    encontrados = sorted(indice[i] for i in cursos if i in indice)
+    return [c for _, c in encontrados]
+
+
+def _leer_metadata_sidecar(json_path):
+    """Lee la metadata desde el sidecar del pipeline.
+
+    Retorna None si no existe o es más antiguo que el JSON principal, en
+    cuyo caso hay que leer la metadata desde el JSON completo.
+    """
+    meta_path = json_path.with_name(settings.JSON_META_FILENAME)
+    try:
+        if meta_path.stat().st_mtime_ns < json_path.stat().st_mtime_ns:
+            return None
+        return orjson.loads(meta_path.read_bytes())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+
+
+def _gz_vigente(gz_path, json_path):
+    """True si existe la copia .gz y no es más antigua que el JSON."""
+    try:
+        return gz_path.stat().st_mtime_ns >= json_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def _escanear_fecha_procesamiento(json_path):
+    """Busca fecha_procesamiento en los primeros bytes del JSON, sin parsearlo.
+
+    Retorna None si no aparece antes de la lista de cursos.
+    """
+    try:
+        with open(json_path, "rb") as f:
+            cabeza = f.read(HEALTH_SCAN_BYTES)
+    except FileNotFoundError:
+        return None
+    cabeza = cabeza.split(b'"cursos"', 1)[0]
+    match = _FECHA_PROCESAMIENTO_RE.search(cabeza)
+    return match.group(1).decode("utf-8") if match else None
+
+
+def _filtrar_datos(datos, cursos):
+    """Retorna una copia de ``datos`` con solo los cursos indicados."""
+    cursos_filtrados = _seleccionar_cursos(datos, cursos)
+    datos_filtrados = {
+        "metadata": dict(datos.get("metadata", {})),
+        "cursos": cursos_filtrados,
+    }
+    # Recalcular metadata (el pipeline ya dejó el conteo por curso en estadisticas)
+    datos_filtrados["metadata"]["total_cursos"] = len(cursos_filtrados)
+    datos_filtrados["metadata"]["total_estudiantes"] = sum(
+        c.get("estadisticas", {}).get("total_estudiantes", 0) for c in cursos_filtrados
+    )
+    return datos_filtrados
+
+
+def _get_vista_datos(datos, cursos=None, gzip_ok=False):
+    """Retorna (etag, bytes, en_gzip) del JSON visible para ``cursos`` (None = todo).
+
+    La vista serializada, y su versión gzip si ``gzip_ok``, se cachea junto a
+    ``datos`` y se descarta cuando el archivo cambia en disco. La versión gzip
+    lleva su propio ETag ("<hash>-gzip"): dos codificaciones no pueden
+    compartir un validador fuerte.
+    """
+    vista_key = None if cursos is None else tuple(sorted(cursos))
+    with _datos_lock:
+        vista = None
+        if _datos_cache["data"] is datos:
+            vista = _datos_cache["vistas"].get(vista_key)
+
+    if vista is None:
+        payload = datos if cursos is None else _filtrar_datos(datos, cursos)
+        # orjson serializa directo a bytes UTF-8, bastante más rápido que json
+        body = orjson.dumps(payload)
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        vista = {"etag": etag, "body": body, "gz": None}
+        with _datos_lock:
+            if _datos_cache["data"] is datos:
+                _datos_cache["vistas"][vista_key] = vista
+
+    if not gzip_ok or len(vista["body"]) < VISTA_GZIP_MIN_SIZE:
+        return vista["etag"], vista["body"], False
+    if vista["gz"] is None:
+        # Dos requests simultáneos pueden comprimir ambos: mismo resultado
+        vista["gz"] = gzip.compress(vista["body"], compresslevel=6)
+    return f'{vista["etag"]}-gzip', vista["gz"], True
+
+
+def _texto_a_html(texto):
+    """Convierte texto plano a HTML básico (escapado, párrafos y <br>)."""
+    escapado = html.escape(texto, quote=False)
+    return "<p>" + _SALTOS_RE.sub(_salto_a_html, escapado) + "</p>"
+
+
+def _salto_a_html(match):
+    return _SALTOS_HTML[match.group()]
+
+
+def _purgar_ips_inactivas(now):
+    """Elimina IPs cuyas dos ventanas ya vencieron (acota memoria)."""
+    win = int(now // RATE_LIMIT_WINDOW)
+    for ip, (stored_win, _, _) in list(_window_state.items()):
+        if stored_win < win - 1:
+            del _window_state[ip]
+
+
+def _conexion_rate_limit(db_path):
+    """Conexión de este hilo a la BD del rate limit compartido.
+
+    El esquema se crea una sola vez por proceso y ruta (como init_db_una_vez);
+    la conexión se reabre si cambió la ruta o el proceso (fork de gunicorn).
+    """
+    clave = (os.getpid(), str(db_path))
+    actual = getattr(_rate_limit_local, "conn", None)
+    if actual is not None and actual[0] == clave:
+        return actual[1]
+
+    if clave not in _rate_limit_db_listas:
+        with _rate_limit_db_lock:
+            if clave not in _rate_limit_db_listas:
+                ddl = sqlite3.connect(db_path, timeout=5)
+                try:
+                    with ddl:
+                        ddl.execute(
+                            "CREATE TABLE IF NOT EXISTS envios_correo "
+                            "(ip TEXT NOT NULL, ts REAL NOT NULL)"
+                        )
+                        ddl.execute(
+                            "CREATE INDEX IF NOT EXISTS idx_envios_correo_ip "
+                            "ON envios_correo(ip, ts)"
+                        )
+                finally:
+                    ddl.close()
+                _rate_limit_db_listas.add(clave)
+
+    if actual is not None and actual[0][0] == clave[0]:
+        actual[1].close()
+    conn = sqlite3.connect(db_path, timeout=5, isolation_level=None)
+    _rate_limit_local.conn = (clave, conn)
+    return conn
+
+
+def _check_rate_limit_compartido(ip, db_path):
+    """Ventana deslizante en SQLite, compartida por todos los workers.
+
+    BEGIN IMMEDIATE serializa a los workers que consultan a la vez, así el
+    conteo y la inserción son atómicos entre procesos.
+    """
+    now = time.time()
+    conn = _conexion_rate_limit(db_path)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # La tabla sólo guarda la ventana actual: purgar todo lo vencido
+        conn.execute("DELETE FROM envios_correo WHERE ts <= ?", (now - RATE_LIMIT_WINDOW,))
+        (count,) = conn.execute(
+            "SELECT COUNT(*) FROM envios_correo WHERE ip = ?", (ip,)
+        ).fetchone()
+        excedido = count >= RATE_LIMIT_MAX
+        if not excedido:
+            conn.execute("INSERT INTO envios_correo (ip, ts) VALUES (?, ?)", (ip, now))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return excedido
+
+
 def _check_rate_limit(ip):
     """Retorna True si el IP excedió el límite de envíos."""
-    now = time.time()
-    # Limpiar timestamps viejos
-    _email_timestamps[ip] = [
-        t for t in _email_timestamps[ip] if now - t < RATE_LIMIT_WINDOW
-    ]
-    if len(_email_timestamps[ip]) >= RATE_LIMIT_MAX:
-        return True
-    _email_timestamps[ip].append(now)
-    return False
+    if settings.RATE_LIMIT_DB_PATH:
+        return _check_rate_limit_compartido(ip, settings.RATE_LIMIT_DB_PATH)
+
+    # Lectura-modificación-escritura atómica frente a workers con threads
+    with _rate_limit_lock:
+        now = time.monotonic()
+
+        # Cada RATE_LIMIT_GC_EVERY llamadas, limpiar IPs que ya no envían
+        _rate_limit_calls[0] += 1
+        if _rate_limit_calls[0] >= RATE_LIMIT_GC_EVERY:
+            _rate_limit_calls[0] = 0
+            _purgar_ips_inactivas(now)
+
+        win = int(now // RATE_LIMIT_WINDOW)
+        # pop + reinserción deja la IP al final del dict (más reciente)
+        stored_win, cur, prev = _window_state.pop(ip, (win, 0, 0))
+        if win == stored_win + 1:
+            # Pasamos a la ventana siguiente: la actual pasa a ser la anterior
+            prev, cur = cur, 0
+        elif win != stored_win:
+            prev, cur = 0, 0
+
+        # La ventana anterior pesa según cuánto de ella cae aún en los últimos W segundos
+        elapsed = now - win * RATE_LIMIT_WINDOW
+        aprox = prev * (1 - elapsed / RATE_LIMIT_WINDOW) + cur
+        excedido = aprox >= RATE_LIMIT_MAX
+        _window_state[ip] = (win, cur, prev) if excedido else (win, cur + 1, prev)
+        # Si sobran IPs, sale la menos reciente (la primera del dict)
+        if len(_window_state) > RATE_LIMIT_MAX_IPS:
+            del _window_state[next(iter(_window_state))]
+        return excedido
+
+
+def _enviar_correo_background(enviar, **kwargs):
+    """Ejecuta ``enviar`` (enviar_correos_individuales) en el pool y registra el resultado."""
+    try:
+        resultado = enviar(dry_run=False, **kwargs)
+    except Exception:
+        logger.exception("Error enviando correo desde dashboard a %s", kwargs.get("destinatarios"))
+        return {"status": "ERROR", "detalle": "Excepción no controlada"}
+
+    if resultado["status"] == "OK":
+        logger.info("Correo enviado desde dashboard a %s", kwargs.get("destinatarios"))
+    else:
+        logger.error("Error enviando correo desde dashboard: %s", resultado["detalle"])
+    return resultado
+
+
+def admin_required(view):
+    """Rechaza con 403 a usuarios no admin antes de ejecutar la vista.
+
+    Se aplica debajo de ``@login_required``: corta antes de leer el body o
+    tocar el rate limit. Con LOGIN_DISABLED (tests) el anónimo pasa.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_user.is_authenticated and current_user.rol != "admin":
+            return jsonify({"error": "No autorizado"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _precargar_datos():
+    """Carga datos_procesados.json al crear la app.
+
+    Con preload_app de gunicorn esto corre en el master: los workers heredan
+    el dict ya parseado (copy-on-write) en vez de leer el archivo cada uno.
+    """
+    try:
+        _get_datos_cached(settings.JSON_DATOS_PATH)
+    except Exception as e:  # JSON corrupto no debe impedir levantar la app
+        logger.warning("No se pudo precargar %s: %s", settings.JSON_DATOS_PATH, e)
+
+
+def _es_lista_de_str(valor):
+    return isinstance(valor, list) and all(isinstance(v, str) for v in valor)
+
+
+def _parsear_pedido_correo(raw):
+    """Decodifica y valida el body de /api/enviar-correo en una pasada.
+
+    Retorna ``((destinatarios, asunto, cuerpo, cc), None)`` o ``(None, error)``.
+    """
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        data = None
+    if not data or not isinstance(data, dict):
+        return None, "Body JSON requerido"
+
+    destinatarios = data.get("destinatarios", [])
+    asunto = data.get("asunto", "")
+    cuerpo = data.get("cuerpo", "")
+    cc = data.get("cc", [])
+    if not (_es_lista_de_str(destinatarios) and _es_lista_de_str(cc)
+            and isinstance(asunto, str) and isinstance(cuerpo, str)):
+        return None, "Tipos inválidos en el body"
+
+    asunto = asunto.strip()
+    cuerpo = cuerpo.strip()
+    if not destinatarios:
+        return None, "Se requiere al menos un destinatario"
+    direcciones = destinatarios + cc
+    if not _EMAILS_RE.fullmatch("\n".join(direcciones) + "\n"):
+        invalido = next(e for e in direcciones if not _EMAIL_RE.fullmatch(e))
+        return None, f"Email inválido: {invalido}"
+    if not asunto:
+        return None, "Se requiere asunto"
+    if not cuerpo:
+        return None, "Se requiere cuerpo del mensaje"
+    return (destinatarios, asunto, cuerpo, cc), None
+
+
+def _mail_status_path(job_id):
+    return settings.OUTPUT_PATH / f"mail_status_{job_id}.json"
+
+
+def _escribir_estado_mail(job_id, estado):
+    """Escribe el estado de un envío de forma atómica (tmp + os.replace)."""
+    path = _mail_status_path(job_id)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(orjson.dumps(estado))
+    os.replace(tmp, path)
+
+
+def _mtime_o_none(path):
+    """mtime del archivo, o None si otro worker lo borró entretanto."""
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _purgar_estados_mail():
+    """Borra los estados de envío más antiguos que MAIL_STATUS_TTL.
+
+    Corre a lo más una vez cada MAIL_PRUNE_INTERVAL por proceso. Los archivos
+    son compartidos entre workers, así que uno puede desaparecer entre el
+    glob y el stat: se ignora.
+    """
+    ahora = time.monotonic()
+    with _mail_prune_lock:
+        if ahora < _mail_prune["proxima"]:
+            return
+        _mail_prune["proxima"] = ahora + MAIL_PRUNE_INTERVAL
+    limite = time.time() - MAIL_STATUS_TTL
+    for path in settings.OUTPUT_PATH.glob("mail_status_*.json"):
+        mtime = _mtime_o_none(path)
+        if mtime is not None and mtime < limite:
+            path.unlink(missing_ok=True)
+
+
+def _registrar_mail_job(futures):
+    """Registra un envío como pendiente y retorna su job_id.
+
+    Cuando terminan todos sus lotes, el último en terminar escribe el
+    resultado final en el archivo de estado.
+    """
+    job_id = uuid.uuid4().hex
+    settings.OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+    _escribir_estado_mail(job_id, {"status": "pending", "job_id": job_id})
+
+    _purgar_estados_mail()
+
+    pendientes = [len(futures)]
+    lock = threading.Lock()
+
+    def _al_terminar(_future):
+        with lock:
+            pendientes[0] -= 1
+            if pendientes[0]:
+                return
+        errores = [r["detalle"] for r in (f.result() for f in futures)
+                   if r["status"] != "OK"]
+        _escribir_estado_mail(job_id, {
+            "status": "ERROR" if errores else "OK",
+            "job_id": job_id,
+            "errores": errores,
+        })
+
+    for future in futures:
+        future.add_done_callback(_al_terminar)
+    return job_id
 
 
 def register_routes(app):
     """Registra todas las rutas en la app Flask."""
+    _precargar_datos()
+
+    # CC por defecto de los correos del dashboard (fijo mientras corre la app)
+    default_cc = settings.EMAIL_CC
+
+    # dashboard.html solo depende del token CSRF de la sesión: se renderiza una
+    # vez con un marcador y en cada request se reemplaza el token
+    csrf_marcador = f"__csrf_{secrets.token_hex(8)}__"
+    dashboard_cache = {"html": None}
+
+    def _render_dashboard():
+        token = session.get("_csrf_token")
+        if token is None or app.debug:
+            return render_template("dashboard.html")
+        if dashboard_cache["html"] is None:
+            dashboard_cache["html"] = render_template("dashboard.html", csrf_token=csrf_marcador)
+        return dashboard_cache["html"].replace(csrf_marcador, token)
 
     # ── Login / Logout ────────────────────────────────────
 
@@ -103,7 +557,7 @@ def register_routes(app):
         logger.info("Login exitoso: %s (%s)", user.email, user.rol)
         return redirect(url_for("index"))
 
-    @app.route("/logout")
+    @app.get("/logout")
     def logout():
         """Destruye sesión y redirige al login."""
         if current_user.is_authenticated:
@@ -228,15 +682,15 @@ def register_routes(app):
 
     # ── Dashboard ─────────────────────────────────────────
 
-    @app.route("/")
+    @app.get("/")
     @login_required
     def index():
         """Redirects admins to hub, serves dashboard for others."""
         if current_user.rol == "admin":
             return redirect(url_for("hub"))
-        return render_template("dashboard.html")
+        return _render_dashboard()
 
-    @app.route("/hub")
+    @app.get("/hub")
     @login_required
     def hub():
         """Admin hub menu page."""
@@ -244,15 +698,15 @@ def register_routes(app):
             return redirect(url_for("index"))
         return render_template("hub.html")
 
-    @app.route("/dashboard")
+    @app.get("/dashboard")
     @login_required
     def dashboard():
         """Dashboard de cursos (accessible directly by URL)."""
-        return render_template("dashboard.html")
+        return _render_dashboard()
 
     # ── API: info del usuario ─────────────────────────────
 
-    @app.route("/api/me")
+    @app.get("/api/me")
     @login_required
     def api_me():
         """Retorna información del usuario actual."""
@@ -260,63 +714,83 @@ def register_routes(app):
 
     # ── API: datos ────────────────────────────────────────
 
-    @app.route("/api/datos")
+    @app.get("/api/datos")
     @login_required
     def api_datos():
         """Retorna datos_procesados.json, filtrado por rol."""
-        datos = _get_datos_cached(settings.JSON_DATOS_PATH)
+        json_path = settings.JSON_DATOS_PATH
+        # Admin (or unauthenticated when LOGIN_DISABLED) ve todo;
+        # comprador: solo sus cursos
+        ve_todo = not current_user.is_authenticated or current_user.rol == "admin"
+
+        if ve_todo and json_path.exists():
+            # El archivo completo se envía tal cual desde disco (sendfile),
+            # sin parsear ni re-serializar; ETag/304 por mtime y tamaño.
+            # Si el pipeline dejó la copia .gz al día, se envía esa.
+            gz_path = json_path.with_name(json_path.name + ".gz")
+            usar_gz = "gzip" in request.accept_encodings and _gz_vigente(gz_path, json_path)
+            response = send_file(
+                gz_path if usar_gz else json_path, mimetype="application/json",
+                download_name=json_path.name, conditional=True, etag=True,
+            )
+            if usar_gz:
+                response.content_encoding = "gzip"
+            response.vary.add("Accept-Encoding")
+            return response
+
+        datos = _get_datos_cached(json_path)
         if datos is None:
             return jsonify({
                 "error": "No se encontró datos_procesados.json. "
                          "Ejecute el pipeline primero: python -m src.main"
             }), 404
 
-        # Admin (or unauthenticated when LOGIN_DISABLED) ve todo
-        if not current_user.is_authenticated or current_user.rol == "admin":
-            return jsonify(datos)
-
-        # Comprador: filtrar solo sus cursos
-        cursos_filtrados = [
-            c for c in datos.get("cursos", [])
-            if int(c.get("id_moodle", 0)) in current_user.cursos
-        ]
-        datos_filtrados = {
-            "metadata": dict(datos.get("metadata", {})),
-            "cursos": cursos_filtrados,
-        }
-        # Recalcular metadata
-        datos_filtrados["metadata"]["total_cursos"] = len(cursos_filtrados)
-        datos_filtrados["metadata"]["total_estudiantes"] = sum(
-            len(c.get("estudiantes", [])) for c in cursos_filtrados
+        etag, body, en_gzip = _get_vista_datos(
+            datos, current_user.cursos_set, "gzip" in request.accept_encodings
         )
-        return jsonify(datos_filtrados)
+        response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+        # Ya comprimida desde el caché: compress_json no la vuelve a tocar
+        if en_gzip:
+            response.content_encoding = "gzip"
+        response.vary.add("Accept-Encoding")
+        # Responde 304 sin cuerpo si el navegador ya tiene esta versión
+        return response.make_conditional(request)
 
     # ── API: health (pública) ─────────────────────────────
 
-    @app.route("/api/health")
+    @app.get("/api/health")
     def api_health():
         """Health check — público, no requiere autenticación."""
-        datos = _get_datos_cached(settings.JSON_DATOS_PATH)
-        fecha_datos = datos.get("metadata", {}).get("fecha_procesamiento") if datos else None
+        key = str(settings.JSON_DATOS_PATH)
+        now = time.monotonic()
+        if _health_cache["key"] == key and now < _health_cache["expira"]:
+            fecha_datos = _health_cache["fecha_datos"]
+        else:
+            # Sidecar del pipeline → inicio del archivo → JSON completo
+            metadata = _leer_metadata_sidecar(settings.JSON_DATOS_PATH)
+            if metadata is not None:
+                fecha_datos = metadata.get("fecha_procesamiento")
+            else:
+                fecha_datos = _escanear_fecha_procesamiento(settings.JSON_DATOS_PATH)
+                if fecha_datos is None:
+                    datos = _get_datos_cached(settings.JSON_DATOS_PATH)
+                    fecha_datos = datos.get("metadata", {}).get("fecha_procesamiento") if datos else None
+            _health_cache.update(key=key, expira=now + HEALTH_TTL, fecha_datos=fecha_datos)
 
-        return jsonify({
+        response = jsonify({
             "status": "ok",
             "fecha_datos": fecha_datos,
         })
+        response.headers["Cache-Control"] = f"public, max-age={HEALTH_MAX_AGE}"
+        return response
 
     # ── API: refresh datos (todos los usuarios) ──────────────────
 
-    @app.route("/api/refresh", methods=["POST"])
+    @app.post("/api/refresh")
     @login_required
     def api_refresh():
         """Inicia refresh de datos Moodle en segundo plano. Todos los usuarios."""
-        import os
-        import re
-        import subprocess
-        import sys
-        import threading
-        import uuid
-
         try:
             logger.info("Refresh iniciado por %s", current_user.email)
 
@@ -406,24 +880,26 @@ def register_routes(app):
             )
             reaper.start()
 
-            return jsonify({
+            # 202: aceptado, el cliente consulta el avance en /api/refresh-status
+            response = jsonify({
                 "status": "started",
                 "job_id": job_id,
                 "mensaje": "Actualización iniciada en segundo plano",
             })
+            response.status_code = 202
+            response.headers["Location"] = url_for("api_refresh_status", job_id=job_id)
+            return response
 
         except Exception as e:
             logger.error("Error iniciando refresh en background: %s", e, exc_info=True)
             return jsonify({"error": f"Error al iniciar actualización: {str(e)}"}), 500
 
-    @app.route("/api/refresh-status/<job_id>", methods=["GET"])
+    @app.get("/api/refresh-status/<job_id>")
     @login_required
     def api_refresh_status(job_id):
         """Consulta el estado de un job de refresh iniciado en background."""
-        import re
-
         # Validar job_id para evitar path traversal
-        if not re.match(r'^[a-f0-9]{1,32}$', job_id):
+        if not _JOB_ID_RE.match(job_id):
             return jsonify({"error": "job_id inválido"}), 400
 
         project_root = Path(__file__).parent.parent.parent
@@ -434,14 +910,14 @@ def register_routes(app):
             return jsonify({"status": "running", "message": "Iniciando proceso..."}), 200
 
         try:
-            data = json.loads(status_path.read_text(encoding="utf-8"))
+            data = orjson.loads(status_path.read_bytes())
             return jsonify(data), 200
         except Exception as e:
             return jsonify({"status": "error", "message": str(e)}), 500
 
     # ── API: refresh COMPLETO (Moodle + SENCE, solo superadmins) ──
 
-    @app.route("/api/refresh-full", methods=["POST"])
+    @app.post("/api/refresh-full")
     @login_required
     def api_refresh_full():
         """Inicia actualización completa en segundo plano. Solo superadmins."""
@@ -449,12 +925,6 @@ def register_routes(app):
             return jsonify({"error": "No autorizado. Solo administradores principales."}), 403
 
         try:
-            import os
-            import subprocess
-            import sys
-            import threading
-            from datetime import datetime as _dt
-
             logger.info("Refresh COMPLETO (background) iniciado por %s", current_user.email)
 
             # Ruta al script de background
@@ -531,14 +1001,11 @@ def register_routes(app):
 
     # ── API: enviar correo (solo admin) ───────────────────
 
-    @app.route("/api/enviar-correo", methods=["POST"])
+    @app.post("/api/enviar-correo")
     @login_required
+    @admin_required
     def api_enviar_correo():
         """Envía correo a participantes seleccionados. Solo admin."""
-        # Solo admin puede enviar correos
-        if current_user.is_authenticated and current_user.rol != "admin":
-            return jsonify({"error": "No autorizado"}), 403
-
         # Rate limiting
         client_ip = request.remote_addr or "unknown"
         if _check_rate_limit(client_ip):
@@ -546,75 +1013,73 @@ def register_routes(app):
                 "error": "Demasiados envíos. Máximo 10 por minuto."
             }), 429
 
-        data = request.get_json(silent=True)
-        if not data:
-            return jsonify({"error": "Body JSON requerido"}), 400
-
-        destinatarios = data.get("destinatarios", [])
-        asunto = data.get("asunto", "").strip()
-        cuerpo = data.get("cuerpo", "").strip()
-        cc = data.get("cc", [])
-
-        if not destinatarios:
-            return jsonify({"error": "Se requiere al menos un destinatario"}), 400
-        if not asunto:
-            return jsonify({"error": "Se requiere asunto"}), 400
-        if not cuerpo:
-            return jsonify({"error": "Se requiere cuerpo del mensaje"}), 400
+        pedido, error = _parsear_pedido_correo(request.get_data(cache=False))
+        if error:
+            return jsonify({"error": error}), 400
+        destinatarios, asunto, cuerpo, cc = pedido
 
         # Convertir cuerpo texto plano a HTML básico
-        cuerpo_html = cuerpo.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-        cuerpo_html = "<p>" + cuerpo_html.replace("\n\n", "</p><p>").replace("\n", "<br>") + "</p>"
-
-        from src.reports.email_sender import enviar_correo
+        cuerpo_html = _texto_a_html(cuerpo)
+
+        cc_str = ", ".join(cc) if cc else default_cc
+
+        # El envío (token Azure + Graph API) corre fuera del request: un correo
+        # por destinatario, en lotes de EMAIL_LOTE por tarea del pool
+        futures = [
+            _mail_executor.submit(
+                _enviar_correo_background,
+                enviar_correos_individuales,
+                destinatarios=destinatarios[i:i + EMAIL_LOTE],
+                asunto=asunto,
+                cuerpo_html=cuerpo_html,
+                cc=cc_str,
+            )
+            for i in range(0, len(destinatarios), EMAIL_LOTE)
+        ]
+        job_id = _registrar_mail_job(futures)
 
-        email_str = ", ".join(destinatarios)
-        cc_str = ", ".join(cc) if cc else settings.EMAIL_CC
+        logger.info("Correo encolado desde dashboard para %s (job %s)", destinatarios, job_id)
+        response = jsonify({
+            "status": "queued",
+            "job_id": job_id,
+            "encolados": len(destinatarios),
+        })
+        response.headers["Location"] = url_for("api_enviar_correo_status", job_id=job_id)
+        return response, 202
 
-        resultado = enviar_correo(
-            destinatario=email_str,
-            asunto=asunto,
-            cuerpo_html=cuerpo_html,
-            cc=cc_str,
-            dry_run=False,
-        )
+    @app.get("/api/enviar-correo/<job_id>")
+    @login_required
+    @admin_required
+    def api_enviar_correo_status(job_id):
+        """Consulta el estado de un envío encolado por /api/enviar-correo."""
+        if not _JOB_ID_RE.match(job_id):
+            return jsonify({"error": "job_id inválido"}), 400
 
-        if resultado["status"] == "OK":
-            logger.info("Correo enviado desde dashboard a %s", destinatarios)
-            return jsonify({
-                "status": "ok",
-                "enviados": len(destinatarios),
-            })
-        else:
-            logger.error("Error enviando correo desde dashboard: %s", resultado["detalle"])
-            return jsonify({
-                "error": resultado["detalle"],
-            }), 500
+        try:
+            estado = _mail_status_path(job_id).read_bytes()
+        except FileNotFoundError:
+            return jsonify({"error": "Envío no encontrado"}), 404
+        return Response(estado, mimetype="application/json")
 
     # ── API: descargar Excel ──────────────────────────────
 
-    @app.route("/api/descargar-excel")
+    @app.get("/api/descargar-excel")
     @login_required
     def api_descargar_excel():
         """Genera y descarga un archivo Excel con los datos visibles."""
-        from datetime import datetime
-        from io import BytesIO
-        from flask import send_file
         from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 
         # Cargar datos
-        json_path = settings.JSON_DATOS_PATH
-        if not json_path.exists():
+        datos = _get_datos_cached(settings.JSON_DATOS_PATH)
+        if datos is None:
             return jsonify({"error": "No hay datos disponibles"}), 404
 
-        with open(json_path, "r", encoding="utf-8") as f:
-            datos = json.load(f)
-
         # Filtrar por rol
         cursos = datos.get("cursos", [])
         if current_user.is_authenticated and current_user.rol == "comprador":
-            cursos = [c for c in cursos if int(c.get("id_moodle", 0)) in current_user.cursos]
+            cursos = _seleccionar_cursos(datos, current_user.cursos_set)
 
         # Filtrar por parámetro de query (cursos visibles)
         cursos_param = request.args.get("cursos", "")
@@ -625,15 +1090,17 @@ def register_routes(app):
         if not cursos:
             return jsonify({"error": "No hay cursos para descargar"}), 404
 
-        # Crear workbook
-        wb = Workbook()
-        wb.remove(wb.active)  # Remover hoja por defecto
+        # Crear workbook en modo streaming: las filas se escriben a disco a
+        # medida que se agregan y no quedan objetos Cell vivos en memoria
+        wb = Workbook(write_only=True)
 
         # Estilos
         header_fill = PatternFill(start_color="2563EB", end_color="2563EB", fill_type="solid")
         header_font = Font(bold=True, color="FFFFFF", size=11)
         title_font = Font(bold=True, size=13)
         subtitle_font = Font(size=11, italic=True)
+        link_font = Font(color="0563C1", underline="single")
+        center = Alignment(horizontal='center')
         border = Border(
             left=Side(style='thin'),
             right=Side(style='thin'),
@@ -641,6 +1108,34 @@ def register_routes(app):
             bottom=Side(style='thin')
         )
 
+        # Estilos con nombre: se registran una sola vez en el workbook y las
+        # celdas de datos sólo referencian el nombre (sin objetos por celda)
+        wb.add_named_style(NamedStyle(name="data_cell", border=border))
+        wb.add_named_style(NamedStyle(name="data_center", border=border, alignment=center))
+
+        def celda(ws, value, font=None, fill=None, alignment=None, borde=None, hyperlink=None, style=None):
+            """Crea una WriteOnlyCell con los estilos indicados."""
+            cell = WriteOnlyCell(ws, value=value)
+            if style is not None:
+                cell.style = style
+            if font is not None:
+                cell.font = font
+            if fill is not None:
+                cell.fill = fill
+            if alignment is not None:
+                cell.alignment = alignment
+            if borde is not None:
+                cell.border = borde
+            if hyperlink is not None:
+                cell.hyperlink = hyperlink
+            return cell
+
+        def fila_headers(ws, headers):
+            return [
+                celda(ws, h, font=header_font, fill=header_fill, alignment=center, borde=border)
+                for h in headers
+            ]
+
         # Helper para sanear nombres de hoja (Excel no permite / \ ? * [ ] :)
         def sanitizar_nombre_hoja(nombre):
             nombre = nombre.replace('/', ' ').replace('\\', ' ')
@@ -649,87 +1144,88 @@ def register_routes(app):
             nombre = nombre.replace(':', '-')
             return nombre[:31]  # Límite de Excel
 
-        # Crear hoja índice
-        ws_index = wb.create_sheet(title="Índice", index=0)
-        ws_index['A1'] = "Instituto de Capacitaciones Tecnipro"
-        ws_index['A1'].font = Font(bold=True, size=16)
-        ws_index['A2'] = "Reporte de Capacitación"
-        ws_index['A2'].font = title_font
-        ws_index['A3'] = f"Fecha: {datetime.now().strftime('%d/%m/%Y')}"
-        ws_index['A3'].font = subtitle_font
-
-        # Headers de tabla índice
-        index_headers = ["N°", "ID Curso", "Nombre del Curso", "Participantes", "Progreso Promedio", "Aprobados", "Estado"]
-        for col_idx, header in enumerate(index_headers, start=1):
-            cell = ws_index.cell(row=5, column=col_idx, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center')
-            cell.border = border
-
-        # Crear hojas de cursos y llenar índice
-        for idx, curso in enumerate(cursos, start=1):
+        # Crear hojas en orden (índice primero) para conocer los títulos finales
+        ws_index = wb.create_sheet(title="Índice")
+        hojas = []
+        for curso in cursos:
             # Nombre de hoja: usar nombre corto o nombre completo (sanitizado)
             nombre_base = curso.get("nombre_corto") or curso.get("nombre") or curso.get("id_moodle", "Curso")
-            nombre_hoja = sanitizar_nombre_hoja(nombre_base)
-            ws = wb.create_sheet(title=nombre_hoja)
-
-            # Fila en índice (5 es header, 6 es primera fila de datos)
-            row_index = idx + 5
-            stats = curso.get("estadisticas", {})
+            hojas.append(wb.create_sheet(title=sanitizar_nombre_hoja(nombre_base)))
 
-            # Llenar fila de índice
-            ws_index.cell(row=row_index, column=1, value=idx).border = border
-            ws_index.cell(row=row_index, column=2, value=curso.get("id_moodle", "")).border = border
+        # ── Hoja índice ──
+        # Anchos de columna (deben definirse antes de escribir filas)
+        ws_index.column_dimensions['A'].width = 5   # N°
+        ws_index.column_dimensions['B'].width = 10  # ID Curso
+        ws_index.column_dimensions['C'].width = 50  # Nombre (con hyperlink)
+        ws_index.column_dimensions['D'].width = 14  # Participantes
+        ws_index.column_dimensions['E'].width = 18  # Progreso Promedio
+        ws_index.column_dimensions['F'].width = 12  # Aprobados
+        ws_index.column_dimensions['G'].width = 12  # Estado
 
-            # Nombre con hyperlink a la hoja del curso
-            cell_nombre = ws_index.cell(row=row_index, column=3, value=curso.get("nombre", "Sin nombre"))
-            cell_nombre.hyperlink = f"#{nombre_hoja}!A1"
-            cell_nombre.font = Font(color="0563C1", underline="single")
-            cell_nombre.border = border
+        ws_index.append([celda(ws_index, "Instituto de Capacitaciones Tecnipro", font=Font(bold=True, size=16))])
+        ws_index.append([celda(ws_index, "Reporte de Capacitación", font=title_font)])
+        ws_index.append([celda(ws_index, f"Fecha: {_dt.now().strftime('%d/%m/%Y')}", font=subtitle_font)])
+        ws_index.append([])
 
-            ws_index.cell(row=row_index, column=4, value=stats.get("total_estudiantes", 0)).border = border
-            ws_index.cell(row=row_index, column=5, value=f"{stats.get('promedio_progreso', 0):.1f}%").border = border
-            ws_index.cell(row=row_index, column=6, value=stats.get("aprobados", 0)).border = border
+        # Headers de tabla índice (fila 5)
+        index_headers = ["N°", "ID Curso", "Nombre del Curso", "Participantes", "Progreso Promedio", "Aprobados", "Estado"]
+        ws_index.append(fila_headers(ws_index, index_headers))
 
+        # Filas de índice (6 es primera fila de datos)
+        for idx, (curso, ws) in enumerate(zip(cursos, hojas), start=1):
+            stats = curso.get("estadisticas", {})
             estado_curso = "Activo" if curso.get("dias_restantes", 0) >= 0 else "Vencido"
-            ws_index.cell(row=row_index, column=7, value=estado_curso).border = border
+            ws_index.append([
+                celda(ws_index, idx, style="data_cell"),
+                celda(ws_index, curso.get("id_moodle", ""), style="data_cell"),
+                # Nombre con hyperlink a la hoja del curso
+                celda(ws_index, curso.get("nombre", "Sin nombre"), font=link_font,
+                      style="data_cell", hyperlink=f"#{ws.title}!A1"),
+                celda(ws_index, stats.get("total_estudiantes", 0), style="data_cell"),
+                celda(ws_index, f"{stats.get('promedio_progreso', 0):.1f}%", style="data_cell"),
+                celda(ws_index, stats.get("aprobados", 0), style="data_cell"),
+                celda(ws_index, estado_curso, style="data_cell"),
+            ])
+
+        # ── Hojas de cursos ──
+        headers = [
+            "Nombre", "RUT", "Correo", "Progreso (%)", "Calificación",
+            "Estado", "Riesgo", "Conexiones SENCE", "DJ", "Días sin acceso"
+        ]
+        for curso, ws in zip(cursos, hojas):
+            # Ajustar anchos de columna
+            ws.column_dimensions['A'].width = 35
+            ws.column_dimensions['B'].width = 14
+            ws.column_dimensions['C'].width = 30
+            ws.column_dimensions['D'].width = 12
+            ws.column_dimensions['E'].width = 12
+            ws.column_dimensions['F'].width = 12
+            ws.column_dimensions['G'].width = 10
+            ws.column_dimensions['H'].width = 16
+            ws.column_dimensions['I'].width = 8
+            ws.column_dimensions['J'].width = 15
 
-            # Header del curso (filas 1-3)
-            ws.merge_cells('A1:J1')
-            ws['A1'] = curso.get("nombre", "Sin nombre")
-            ws['A1'].font = title_font
-            ws['A1'].alignment = Alignment(horizontal='center')
+            # Header del curso (fila 1)
+            ws.merged_cells.add('A1:J1')
+            ws.append([celda(ws, curso.get("nombre", "Sin nombre"), font=title_font, alignment=center)])
 
             # Link de retorno al índice (fila 2)
-            ws.merge_cells('A2:J2')
-            ws['A2'] = "← Volver al Índice"
-            ws['A2'].hyperlink = "#Índice!A1"
-            ws['A2'].font = Font(color="0563C1", underline="single", size=10)
-            ws['A2'].alignment = Alignment(horizontal='center')
+            ws.merged_cells.add('A2:J2')
+            ws.append([celda(ws, "← Volver al Índice", font=Font(color="0563C1", underline="single", size=10),
+                             alignment=center, hyperlink="#Índice!A1")])
 
             # Info del curso (fila 3)
-            ws.merge_cells('A3:J3')
+            ws.merged_cells.add('A3:J3')
             info_curso = f"ID Moodle: {curso.get('id_moodle', '—')} | ID SENCE: {curso.get('id_sence', '—')} | {curso.get('fecha_inicio', '—')} a {curso.get('fecha_fin', '—')}"
-            ws['A3'] = info_curso
-            ws['A3'].alignment = Alignment(horizontal='center')
-            ws['A3'].font = subtitle_font
+            ws.append([celda(ws, info_curso, font=subtitle_font, alignment=center)])
+            ws.append([])
 
             # Headers de columnas (fila 5)
-            headers = [
-                "Nombre", "RUT", "Correo", "Progreso (%)", "Calificación",
-                "Estado", "Riesgo", "Conexiones SENCE", "DJ", "Días sin acceso"
-            ]
-            for col_idx, header in enumerate(headers, start=1):
-                cell = ws.cell(row=5, column=col_idx, value=header)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = Alignment(horizontal='center')
-                cell.border = border
+            ws.append(fila_headers(ws, headers))
 
             # Datos de estudiantes
             estudiantes = curso.get("estudiantes", [])
-            for row_idx, est in enumerate(estudiantes, start=6):
+            for est in estudiantes:
                 sence = est.get("sence") or {}
                 estado_texto = {"A": "Aprobado", "R": "Reprobado", "P": "En proceso"}.get(est.get("estado", ""), "—")
 
@@ -746,69 +1242,54 @@ def register_routes(app):
                     est.get("dias_sin_ingreso", 0)
                 ]
 
-                for col_idx, valor in enumerate(valores, start=1):
-                    cell = ws.cell(row=row_idx, column=col_idx, value=valor)
-                    cell.border = border
-                    if col_idx in (4, 5):  # Progreso y Calificación
-                        cell.alignment = Alignment(horizontal='center')
+                ws.append([
+                    # Progreso y Calificación centrados
+                    celda(ws, valor, style="data_center" if col_idx in (4, 5) else "data_cell")
+                    for col_idx, valor in enumerate(valores, start=1)
+                ])
 
-            # Fila de resumen
+            # Fila de resumen (deja una fila en blanco tras los estudiantes)
             stats = curso.get("estadisticas", {})
             row_resumen = len(estudiantes) + 7
-            ws.merge_cells(f'A{row_resumen}:B{row_resumen}')
-            ws[f'A{row_resumen}'] = "RESUMEN"
-            ws[f'A{row_resumen}'].font = Font(bold=True)
-
-            ws[f'C{row_resumen}'] = f"Total: {stats.get('total_estudiantes', 0)}"
-            ws[f'D{row_resumen}'] = f"Promedio: {stats.get('promedio_progreso', 0):.1f}%"
-            ws[f'E{row_resumen}'] = f"Promedio: {stats.get('promedio_calificacion', 0):.1f}"
-            ws[f'F{row_resumen}'] = f"A:{stats.get('aprobados', 0)} R:{stats.get('reprobados', 0)} P:{stats.get('en_proceso', 0)}"
-            ws[f'G{row_resumen}'] = f"Alto:{stats.get('riesgo_alto', 0)} Medio:{stats.get('riesgo_medio', 0)}"
-            ws[f'H{row_resumen}'] = f"Conectados: {stats.get('conectados_sence', 0)}"
-
-            # Ajustar anchos de columna
-            ws.column_dimensions['A'].width = 35
-            ws.column_dimensions['B'].width = 14
-            ws.column_dimensions['C'].width = 30
-            ws.column_dimensions['D'].width = 12
-            ws.column_dimensions['E'].width = 12
-            ws.column_dimensions['F'].width = 12
-            ws.column_dimensions['G'].width = 10
-            ws.column_dimensions['H'].width = 16
-            ws.column_dimensions['I'].width = 8
-            ws.column_dimensions['J'].width = 15
-
-        # Ajustar anchos de columna de la hoja índice
-        ws_index.column_dimensions['A'].width = 5   # N°
-        ws_index.column_dimensions['B'].width = 10  # ID Curso
-        ws_index.column_dimensions['C'].width = 50  # Nombre (con hyperlink)
-        ws_index.column_dimensions['D'].width = 14  # Participantes
-        ws_index.column_dimensions['E'].width = 18  # Progreso Promedio
-        ws_index.column_dimensions['F'].width = 12  # Aprobados
-        ws_index.column_dimensions['G'].width = 12  # Estado
-
-        # Guardar en memoria (fix para gunicorn: crear nuevo BytesIO con datos completos)
-        temp_output = BytesIO()
-        wb.save(temp_output)
-        temp_output.seek(0)
-
-        # Crear nuevo BytesIO con los datos completos (evita problemas de ZipFile cerrado)
-        excel_data = temp_output.getvalue()
-        output = BytesIO(excel_data)
-        output.seek(0)
+            ws.append([])
+            ws.merged_cells.add(f'A{row_resumen}:B{row_resumen}')
+            ws.append([
+                celda(ws, "RESUMEN", font=Font(bold=True)),
+                None,
+                f"Total: {stats.get('total_estudiantes', 0)}",
+                f"Promedio: {stats.get('promedio_progreso', 0):.1f}%",
+                f"Promedio: {stats.get('promedio_calificacion', 0):.1f}",
+                f"A:{stats.get('aprobados', 0)} R:{stats.get('reprobados', 0)} P:{stats.get('en_proceso', 0)}",
+                f"Alto:{stats.get('riesgo_alto', 0)} Medio:{stats.get('riesgo_medio', 0)}",
+                f"Conectados: {stats.get('conectados_sence', 0)}",
+            ])
+
+        # Guardar en disco: send_file(path) permite a gunicorn usar
+        # wsgi.file_wrapper (sendfile) en vez de iterar un BytesIO en Python
+        with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as tmp:
+            tmp_path = tmp.name
+        try:
+            wb.save(tmp_path)
+        except Exception:
+            # No dejar temporales huérfanos si falla la escritura
+            os.unlink(tmp_path)
+            raise
 
         # Nombre del archivo
-        fecha_str = datetime.now().strftime("%Y%m%d")
+        fecha_str = _dt.now().strftime("%Y%m%d")
         filename = f"Reporte_Tecnipro_{fecha_str}.xlsx"
 
         logger.info("Generando Excel: %s cursos para %s", len(cursos), current_user.email)
 
-        return send_file(
-            output,
+        response = send_file(
+            tmp_path,
             mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             as_attachment=True,
             download_name=filename
         )
+        # Eliminar el temporal cuando termine de enviarse la respuesta
+        response.call_on_close(lambda: os.unlink(tmp_path))
+        return response
 
     # ── API: Coordinadores Cliente (Usuarios Compradores - solo admin) ──────────────
 
@@ -835,13 +1316,11 @@ def register_routes(app):
                 cursos.append(int(curso))
         return cursos
 
-    @app.route("/api/coordinadores", methods=["GET"])
+    @app.get("/api/coordinadores")
     @login_required
+    @admin_required
     def api_coordinadores_list():
         """Lista todos los coordinadores (usuarios con rol=comprador). Solo admin."""
-        if current_user.rol != "admin":
-            return jsonify({"error": "No autorizado"}), 403
-
         # Leer usuarios y filtrar solo compradores
         usuarios = user_manager._load_users()
         compradores = [
@@ -857,13 +1336,11 @@ def register_routes(app):
 
         return jsonify({"coordinadores": compradores})
 
-    @app.route("/api/coordinadores", methods=["POST"])
+    @app.post("/api/coordinadores")
     @login_required
+    @admin_required
     def api_coordinadores_create():
         """Crea un nuevo coordinador (usuario comprador) con contraseña generada. Solo admin."""
-        if current_user.rol != "admin":
-            return jsonify({"error": "No autorizado"}), 403
-
         body = request.get_json(silent=True)
         if not body:
             return jsonify({"error": "Body JSON requerido"}), 400
@@ -929,13 +1406,11 @@ def register_routes(app):
             "password_generada": password  # Solo se muestra UNA VEZ
         }), 201
 
-    @app.route("/api/coordinadores/<email>", methods=["PUT"])
+    @app.put("/api/coordinadores/<email>")
     @login_required
+    @admin_required
     def api_coordinadores_update(email):
         """Actualiza un coordinador existente. Solo admin."""
-        if current_user.rol != "admin":
-            return jsonify({"error": "No autorizado"}), 403
-
         body = request.get_json(silent=True)
         if not body:
             return jsonify({"error": "Body JSON requerido"}), 400
@@ -981,13 +1456,11 @@ def register_routes(app):
 
         return jsonify({"error": "Error actualizando coordinador"}), 500
 
-    @app.route("/api/coordinadores/<email>", methods=["DELETE"])
+    @app.delete("/api/coordinadores/<email>")
     @login_required
+    @admin_required
     def api_coordinadores_delete(email):
         """Elimina un coordinador (usuario comprador). Solo admin."""
-        if current_user.rol != "admin":
-            return jsonify({"error": "No autorizado"}), 403
-
         # Verificar que el usuario existe y es comprador
         user_data = user_manager._find_user_data(email)
         if not user_data:
@@ -1005,13 +1478,11 @@ def register_routes(app):
             logger.error("Error eliminando coordinador: %s", e)
             return jsonify({"error": f"Error eliminando usuario: {str(e)}"}), 500
 
-    @app.route("/api/coordinadores/<email>/cursos", methods=["POST"])
+    @app.post("/api/coordinadores/<email>/cursos")
     @login_required
+    @admin_required
     def api_coordinadores_add_curso(email):
         """Agrega un curso a un coordinador. Solo admin."""
-        if current_user.rol != "admin":
-            return jsonify({"error": "No autorizado"}), 403
-
         body = request.get_json(silent=True)
         if not body or "curso_id" not in body:
             return jsonify({"error": "Campo requerido: curso_id"}), 400
@@ -1050,13 +1521,11 @@ def register_routes(app):
             logger.error("Error agregando curso: %s", e)
             return jsonify({"error": f"Error agregando curso: {str(e)}"}), 500
 
-    @app.route("/api/coordinadores/<email>/cursos/<int:curso_id>", methods=["DELETE"])
+    @app.delete("/api/coordinadores/<email>/cursos/<int:curso_id>")
     @login_required
+    @admin_required
     def api_coordinadores_remove_curso(email, curso_id):
         """Quita un curso de un coordinador. Solo admin."""
-        if current_user.rol != "admin":
-            return jsonify({"error": "No autorizado"}), 403
-
         # Verificar que el usuario existe y es comprador
         user_data = user_manager._find_user_data(email)
         if not user_data:
@@ -1092,21 +1561,21 @@ def register_routes(app):
 
         return jsonify({"error": "Error quitando curso"}), 500
 
-    @app.route("/licitaciones")
+    @app.get("/licitaciones")
     @login_required
     def licitaciones_dashboard():
         return render_template("licitaciones.html")
 
-    @app.route("/api/licitaciones-data")
+    @app.get("/api/licitaciones-data")
     @login_required
     def licitaciones_data():
         json_path = Path("/root/tecnipro-reportes/data/licitaciones/licitaciones_data.json")
         if not json_path.exists():
             return jsonify({"error": "Datos no disponibles aún"}), 404
-        try:
-            return jsonify(json.loads(json_path.read_text(encoding="utf-8")))
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
+        # El archivo lo escribe el scraper ya como JSON: se envía tal cual desde
+        # disco (sin parsear ni re-serializar), con ETag/304 por mtime y tamaño
+        return send_file(json_path, mimetype="application/json",
+                         conditional=True, etag=True)
 
     # ─── Licitacion Estado Endpoints ───
 
@@ -1115,7 +1584,7 @@ def register_routes(app):
     # ─── Licitacion Notas Endpoints ───
     NOTAS_FILE = Path("/root/tecnipro-reportes/data/licitaciones/notas_oportunidades.json")
 
-    @app.route("/api/licitacion-notas")
+    @app.get("/api/licitacion-notas")
     @login_required
     def api_licitacion_notas():
         """Returns saved notes for all opportunities."""
@@ -1126,7 +1595,7 @@ def register_routes(app):
         except Exception:
             return jsonify({})
 
-    @app.route("/api/licitacion-nota", methods=["POST"])
+    @app.post("/api/licitacion-nota")
     @login_required
     def api_licitacion_nota():
         """Save or remove a note for an opportunity."""
@@ -1164,12 +1633,11 @@ def register_routes(app):
     # ── Licitacion Estado Endpoints (v2 - with history) ──
     ESTADOS_FILE = Path("/root/tecnipro-reportes/data/licitaciones/estados_oportunidades.json")
 
-    @app.route("/api/licitacion-estados")
+    @app.get("/api/licitacion-estados")
     @login_required
+    @admin_required
     def api_licitacion_estados():
         """Returns saved opportunity states with full history."""
-        if current_user.rol != "admin":
-            return jsonify({"error": "No autorizado"}), 403
         if not ESTADOS_FILE.exists():
             return jsonify({})
         try:
@@ -1182,12 +1650,11 @@ def register_routes(app):
         except Exception:
             return jsonify({})
 
-    @app.route("/api/licitacion-estado", methods=["POST"])
+    @app.post("/api/licitacion-estado")
     @login_required
+    @admin_required
     def api_licitacion_estado():
         """Save a new estado entry with mandatory note. Entries are immutable."""
-        if current_user.rol != "admin":
-            return jsonify({"error": "No autorizado"}), 403
         body = request.get_json(silent=True)
         if not body or "codigo" not in body:
             return jsonify({"error": "Datos incompletos"}), 400
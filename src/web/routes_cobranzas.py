@@ -12,6 +12,7 @@ HTML pages:
 API JSON (CSRF-exempt al estar bajo /api/):
     GET  /api/cobranzas/stats/dashboard
     GET  /api/cobranzas/facturas
+    GET  /api/cobranzas/facturas/total
     GET  /api/cobranzas/facturas/<id>
     POST /api/cobranzas/facturas/<id>/asignar-cliente
     POST /api/cobranzas/facturas/<id>/asignar-curso
@@ -23,14 +24,28 @@ API JSON (CSRF-exempt al estar bajo /api/):
     GET  /api/cobranzas/clientes/<id>
     POST /api/cobranzas/clientes/fusionar
     GET  /api/cobranzas/cursos
-    POST /api/cobranzas/importar
+    POST /api/cobranzas/importar             → 202 + job_id (proceso en segundo plano)
+    GET  /api/cobranzas/importar/job/<job_id>
     GET  /api/cobranzas/importar/historial
 """
 
+import base64
+import hashlib
+import json
 import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import date
+from functools import lru_cache
 from pathlib import Path
 
-from flask import abort, jsonify, render_template, request
+import orjson
+from flask import Response, abort, jsonify, render_template, request, url_for
 from flask_login import current_user, login_required
 
 from config import settings
@@ -45,12 +60,16 @@ from src.cobranzas.client_manager import (
     listar_cursos_usados,
     obtener_cliente,
 )
-from src.cobranzas.credit_note_engine import aplicar_todas_ncs
+from src.cobranzas.credit_note_engine import aplicar_todas_ncs, ncs_afectadas_desde
 from src.cobranzas.csv_parser import parsear_archivo
 from src.cobranzas.models import (
+    crear_importacion,
+    finalizar_importacion,
     get_db,
-    init_db,
-    insertar_documento,
+    get_db_lectura,
+    init_db_una_vez,
+    insertar_documentos,
+    obtener_importacion,
     registrar_auditoria,
 )
 from src.cobranzas.payment_engine import (
@@ -77,6 +96,59 @@ logger = logging.getLogger(__name__)
 
 ANIO_CORTE = settings.ANIO_CORTE_GESTION
 
+# Conteo total de facturas por combinación de filtros: se calcula aparte del
+# listado (keyset) y se reutiliza durante TOTAL_FACTURAS_TTL segundos.
+TOTAL_FACTURAS_TTL = 60
+_total_facturas_cache: dict[str, tuple[int, float]] = {}
+_total_facturas_lock = threading.Lock()
+
+# Payload de /api/cobranzas/stats/dashboard: clave -> (data, timestamp).
+# La clave incluye la fecha porque las alertas de vencimiento dependen del día.
+STATS_DASHBOARD_TTL = 30
+_dash_cache: dict[tuple[str, str], tuple[dict, float]] = {}
+_dash_lock = threading.Lock()
+_dash_generacion = [0]   # Se incrementa en cada invalidación
+
+# Las nueve agregaciones del dashboard son independientes y de solo lectura:
+# se reparten en un pool, cada una con su propia conexión mode=ro.
+_STATS_DASHBOARD = (
+    ("historico",          resumen_historico),
+    ("por_otic_historico", facturacion_por_otic),
+    ("kpis",               kpis_cobranza),
+    ("estados",            distribucion_estados),
+    ("cobranza_mensual",   cobranza_mensual),
+    ("top_otics",          top_otics_pendientes),
+    ("alertas",            alertas_vencimiento),
+    ("top_clientes",       top_clientes),
+    ("top_cursos",         top_cursos),
+)
+STATS_MAX_WORKERS = 4
+_stats_pool = ThreadPoolExecutor(max_workers=STATS_MAX_WORKERS,
+                                 thread_name_prefix="cobranzas-stats")
+# Cálculos del dashboard que pueden usar el pool a la vez; el resto va en serie
+_stats_slots = threading.BoundedSemaphore(2)
+
+# Listados que aún paginan con OFFSET (pagos, clientes): tope de filas
+# recorridas, para no aceptar páginas arbitrariamente profundas.
+PAGINACION_MAX_FILAS = 50_000
+
+# Catálogos para filtros (OTICs, cursos): cuerpo JSON ya serializado + etag.
+# Se invalidan al importar / asignar curso (versión local) y, como cada worker
+# de gunicorn tiene su propia copia, expiran además a los CATALOGO_TTL segundos.
+CATALOGO_TTL = 300
+_catalog_version = [0]
+_catalog_cache: dict[tuple[str, int], tuple[bytes, str, float]] = {}
+_catalog_lock = threading.Lock()
+
+# Importaciones de CSV: se procesan fuera del request, de a una (SQLite admite
+# un solo escritor). El estado de cada job vive en la tabla importaciones (el
+# polling puede llegar a otro worker de gunicorn), acotada a los
+# IMPORT_JOBS_MAX más recientes.
+IMPORT_JOBS_MAX = 50
+_import_executor = ThreadPoolExecutor(max_workers=1,
+                                      thread_name_prefix="cobranzas-import")
+_JOB_ID_RE = re.compile(r"^[a-f0-9]{1,32}$")
+
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
@@ -98,6 +170,25 @@ def _json_ok(data: dict | None = None, **kwargs):
     return jsonify(payload)
 
 
+def _json_columnar(payload: dict):
+    """
+    Respuesta JSON serializada con orjson.
+
+    Los listados van en forma columnar ({"columns": [...], "data": [[...]]}):
+    los nombres de columna no se repiten por fila y las filas se pasan como
+    tuplas, sin construir un dict por cada sqlite3.Row.
+    """
+    return Response(orjson.dumps(payload), mimetype="application/json")
+
+
+def _columnar(cursor) -> dict:
+    """Lee todas las filas de un cursor SQLite en forma columnar."""
+    return {
+        "columns": [c[0] for c in cursor.description],
+        "data":    [tuple(f) for f in cursor.fetchall()],
+    }
+
+
 def _get_ip() -> str:
     return request.headers.get("X-Forwarded-For", request.remote_addr or "")
 
@@ -106,13 +197,297 @@ def _usuario() -> str:
     return current_user.email if current_user.is_authenticated else "desconocido"
 
 
+def _invalidar_stats_dashboard() -> None:
+    """Descarta el payload cacheado del dashboard tras una escritura."""
+    with _dash_lock:
+        _dash_cache.clear()
+        _dash_generacion[0] += 1
+
+
+def _consulta_lectura(fn):
+    """Ejecuta una función de stats_engine con su propia conexión de lectura."""
+    with get_db_lectura() as conn:
+        return fn(conn)
+
+
+def _invalidar_catalogos() -> None:
+    """Descarta los catálogos cacheados (OTICs, cursos) tras una escritura."""
+    with _catalog_lock:
+        _catalog_version[0] += 1
+        _catalog_cache.clear()
+
+
+def _respuesta_catalogo(nombre: str, calcular):
+    """
+    Respuesta JSON de un catálogo, cacheada por versión y con ETag débil.
+
+    calcular() abre su propia conexión y retorna el dict a serializar; solo se
+    llama si no hay copia vigente. Responde 304 si el ETag del cliente coincide.
+    """
+    ahora = time.monotonic()
+    with _catalog_lock:
+        version = _catalog_version[0]
+        cacheado = _catalog_cache.get((nombre, version))
+    if cacheado is None or ahora - cacheado[2] >= CATALOGO_TTL:
+        body = orjson.dumps(calcular())
+        etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+        cacheado = (body, etag, ahora)
+        with _catalog_lock:
+            if version == _catalog_version[0]:
+                _catalog_cache[(nombre, version)] = cacheado
+    body, etag, _ = cacheado
+    resp = Response(body, mimetype="application/json")
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
+
+
+def _calcular_stats_dashboard() -> dict:
+    """
+    Ejecuta las agregaciones del dashboard de cobranzas.
+
+    Si el pool ya está ocupado por otros cálculos, se hace en serie sobre una
+    sola conexión para no encolar detrás de ellos.
+    """
+    if not _stats_slots.acquire(blocking=False):
+        with get_db_lectura() as conn:
+            return {clave: fn(conn) for clave, fn in _STATS_DASHBOARD}
+    try:
+        futuros = {
+            _stats_pool.submit(_consulta_lectura, fn): clave
+            for clave, fn in _STATS_DASHBOARD
+        }
+        resultados = {futuros[f]: f.result() for f in as_completed(futuros)}
+    finally:
+        _stats_slots.release()
+    return {clave: resultados[clave] for clave, _ in _STATS_DASHBOARD}
+
+
+def _consulta_fts(q: str) -> str:
+    """
+    Convierte el texto de búsqueda en una consulta FTS5: cada palabra se busca
+    como prefijo ("palabra"*) y todas deben aparecer. Vacío si no hay palabras.
+    """
+    palabras = re.findall(r"\w+", q)
+    return " ".join(f'"{p}"*' for p in palabras)
+
+
+# Filtros opcionales del listado de facturas, en orden fijo: (nombre, condición)
+_CONDICIONES_FACTURAS = (
+    # Comparación directa sobre fecha_docto (ISO) para poder usar el índice
+    ("solo_activas", "d.fecha_docto >= ?"),
+    ("estado",       "d.estado = ?"),
+    ("otic",         "d.rut_cliente = ?"),
+    ("periodo",      "d.periodo_tributario = ?"),
+    ("tipo_doc",     "d.tipo_doc = ?"),
+    # Índice FTS5 sobre folio, razón social y nombre del cliente
+    ("q",            "d.id IN (SELECT rowid FROM documentos_sii_fts"
+                     " WHERE documentos_sii_fts MATCH ?)"),
+)
+
+
+def _filtros_facturas(args) -> tuple[tuple[bool, ...], list]:
+    """
+    Traduce los filtros del querystring a (firma, params).
+
+    firma indica qué condiciones de _CONDICIONES_FACTURAS están activas y
+    params trae sus valores en el mismo orden; ver _sql_facturas().
+    """
+    solo_activas = args.get("solo_activas", "false").lower() == "true"
+    tipo_doc = args.get("tipo_doc", "").strip()
+    q = args.get("q", "").strip()
+
+    valores = (
+        f"{ANIO_CORTE}-01-01" if solo_activas else None,
+        args.get("estado", "").strip() or None,
+        args.get("otic", "").strip() or None,
+        args.get("periodo", "").strip() or None,
+        int(tipo_doc) if tipo_doc else None,
+        (_consulta_fts(q) or '""') if q else None,
+    )
+    firma = tuple(v is not None for v in valores)
+    return firma, [v for v in valores if v is not None]
+
+
+@lru_cache(maxsize=64)
+def _sql_facturas(firma: tuple[bool, ...], con_cursor: bool) -> tuple[str, str]:
+    """
+    SQL del listado (keyset) y del conteo para una combinación de filtros.
+
+    El texto es idéntico entre requests con la misma firma, así que además de
+    no re-armarlo se reutiliza el statement preparado de la conexión del hilo.
+    """
+    conditions = ["d.tipo_doc IN (33, 34)"]
+    conditions += [cond for (_, cond), activa in zip(_CONDICIONES_FACTURAS, firma)
+                   if activa]
+    where = " AND ".join(conditions)
+
+    sql_total = f"SELECT COUNT(*) FROM documentos_sii d WHERE {where}"
+    if con_cursor:
+        where += " AND (d.fecha_docto, d.folio, d.id) < (?, ?, ?)"
+    sql_pagina = f"""SELECT d.id, d.tipo_doc, d.tipo_doc_nombre, d.folio,
+                            d.rut_cliente, d.razon_social, d.fecha_docto,
+                            d.monto_total, d.monto_exento, d.monto_neto, d.monto_iva,
+                            d.estado, d.saldo_pendiente, d.periodo_tributario,
+                            d.cliente_id, d.curso, d.archivo_origen,
+                            c.nombre               AS cliente_nombre,
+                            d.monto_nc_cache       AS monto_nc,
+                            d.total_pagado_cache   AS total_pagado
+                     FROM documentos_sii d
+                     LEFT JOIN clientes c ON d.cliente_id = c.id
+                     WHERE {where}
+                     ORDER BY d.fecha_docto DESC, d.folio DESC, d.id DESC
+                     LIMIT ?"""
+    return sql_pagina, sql_total
+
+
+def _codificar_cursor(fecha_docto: str, folio: int, doc_id: int) -> str:
+    """Cursor opaco (base64 URL-safe) con la clave de orden de la última fila."""
+    raw = json.dumps([fecha_docto, folio, doc_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor: str) -> tuple[str, int, int]:
+    """Inverso de _codificar_cursor. Lanza ValueError si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        fecha_docto, folio, doc_id = json.loads(raw)
+        return str(fecha_docto), int(folio), int(doc_id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("cursor inválido") from exc
+
+
+def _parsear_archivos(rutas: list[Path]) -> list[tuple]:
+    """
+    Parsea los CSV y retorna [(ruta, resultado, error)] en el orden de rutas.
+
+    Con varios archivos el parseo (CPU) se reparte en un pool de procesos; con
+    uno solo se hace en el hilo actual para no pagar el arranque del pool. Se
+    usa "spawn" porque el proceso ya tiene hilos (pools, conexiones SQLite) y
+    un fork desde aquí podría heredar locks tomados.
+    """
+    if len(rutas) <= 1:
+        salida = []
+        for ruta in rutas:
+            try:
+                salida.append((ruta, parsear_archivo(ruta), None))
+            except Exception as exc:
+                salida.append((ruta, None, exc))
+        return salida
+
+    workers = min(len(rutas), os.cpu_count() or 1)
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        futuros = [pool.submit(parsear_archivo, ruta) for ruta in rutas]
+        salida = []
+        for ruta, futuro in zip(rutas, futuros):
+            try:
+                salida.append((ruta, futuro.result(), None))
+            except Exception as exc:
+                salida.append((ruta, None, exc))
+    return salida
+
+
+def _procesar_importacion(rutas: list[Path], usuario: str, ip: str) -> dict:
+    """
+    Parsea e inserta los CSV ya guardados en disco, aplica las NC y audita.
+
+    Corre en _import_executor, fuera del contexto del request: por eso recibe
+    usuario e ip ya resueltos. Retorna el resumen de la importación.
+    """
+    resumen_global = {
+        "archivos_procesados": 0,
+        "documentos_insertados": 0,
+        "duplicados": 0,
+        "errores_parseo": [],
+        "ncs_aplicadas": 0,
+        "detalles": [],
+    }
+
+    # Parsear antes de abrir la transacción: el lock de escritura solo se
+    # mantiene durante los inserts
+    parseados = _parsear_archivos(rutas)
+
+    try:
+        with get_db() as conn:
+            # Caché de páginas mayor en la conexión del hilo de importación; el
+            # lock de escritura se toma al inicio para no fallar a mitad del lote.
+            conn.execute("PRAGMA cache_size = -65536")
+            conn.execute("BEGIN IMMEDIATE")
+            # Todo lo insertado en esta importación tendrá id > id_inicial
+            id_inicial = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM documentos_sii"
+            ).fetchone()[0]
+            for ruta, resultado, error in parseados:
+                if error is not None:
+                    resumen_global["errores_parseo"].append(
+                        f"{ruta.name}: {error}"
+                    )
+                    continue
+
+                insertados = insertar_documentos(conn, resultado.documentos)
+                duplicados = len(resultado.documentos) - insertados
+
+                resumen_global["archivos_procesados"] += 1
+                resumen_global["documentos_insertados"] += insertados
+                resumen_global["duplicados"] += duplicados
+                resumen_global["errores_parseo"].extend(resultado.errores)
+
+                resumen_global["detalles"].append({
+                    "archivo":   ruta.name,
+                    "periodo":   resultado.periodo,
+                    "facturas":  len(resultado.facturas),
+                    "ncs":       len(resultado.notas_credito),
+                    "insertados": insertados,
+                    "duplicados": duplicados,
+                    "errores":   resultado.errores,
+                })
+
+            # Aplicar solo las NC afectadas por esta importación, en la misma
+            # transacción que los inserts
+            res_nc = aplicar_todas_ncs(
+                conn, usuario=usuario, ip=ip,
+                only_ids=ncs_afectadas_desde(conn, id_inicial),
+            )
+            resumen_global["ncs_aplicadas"] = res_nc["aplicadas"]
+
+            # Auditoría
+            registrar_auditoria(
+                conn, usuario, "importar_csv",
+                f"Importados {resumen_global['documentos_insertados']} documentos "
+                f"de {resumen_global['archivos_procesados']} archivos. "
+                f"{resumen_global['duplicados']} duplicados omitidos.",
+                ip,
+            )
+    except Exception:
+        logger.exception("Error durante importación")
+        raise
+
+    _invalidar_stats_dashboard()
+    _invalidar_catalogos()
+    return resumen_global
+
+
+def _ejecutar_job_importacion(job_id: str, rutas: list[Path], usuario: str, ip: str) -> None:
+    """Corre _procesar_importacion y guarda su resultado en importaciones."""
+    try:
+        resumen = _procesar_importacion(rutas, usuario, ip)
+    except Exception as exc:
+        with get_db() as conn:
+            finalizar_importacion(conn, job_id, error=str(exc))
+        return
+    with get_db() as conn:
+        finalizar_importacion(conn, job_id, resultado=orjson.dumps(resumen).decode())
+
+
 # ── Registro de rutas ─────────────────────────────────────────────────────────
 
 def register_cobranzas_routes(app):
     """Registra todas las rutas del módulo de cobranzas en la app Flask."""
 
-    # Inicializar BD al arrancar
-    init_db()
+    # Inicializar BD al arrancar (solo la primera vez por proceso y BD)
+    init_db_una_vez()
 
     # ════════════════════════════════════════════════════════════
     # HTML — Vistas renderizadas en servidor
@@ -163,23 +538,26 @@ def register_cobranzas_routes(app):
     @login_required
     def api_cobranzas_stats_dashboard():
         _admin_required()
-        try:
-            with get_db() as conn:
-                data = {
-                    "historico":          resumen_historico(conn),
-                    "por_otic_historico": facturacion_por_otic(conn),
-                    "kpis":               kpis_cobranza(conn),
-                    "estados":            distribucion_estados(conn),
-                    "cobranza_mensual":   cobranza_mensual(conn),
-                    "top_otics":          top_otics_pendientes(conn),
-                    "alertas":            alertas_vencimiento(conn),
-                    "top_clientes":       top_clientes(conn),
-                    "top_cursos":         top_cursos(conn),
-                }
-            return jsonify(data)
-        except Exception as exc:
-            logger.exception("Error obteniendo stats dashboard")
-            return _json_error(str(exc), 500)
+        key = ("admin", date.today().isoformat())
+        with _dash_lock:
+            cacheado = _dash_cache.get(key)
+            generacion = _dash_generacion[0]
+        if cacheado is not None and time.monotonic() - cacheado[1] < STATS_DASHBOARD_TTL:
+            data = cacheado[0]
+        else:
+            try:
+                data = _calcular_stats_dashboard()
+            except Exception as exc:
+                logger.exception("Error obteniendo stats dashboard")
+                return _json_error(str(exc), 500)
+            with _dash_lock:
+                # Si hubo una escritura mientras se calculaba, no cachear
+                if generacion == _dash_generacion[0]:
+                    _dash_cache.clear()
+                    _dash_cache[key] = (data, time.monotonic())
+        resp = jsonify(data)
+        resp.headers["Cache-Control"] = f"private, max-age={STATS_DASHBOARD_TTL}"
+        return resp
 
     @app.route("/api/cobranzas/stats/historico")
     @login_required
@@ -202,89 +580,83 @@ def register_cobranzas_routes(app):
     @app.route("/api/cobranzas/facturas")
     @login_required
     def api_cobranzas_facturas_list():
+        """
+        Listado paginado por keyset: (fecha_docto, folio, id) descendente.
+
+        El cliente pide la página siguiente con ?cursor=<next_cursor>; no se
+        calcula el total aquí (ver /api/cobranzas/facturas/total).
+        """
         _admin_required()
         try:
-            page     = max(1, request.args.get("page", 1, type=int))
             per_page = min(200, max(10, request.args.get("per_page", 50, type=int)))
-            estado   = request.args.get("estado", "").strip()
-            otic     = request.args.get("otic", "").strip()
-            periodo  = request.args.get("periodo", "").strip()
-            q        = request.args.get("q", "").strip()
-            solo_activas = request.args.get("solo_activas", "false").lower() == "true"
-            tipo_doc = request.args.get("tipo_doc", "").strip()
-
-            conditions = ["d.tipo_doc IN (33, 34)"]
-            params: list = []
-
-            if solo_activas:
-                conditions.append(f"strftime('%Y', d.fecha_docto) >= '{ANIO_CORTE}'")
-            if estado:
-                conditions.append("d.estado = ?")
-                params.append(estado)
-            if otic:
-                conditions.append("d.rut_cliente = ?")
-                params.append(otic)
-            if periodo:
-                conditions.append("d.periodo_tributario = ?")
-                params.append(periodo)
-            if tipo_doc:
-                conditions.append("d.tipo_doc = ?")
-                params.append(int(tipo_doc))
-            if q:
-                conditions.append(
-                    "(d.folio LIKE ? OR d.razon_social LIKE ? OR c.nombre LIKE ?)"
+            cursor   = request.args.get("cursor", "").strip()
+            try:
+                firma, params = _filtros_facturas(request.args)
+                if cursor:
+                    params += list(_decodificar_cursor(cursor))
+            except ValueError as exc:
+                return _json_error(str(exc))
+
+            sql_pagina, _ = _sql_facturas(firma, bool(cursor))
+            with get_db() as conn:
+                cursor_sql = conn.execute(sql_pagina, params + [per_page + 1])
+                rows = cursor_sql.fetchall()
+                columnas = [c[0] for c in cursor_sql.description]
+
+            hay_mas = len(rows) > per_page
+            rows = rows[:per_page]
+
+            next_cursor = None
+            if hay_mas:
+                ultima = rows[-1]
+                next_cursor = _codificar_cursor(
+                    ultima["fecha_docto"], ultima["folio"], ultima["id"]
                 )
-                like = f"%{q}%"
-                params += [like, like, like]
-
-            where = "WHERE " + " AND ".join(conditions) if conditions else ""
-
-            sql_base = f"""
-                FROM documentos_sii d
-                LEFT JOIN clientes c ON d.cliente_id = c.id
-                LEFT JOIN (
-                    SELECT folio_referencia, tipo_doc_referencia,
-                           SUM(monto_total) AS monto_nc
-                    FROM documentos_sii WHERE tipo_doc = 61
-                    GROUP BY folio_referencia, tipo_doc_referencia
-                ) nc ON nc.folio_referencia = d.folio
-                     AND nc.tipo_doc_referencia = d.tipo_doc
-                LEFT JOIN (
-                    SELECT documento_id, SUM(monto_aplicado) AS total_pagado
-                    FROM pago_detalle GROUP BY documento_id
-                ) pg ON pg.documento_id = d.id
-                {where}
-            """
+
+            return _json_columnar({
+                "per_page":    per_page,
+                "next_cursor": next_cursor,
+                "columns":     columnas,
+                "data":        [tuple(r) for r in rows],
+            })
+        except Exception as exc:
+            logger.exception("Error listando facturas")
+            return _json_error(str(exc), 500)
+
+    @app.route("/api/cobranzas/facturas/total")
+    @login_required
+    def api_cobranzas_facturas_total():
+        """Total de facturas para los filtros dados, cacheado TOTAL_FACTURAS_TTL s."""
+        _admin_required()
+        try:
+            try:
+                firma, params = _filtros_facturas(request.args)
+            except ValueError as exc:
+                return _json_error(str(exc))
+
+            clave = hashlib.blake2b(
+                json.dumps([firma, params]).encode(), digest_size=16
+            ).hexdigest()
+            ahora = time.monotonic()
+            with _total_facturas_lock:
+                cacheado = _total_facturas_cache.get(clave)
+            if cacheado is not None and ahora - cacheado[1] < TOTAL_FACTURAS_TTL:
+                return jsonify({"total": cacheado[0]})
 
             with get_db() as conn:
                 total = conn.execute(
-                    f"SELECT COUNT(*) {sql_base}", params
+                    _sql_facturas(firma, False)[1], params
                 ).fetchone()[0]
 
-                rows = conn.execute(
-                    f"""SELECT d.id, d.tipo_doc, d.tipo_doc_nombre, d.folio,
-                               d.rut_cliente, d.razon_social, d.fecha_docto,
-                               d.monto_total, d.monto_exento, d.monto_neto, d.monto_iva,
-                               d.estado, d.saldo_pendiente, d.periodo_tributario,
-                               d.cliente_id, d.curso, d.archivo_origen,
-                               c.nombre AS cliente_nombre,
-                               COALESCE(nc.monto_nc, 0)       AS monto_nc,
-                               COALESCE(pg.total_pagado, 0)   AS total_pagado
-                        {sql_base}
-                        ORDER BY d.fecha_docto DESC, d.folio DESC
-                        LIMIT ? OFFSET ?""",
-                    params + [per_page, (page - 1) * per_page],
-                ).fetchall()
-
-            return jsonify({
-                "total":    total,
-                "page":     page,
-                "per_page": per_page,
-                "pages":    (total + per_page - 1) // per_page,
-                "facturas": [dict(r) for r in rows],
-            })
+            with _total_facturas_lock:
+                # Purga entradas vencidas para que el dict no crezca sin límite
+                for k in [k for k, (_, ts) in _total_facturas_cache.items()
+                          if ahora - ts >= TOTAL_FACTURAS_TTL]:
+                    del _total_facturas_cache[k]
+                _total_facturas_cache[clave] = (total, ahora)
+            return jsonify({"total": total})
         except Exception as exc:
-            logger.exception("Error listando facturas")
+            logger.exception("Error contando facturas")
             return _json_error(str(exc), 500)
 
     @app.route("/api/cobranzas/facturas/<int:doc_id>")
@@ -341,6 +713,7 @@ def register_cobranzas_routes(app):
                 )
             if not res["ok"]:
                 return _json_error(res["error"])
+            _invalidar_stats_dashboard()
             return _json_ok(**res)
         except Exception as exc:
             return _json_error(str(exc), 500)
@@ -358,6 +731,8 @@ def register_cobranzas_routes(app):
                 )
             if not res["ok"]:
                 return _json_error(res["error"])
+            _invalidar_stats_dashboard()
+            _invalidar_catalogos()
             return _json_ok()
         except Exception as exc:
             return _json_error(str(exc), 500)
@@ -372,10 +747,14 @@ def register_cobranzas_routes(app):
         _admin_required()
         page     = max(1, request.args.get("page", 1, type=int))
         per_page = min(100, max(10, request.args.get("per_page", 20, type=int)))
+        if page * per_page > PAGINACION_MAX_FILAS:
+            return _json_error(f"Página fuera de rango (máximo {PAGINACION_MAX_FILAS} filas)")
         try:
             with get_db() as conn:
-                result = listar_pagos(conn, limit=per_page, offset=(page - 1) * per_page)
-            return jsonify(result)
+                result = listar_pagos(
+                    conn, limit=per_page, offset=(page - 1) * per_page, columnar=True
+                )
+            return _json_columnar(result)
         except Exception as exc:
             return _json_error(str(exc), 500)
 
@@ -423,6 +802,7 @@ def register_cobranzas_routes(app):
                 )
             if not res.ok:
                 return jsonify({"ok": False, "errores": res.errores}), 400
+            _invalidar_stats_dashboard()
             return _json_ok(pago_id=res.pago_id), 201
         except Exception as exc:
             logger.exception("Error registrando pago")
@@ -450,6 +830,7 @@ def register_cobranzas_routes(app):
                 res = anular_pago(conn, pago_id, _usuario(), _get_ip())
             if not res["ok"]:
                 return _json_error(res["error"])
+            _invalidar_stats_dashboard()
             return _json_ok(**res)
         except Exception as exc:
             return _json_error(str(exc), 500)
@@ -465,6 +846,8 @@ def register_cobranzas_routes(app):
         q        = request.args.get("q", "").strip()
         page     = max(1, request.args.get("page", 1, type=int))
         per_page = min(200, max(10, request.args.get("per_page", 50, type=int)))
+        if page * per_page > PAGINACION_MAX_FILAS:
+            return _json_error(f"Página fuera de rango (máximo {PAGINACION_MAX_FILAS} filas)")
         try:
             with get_db() as conn:
                 if q:
@@ -552,6 +935,7 @@ def register_cobranzas_routes(app):
                 res = fusionar_clientes(conn, id_origen, id_destino, _usuario(), _get_ip())
             if not res["ok"]:
                 return _json_error(res["error"])
+            _invalidar_stats_dashboard()
             return _json_ok(**res)
         except Exception as exc:
             return _json_error(str(exc), 500)
@@ -564,10 +948,13 @@ def register_cobranzas_routes(app):
     @login_required
     def api_cobranzas_cursos():
         _admin_required()
-        try:
+
+        def calcular():
             with get_db() as conn:
-                cursos = listar_cursos_usados(conn)
-            return jsonify({"cursos": cursos})
+                return {"cursos": listar_cursos_usados(conn)}
+
+        try:
+            return _respuesta_catalogo("cursos", calcular)
         except Exception as exc:
             return _json_error(str(exc), 500)
 
@@ -579,14 +966,20 @@ def register_cobranzas_routes(app):
     @login_required
     def api_cobranzas_otics():
         _admin_required()
-        try:
+
+        def calcular():
             with get_db() as conn:
                 rows = conn.execute(
                     """SELECT DISTINCT rut_cliente, razon_social
                        FROM documentos_sii WHERE tipo_doc IN (33,34)
                        ORDER BY razon_social"""
                 ).fetchall()
-            return jsonify({"otics": [dict(r) for r in rows]})
+            return {"otics": [
+                {"rut_cliente": rut, "razon_social": razon} for rut, razon in rows
+            ]}
+
+        try:
+            return _respuesta_catalogo("otics", calcular)
         except Exception as exc:
             return _json_error(str(exc), 500)
 
@@ -605,15 +998,6 @@ def register_cobranzas_routes(app):
         destino = settings.SII_CSV_PATH
         destino.mkdir(parents=True, exist_ok=True)
 
-        resumen_global = {
-            "archivos_procesados": 0,
-            "documentos_insertados": 0,
-            "duplicados": 0,
-            "errores_parseo": [],
-            "ncs_aplicadas": 0,
-            "detalles": [],
-        }
-
         archivos_guardados: list[Path] = []
 
         for f in archivos:
@@ -624,57 +1008,46 @@ def register_cobranzas_routes(app):
             f.save(str(ruta_guardado))
             archivos_guardados.append(ruta_guardado)
 
+        job_id = uuid.uuid4().hex
+        usuario = _usuario()
         try:
             with get_db() as conn:
-                for ruta in archivos_guardados:
-                    try:
-                        resultado = parsear_archivo(ruta)
-                    except Exception as exc:
-                        resumen_global["errores_parseo"].append(
-                            f"{ruta.name}: {exc}"
-                        )
-                        continue
-
-                    insertados = duplicados = 0
-                    for doc in resultado.documentos:
-                        if insertar_documento(conn, doc):
-                            insertados += 1
-                        else:
-                            duplicados += 1
-
-                    resumen_global["archivos_procesados"] += 1
-                    resumen_global["documentos_insertados"] += insertados
-                    resumen_global["duplicados"] += duplicados
-                    resumen_global["errores_parseo"].extend(resultado.errores)
-
-                    resumen_global["detalles"].append({
-                        "archivo":   ruta.name,
-                        "periodo":   resultado.periodo,
-                        "facturas":  len(resultado.facturas),
-                        "ncs":       len(resultado.notas_credito),
-                        "insertados": insertados,
-                        "duplicados": duplicados,
-                        "errores":   resultado.errores,
-                    })
-
-                # Aplicar NCs tras todos los inserts
-                res_nc = aplicar_todas_ncs(conn, usuario=_usuario(), ip=_get_ip())
-                resumen_global["ncs_aplicadas"] = res_nc["aplicadas"]
-
-                # Auditoría
-                registrar_auditoria(
-                    conn, _usuario(), "importar_csv",
-                    f"Importados {resumen_global['documentos_insertados']} documentos "
-                    f"de {resumen_global['archivos_procesados']} archivos. "
-                    f"{resumen_global['duplicados']} duplicados omitidos.",
-                    _get_ip(),
-                )
+                crear_importacion(conn, job_id, usuario, conservar=IMPORT_JOBS_MAX)
+        except Exception as exc:
+            return _json_error(str(exc), 500)
+        _import_executor.submit(
+            _ejecutar_job_importacion, job_id, archivos_guardados, usuario, _get_ip()
+        )
+
+        response = _json_ok(job_id=job_id)
+        response.headers["Location"] = url_for(
+            "api_cobranzas_importar_job", job_id=job_id
+        )
+        return response, 202
 
+    @app.route("/api/cobranzas/importar/job/<job_id>")
+    @login_required
+    def api_cobranzas_importar_job(job_id):
+        """Estado de una importación encolada por POST /api/cobranzas/importar."""
+        _admin_required()
+        if not _JOB_ID_RE.match(job_id):
+            return _json_error("job_id inválido")
+        try:
+            with get_db() as conn:
+                job = obtener_importacion(conn, job_id)
         except Exception as exc:
-            logger.exception("Error durante importación")
             return _json_error(str(exc), 500)
+        if job is None:
+            return _json_error("Importación no encontrada", 404)
 
-        return jsonify({"ok": True, **resumen_global}), 201
+        if job["estado"] == "pending":
+            return _json_ok(status="pending", job_id=job_id)
+        if job["estado"] == "error":
+            return jsonify({
+                "ok": False, "status": "error", "job_id": job_id, "error": job["error"],
+            })
+        return jsonify({"ok": True, "status": "done", "job_id": job_id,
+                        **orjson.loads(job["resultado"])})
 
     @app.route("/api/cobranzas/importar/historial")
     @login_required
@@ -682,13 +1055,16 @@ def register_cobranzas_routes(app):
         _admin_required()
         try:
             with get_db() as conn:
-                rows = conn.execute(
+                cursor = conn.execute(
                     """SELECT fecha, usuario, detalle, ip
                        FROM log_auditoria
                        WHERE accion = 'importar_csv'
                        ORDER BY fecha DESC LIMIT 50"""
-                ).fetchall()
-            return jsonify({"historial": [dict(r) for r in rows]})
+                )
+                # Se consume dentro del with/try: un error de SQLite llega
+                # como _json_error y no como un JSON truncado
+                payload = _columnar(cursor)
+            return _json_columnar(payload)
         except Exception as exc:
             return _json_error(str(exc), 500)
 
@@ -699,7 +1075,7 @@ def register_cobranzas_routes(app):
         _admin_required()
         try:
             with get_db() as conn:
-                rows = conn.execute(
+                cursor = conn.execute(
                     """SELECT periodo_tributario,
                               COUNT(*)                              AS num_docs,
                               SUM(CASE WHEN tipo_doc IN (33,34) THEN 1 ELSE 0 END) AS num_facturas,
@@ -707,8 +1083,9 @@ def register_cobranzas_routes(app):
                        FROM documentos_sii
                        GROUP BY periodo_tributario
                        ORDER BY periodo_tributario DESC"""
-                ).fetchall()
-            return jsonify({"periodos": [dict(r) for r in rows]})
+                )
+                payload = _columnar(cursor)
+            return _json_columnar(payload)
         except Exception as exc:
             return _json_error(str(exc), 500)
 
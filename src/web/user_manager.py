@@ -7,13 +7,34 @@ Uso:
     python -m src.web.user_manager password --email user@test.cl --password "nueva"
     python -m src.web.user_manager remove --email user@test.cl
     python -m src.web.user_manager add-curso --email user@test.cl --curso 143
+    python -m src.web.user_manager batch --file operaciones.jsonl
+    python -m src.web.user_manager daemon < operaciones.jsonl
+
+add, password, batch y daemon aceptan --bcrypt-rounds N para elegir el costo
+bcrypt (por defecto 12; cada punto menos reduce el tiempo de hash a la mitad).
+
+El archivo de batch es una lista JSON o un JSONL con una operación por línea:
+    {"op": "add", "email": "...", "nombre": "...", "rol": "comprador", "password": "...", "cursos": [143], "empresa": "..."}
+    {"op": "remove", "email": "..."}
+    {"op": "password", "email": "...", "password": "..."}
+    {"op": "add-curso", "email": "...", "curso": 143}
+Todas se aplican en memoria y usuarios.json se guarda una sola vez al final.
+daemon lee el mismo formato desde stdin (con "id" opcional), hashea en un
+pool de procesos y responde una línea JSON por operación.
 """
 
 import argparse
-import json
+import copy
+import os
+import queue
 import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
+import orjson
+
 # Asegurar que config sea importable
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
@@ -21,40 +42,160 @@ from config import settings
 from src.web.auth import hash_password
 
 
-def _load_users():
-    """Carga usuarios.json. Retorna dict con clave 'usuarios'."""
+# Las mutaciones se agregan como una línea JSON a usuarios.jsonl en vez de
+# reescribir usuarios.json completo; el snapshot se reescribe (compacta) solo
+# cuando el log supera COMPACT_THRESHOLD bytes.
+COMPACT_THRESHOLD = 64 * 1024
+
+
+def _log_path():
+    """Ruta del log de operaciones (usuarios.jsonl junto a usuarios.json)."""
+    return settings.USUARIOS_PATH.with_suffix(".jsonl")
+
+
+def _apply_op(index, op):
+    """Aplica una operación del log sobre el índice {email.lower(): usuario}."""
+    kind = op.get("op")
+    if kind == "add":
+        user = op["user"]
+        index[user["email"].lower()] = user
+        return
+    u = index.get(op.get("email", "").lower())
+    if u is None:
+        return
+    if kind == "remove":
+        del index[u["email"].lower()]
+    elif kind == "pw":
+        u["password_hash"] = op["password_hash"]
+    elif kind == "curso":
+        cursos = u.setdefault("cursos", [])
+        if op["curso"] not in cursos:
+            cursos.append(op["curso"])
+
+
+# Último (data, index) parseado, válido mientras usuarios.json y usuarios.jsonl
+# mantengan la misma ruta, mtime y tamaño.
+_USERS_CACHE = {"key": None, "value": None}
+
+
+def _stat_key(path):
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_users_indexed(copy_result=True):
+    """
+    Carga usuarios.json, aplica el log pendiente y retorna (data, index).
+
+    index es {email.lower(): usuario} sobre los mismos dicts de
+    data["usuarios"], para búsquedas O(1) sin recorrer la lista. Se retorna
+    una copia del resultado cacheado, así el llamador puede mutarla; los
+    lectores que no mutan (login) pasan copy_result=False.
+    """
     path = settings.USUARIOS_PATH
-    if path.exists():
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {"usuarios": []}
+    key = (path, _stat_key(path), _stat_key(_log_path()))
+    if _USERS_CACHE["key"] != key:
+        _USERS_CACHE["value"] = _read_users_indexed()
+        _USERS_CACHE["key"] = key
+    if not copy_result:
+        return _USERS_CACHE["value"]
+    return copy.deepcopy(_USERS_CACHE["value"])
+
+
+def _read_users_indexed():
+    """Lee usuarios.json desde disco y aplica el log usuarios.jsonl."""
+    # open() directo en vez de exists() + open(): un stat menos por archivo
+    try:
+        with open(settings.USUARIOS_PATH, "rb") as f:
+            data = orjson.loads(f.read())
+    except FileNotFoundError:
+        data = {"usuarios": []}
+
+    index = {u["email"].lower(): u for u in data.setdefault("usuarios", [])}
+    try:
+        f = open(_log_path(), "rb")
+    except FileNotFoundError:
+        return data, index
+
+    with f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                op = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # Línea truncada por una escritura interrumpida
+                continue
+            _apply_op(index, op)
+    data["usuarios"] = list(index.values())
+    return data, index
 
 
-def _save_users(data):
-    """Guarda usuarios.json."""
+def _load_users():
+    """Carga usuarios.json y aplica el log pendiente. Retorna dict con clave 'usuarios'."""
+    return _load_users_indexed()[0]
+
+
+def _save_users(data, fsync=True):
+    """
+    Guarda el snapshot completo en usuarios.json y vacía el log.
+
+    Escribe a usuarios.json.tmp y lo reemplaza con os.replace, así un corte
+    a mitad de escritura nunca deja el archivo truncado. fsync=False omite
+    el fsync cuando el llamador no necesita durabilidad inmediata.
+    """
     path = settings.USUARIOS_PATH
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _log_path().unlink(missing_ok=True)
+    _USERS_CACHE["key"] = None
+
+
+def _append_op(op):
+    """Agrega una operación al log y compacta si el log creció demasiado."""
+    log = _log_path()
+    log.parent.mkdir(parents=True, exist_ok=True)
+    with open(log, "ab") as f:
+        f.write(orjson.dumps(op, option=orjson.OPT_APPEND_NEWLINE))
+    _USERS_CACHE["key"] = None
+    _maybe_compact()
+
+
+def _maybe_compact():
+    """Reescribe el snapshot y vacía el log si supera COMPACT_THRESHOLD."""
+    log = _log_path()
+    try:
+        size = os.path.getsize(log)
+    except OSError:
+        return
+    if size > COMPACT_THRESHOLD:
+        _save_users(_load_users())
 
 
 def _find_user_data(email):
-    """Busca un usuario por email. Retorna dict o None."""
-    for u in _load_users().get("usuarios", []):
-        if u["email"].lower() == email.lower():
-            return u
-    return None
+    """Busca un usuario por email. Retorna una copia del dict o None."""
+    usuario = _load_users_indexed(copy_result=False)[1].get(email.lower())
+    return copy.deepcopy(usuario) if usuario is not None else None
 
 
-def add_user(email, nombre, rol, password, cursos=None, empresa=None):
+def add_user(email, nombre, rol, password, cursos=None, empresa=None, rounds=None):
     """Agrega un usuario nuevo."""
-    data = _load_users()
+    _, index = _load_users_indexed(copy_result=False)
 
     # Verificar si ya existe
-    for u in data["usuarios"]:
-        if u["email"].lower() == email.lower():
-            print(f"ERROR: El usuario {email} ya existe.")
-            return False
+    if email.lower() in index:
+        print(f"ERROR: El usuario {email} ya existe.")
+        return False
 
     if rol not in ("admin", "comprador"):
         print(f"ERROR: Rol inválido '{rol}'. Usar 'admin' o 'comprador'.")
@@ -62,82 +203,276 @@ def add_user(email, nombre, rol, password, cursos=None, empresa=None):
 
     user = {
         "email": email,
-        "password_hash": hash_password(password),
+        "password_hash": hash_password(password, rounds=rounds),
         "nombre": nombre,
         "rol": rol,
         "cursos": cursos or [],
         "empresa": empresa or "",
     }
-    data["usuarios"].append(user)
-    _save_users(data)
+    _append_op({"op": "add", "user": user})
     print(f"Usuario {email} ({rol}) creado exitosamente.")
     return True
 
 
 def list_users():
     """Lista todos los usuarios."""
-    data = _load_users()
+    # Solo lectura: usa el resultado cacheado sin copiarlo
+    data, _ = _load_users_indexed(copy_result=False)
     usuarios = data.get("usuarios", [])
     if not usuarios:
         print("No hay usuarios registrados.")
         return
 
-    print(f"\n{'Email':<35} {'Nombre':<30} {'Rol':<12} {'Cursos'}")
-    print("-" * 95)
-    for u in usuarios:
-        cursos_str = ", ".join(str(c) for c in u.get("cursos", []))
-        print(f"{u['email']:<35} {u['nombre']:<30} {u['rol']:<12} {cursos_str or '—'}")
-    print(f"\nTotal: {len(usuarios)} usuarios")
+    # Se arma la tabla completa y se escribe en una sola llamada
+    fmt = "{:<35} {:<30} {:<12} {}\n".format
+    partes = ["\n", fmt("Email", "Nombre", "Rol", "Cursos"), "-" * 95, "\n"]
+    partes.extend(
+        fmt(u["email"], u["nombre"], u["rol"],
+            ", ".join(map(str, u.get("cursos") or ())) or "—")
+        for u in usuarios
+    )
+    partes.append(f"\nTotal: {len(usuarios)} usuarios\n")
+    sys.stdout.write("".join(partes))
 
 
 def remove_user(email):
     """Elimina un usuario."""
-    data = _load_users()
-    original_count = len(data["usuarios"])
-    data["usuarios"] = [
-        u for u in data["usuarios"] if u["email"].lower() != email.lower()
-    ]
-
-    if len(data["usuarios"]) == original_count:
+    _, index = _load_users_indexed(copy_result=False)
+    if email.lower() not in index:
         print(f"ERROR: Usuario {email} no encontrado.")
         return False
 
-    _save_users(data)
+    _append_op({"op": "remove", "email": email})
     print(f"Usuario {email} eliminado.")
     return True
 
 
-def change_password(email, password):
+def change_password(email, password, rounds=None):
     """Cambia la contraseña de un usuario."""
-    data = _load_users()
-    for u in data["usuarios"]:
-        if u["email"].lower() == email.lower():
-            u["password_hash"] = hash_password(password)
-            _save_users(data)
-            print(f"Contraseña de {email} actualizada.")
-            return True
+    _, index = _load_users_indexed(copy_result=False)
+    if email.lower() not in index:
+        print(f"ERROR: Usuario {email} no encontrado.")
+        return False
 
-    print(f"ERROR: Usuario {email} no encontrado.")
-    return False
+    _append_op({
+        "op": "pw",
+        "email": email,
+        "password_hash": hash_password(password, rounds=rounds),
+    })
+    print(f"Contraseña de {email} actualizada.")
+    return True
 
 
 def add_curso(email, curso_id):
     """Agrega un curso a un comprador."""
-    data = _load_users()
-    for u in data["usuarios"]:
-        if u["email"].lower() == email.lower():
-            cursos = u.get("cursos", [])
-            if curso_id in cursos:
-                print(f"El curso {curso_id} ya está asignado a {email}.")
-                return True
-            cursos.append(curso_id)
-            u["cursos"] = cursos
-            _save_users(data)
-            print(f"Curso {curso_id} asignado a {email}.")
-            return True
-
-    print(f"ERROR: Usuario {email} no encontrado.")
-    return False
+    _, index = _load_users_indexed(copy_result=False)
+    u = index.get(email.lower())
+    if u is None:
+        print(f"ERROR: Usuario {email} no encontrado.")
+        return False
+
+    if curso_id in u.get("cursos", []):
+        print(f"El curso {curso_id} ya está asignado a {email}.")
+        return True
+    _append_op({"op": "curso", "email": email, "curso": curso_id})
+    print(f"Curso {curso_id} asignado a {email}.")
+    return True
+
+
+def _read_batch_ops(path):
+    """Lee operaciones de batch desde una lista JSON o un archivo JSONL."""
+    with open(path, "rb") as f:
+        text = f.read()
+    if text.lstrip().startswith(b"["):
+        return orjson.loads(text)
+    return [orjson.loads(line) for line in text.splitlines() if line.strip()]
+
+
+# Con menos contraseñas que esto no compensa levantar el pool de procesos
+BATCH_PARALLEL_MIN = 4
+
+
+def _hash_passwords(plains, rounds=None):
+    """Hashea contraseñas con bcrypt; en paralelo (procesos) si son varias."""
+    if len(plains) < BATCH_PARALLEL_MIN:
+        return [hash_password(p, rounds=rounds) for p in plains]
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        return list(ex.map(partial(hash_password, rounds=rounds), plains, chunksize=8))
+
+
+def _necesita_hash(op):
+    """True si la operación trae una contraseña que hay que hashear."""
+    return (
+        isinstance(op, dict)
+        and op.get("op") in ("add", "password")
+        and isinstance(op.get("password"), str)
+    )
+
+
+def _apply_user_op(index, op, password_hash=None):
+    """
+    Aplica una operación de batch/daemon sobre el índice en memoria.
+
+    Retorna (op_log, None) si se aplicó, donde op_log es la operación
+    equivalente para usuarios.jsonl, o (None, mensaje) si fue rechazada.
+    """
+    if not isinstance(op, dict):
+        return None, "operación inválida: se esperaba un objeto JSON"
+    kind = op.get("op")
+    email = op.get("email", "")
+    if not isinstance(email, str):
+        return None, f"email inválido {email!r}"
+    key = email.lower()
+
+    if kind in ("add", "password") and password_hash is None:
+        return None, f"falta password para {email}"
+
+    if kind == "add":
+        if key in index:
+            return None, f"el usuario {email} ya existe"
+        if op.get("rol") not in ("admin", "comprador"):
+            return None, f"rol inválido '{op.get('rol')}'"
+        user = {
+            "email": email,
+            "password_hash": password_hash,
+            "nombre": op.get("nombre", ""),
+            "rol": op["rol"],
+            "cursos": op.get("cursos") or [],
+            "empresa": op.get("empresa") or "",
+        }
+        index[key] = user
+        return {"op": "add", "user": user}, None
+
+    if kind not in ("remove", "password", "add-curso"):
+        return None, f"operación desconocida '{kind}'"
+
+    u = index.get(key)
+    if u is None:
+        return None, f"usuario {email} no encontrado"
+    if kind == "remove":
+        del index[key]
+        return {"op": "remove", "email": email}, None
+    if kind == "password":
+        u["password_hash"] = password_hash
+        return {"op": "pw", "email": email, "password_hash": password_hash}, None
+    if "curso" not in op:
+        return None, f"falta curso para {email}"
+    cursos = u.setdefault("cursos", [])
+    if op["curso"] not in cursos:
+        cursos.append(op["curso"])
+    return {"op": "curso", "email": email, "curso": op["curso"]}, None
+
+
+def apply_batch(path, rounds=None):
+    """
+    Aplica un archivo de operaciones con una sola carga y un solo guardado.
+
+    Retorna dict con conteo de operaciones aplicadas y errores.
+    """
+    data, index = _load_users_indexed()
+    applied = 0
+    errors = []
+
+    ops = _read_batch_ops(path)
+    # bcrypt es lo caro del batch: se hashean todas las contraseñas de una vez
+    con_password = [i for i, op in enumerate(ops) if _necesita_hash(op)]
+    hashes = dict(zip(
+        con_password,
+        _hash_passwords([ops[i]["password"] for i in con_password], rounds=rounds),
+    ))
+
+    for n, op in enumerate(ops, start=1):
+        _, error = _apply_user_op(index, op, hashes.get(n - 1))
+        if error:
+            errors.append(f"#{n}: {error}")
+        else:
+            applied += 1
+
+    if applied:
+        data["usuarios"] = list(index.values())
+        _save_users(data)
+    return {"aplicadas": applied, "errores": errors}
+
+
+# Operaciones en espera (hash en curso o por escribir) antes de responder "busy"
+DAEMON_MAX_PENDING = 500
+
+
+def run_daemon(rounds=None, stdin=None, stdout=None):
+    """
+    Procesa operaciones JSON (una por línea, formato de batch) desde stdin.
+
+    El hilo principal lee y envía los bcrypt a un pool de procesos; un hilo
+    escritor espera cada hash en orden de llegada, aplica la operación
+    (agregándola a usuarios.jsonl) y responde una línea JSON por operación
+    con "id" (si vino), "status" ("ok", "error" o "busy") y "detalle".
+
+    Los usuarios se cargan una vez al iniciar y el escritor mantiene ese
+    índice en memoria; no ve cambios hechos por otros procesos mientras
+    el daemon corre.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    out_lock = threading.Lock()
+    pending = queue.Queue(maxsize=DAEMON_MAX_PENDING)
+
+    def respond(op_id, status, detalle=""):
+        line = orjson.dumps({"id": op_id, "status": status, "detalle": detalle})
+        with out_lock:
+            stdout.write(line.decode("utf-8") + "\n")
+            stdout.flush()
+
+    # Índice propio del escritor (copia): cada operación se aplica sobre él
+    # y solo se agrega al log, sin releer usuarios.json + usuarios.jsonl
+    _, index = _load_users_indexed()
+
+    def writer():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            op, future = item
+            try:
+                password_hash = future.result() if future else None
+                op_log, error = _apply_user_op(index, op, password_hash)
+                if op_log:
+                    _append_op(op_log)
+            except Exception as e:
+                error = str(e)
+                # La operación pudo quedar en el índice sin llegar al log:
+                # volver al estado en disco
+                index.clear()
+                index.update(_load_users_indexed()[1])
+            if error:
+                respond(op.get("id"), "error", error)
+            else:
+                respond(op.get("id"), "ok")
+
+    hasher = partial(hash_password, rounds=rounds)
+    with ProcessPoolExecutor(max_workers=(os.cpu_count() or 1) * 2) as pool:
+        thread = threading.Thread(target=writer, daemon=True)
+        thread.start()
+        for line in stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                op = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                respond(None, "error", f"JSON inválido: {e}")
+                continue
+            if not isinstance(op, dict):
+                respond(None, "error", "operación inválida: se esperaba un objeto JSON")
+                continue
+            if pending.full():
+                respond(op.get("id"), "busy")
+                continue
+            future = None
+            if _necesita_hash(op):
+                future = pool.submit(hasher, op["password"])
+            pending.put((op, future))
+        pending.put(None)
+        thread.join()
 
 
 def main():
@@ -155,6 +490,7 @@ def main():
     add_parser.add_argument("--password", required=True)
     add_parser.add_argument("--cursos", type=int, nargs="*", default=[])
     add_parser.add_argument("--empresa", default="")
+    add_parser.add_argument("--bcrypt-rounds", type=int, choices=range(4, 32), metavar="N")
 
     # list
     subparsers.add_parser("list", help="Listar usuarios")
@@ -167,24 +503,45 @@ def main():
     pw_parser = subparsers.add_parser("password", help="Cambiar contraseña")
     pw_parser.add_argument("--email", required=True)
     pw_parser.add_argument("--password", required=True)
+    pw_parser.add_argument("--bcrypt-rounds", type=int, choices=range(4, 32), metavar="N")
 
     # add-curso
     ac_parser = subparsers.add_parser("add-curso", help="Agregar curso a usuario")
     ac_parser.add_argument("--email", required=True)
     ac_parser.add_argument("--curso", type=int, required=True)
 
+    # batch
+    batch_parser = subparsers.add_parser("batch", help="Aplicar operaciones desde archivo")
+    batch_parser.add_argument("--file", required=True)
+    batch_parser.add_argument("--bcrypt-rounds", type=int, choices=range(4, 32), metavar="N")
+
+    # daemon
+    daemon_parser = subparsers.add_parser(
+        "daemon", help="Procesar operaciones JSON desde stdin (una por línea)"
+    )
+    daemon_parser.add_argument("--bcrypt-rounds", type=int, choices=range(4, 32), metavar="N")
+
     args = parser.parse_args()
 
     if args.command == "add":
-        add_user(args.email, args.nombre, args.rol, args.password, args.cursos, args.empresa)
+        add_user(args.email, args.nombre, args.rol, args.password, args.cursos, args.empresa,
+                 rounds=args.bcrypt_rounds)
     elif args.command == "list":
         list_users()
     elif args.command == "remove":
         remove_user(args.email)
     elif args.command == "password":
-        change_password(args.email, args.password)
+        change_password(args.email, args.password, rounds=args.bcrypt_rounds)
     elif args.command == "add-curso":
         add_curso(args.email, args.curso)
+    elif args.command == "batch":
+        result = apply_batch(args.file, rounds=args.bcrypt_rounds)
+        lineas = [f"ERROR: {error}" for error in result["errores"]]
+        lineas.append(f"Batch aplicado: {result['aplicadas']} operaciones, "
+                      f"{len(result['errores'])} errores.")
+        sys.stdout.write("\n".join(lineas) + "\n")
+    elif args.command == "daemon":
+        run_daemon(rounds=args.bcrypt_rounds)
     else:
         parser.print_help()
 
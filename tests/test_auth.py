@@ -320,6 +320,40 @@ class TestApiDatosComprador:
         assert data["metadata"]["total_cursos"] == 1
         assert data["metadata"]["total_estudiantes"] == 1
 
+    def test_api_datos_comprador_gzip_con_etag_propio(self, auth_app_client):
+        """La vista gzip tiene su propio ETag y se sirve desde el caché."""
+        import gzip
+
+        _login_session(auth_app_client, "comprador@test.cl")
+        with patch("src.web.routes.VISTA_GZIP_MIN_SIZE", 0), \
+             patch("src.web.routes.gzip.compress", wraps=gzip.compress) as compress:
+            plano = auth_app_client.get("/api/datos")
+            comprimido = auth_app_client.get("/api/datos", headers={"Accept-Encoding": "gzip"})
+            otra = auth_app_client.get("/api/datos", headers={
+                "Accept-Encoding": "gzip", "If-None-Match": comprimido.headers["ETag"],
+            })
+            auth_app_client.get("/api/datos", headers={"Accept-Encoding": "gzip"})
+
+        assert "Content-Encoding" not in plano.headers
+        assert comprimido.headers["Content-Encoding"] == "gzip"
+        assert comprimido.headers["ETag"] == plano.headers["ETag"][:-1] + '-gzip"'
+        assert gzip.decompress(comprimido.data) == plano.data
+        assert otra.status_code == 304
+        assert compress.call_count == 1
+
+    def test_seleccion_mantiene_orden_e_ignora_ids_no_numericos(self):
+        """La selección por índice respeta el orden del archivo."""
+        from src.web.auth import User
+        from src.web.routes import _seleccionar_cursos
+
+        datos = {"cursos": [
+            {"id_moodle": "141"}, {"id_moodle": "RELATORIA"}, {"id_moodle": "140"},
+        ]}
+        user = User("x@test.cl", "X", "comprador", ["140", 141, 999])
+        assert user.cursos_set == frozenset({140, 141, 999})
+        seleccion = _seleccionar_cursos(datos, user.cursos_set)
+        assert [c["id_moodle"] for c in seleccion] == ["141", "140"]
+
 
 # ── Test 9: API /api/me admin ─────────────────────────────
 
@@ -364,6 +398,15 @@ class TestCompradorCannotSendEmail:
         )
         assert resp.status_code == 403
 
+    def test_comprador_rechazado_no_consume_rate_limit(self, auth_app_client):
+        """El 403 corta antes del rate limit y de las rutas de coordinadores."""
+        from src.web import routes
+        routes._window_state.clear()
+        _login_session(auth_app_client, "comprador@test.cl")
+        auth_app_client.post("/api/enviar-correo", json={})
+        assert not routes._window_state
+        assert auth_app_client.get("/api/coordinadores").status_code == 403
+
 
 # ── Test 12: Rate limiting login ──────────────────────────
 
@@ -525,3 +568,139 @@ class TestDescargarExcelSinCursos:
         assert resp.status_code == 404
         data = resp.get_json()
         assert "error" in data
+
+
+# ── Test 22: User manager batch ───────────────────────
+
+class TestUserManagerBatch:
+    def test_user_manager_batch(self, tmp_path):
+        """Batch aplica varias operaciones y reporta las inválidas."""
+        path = _make_usuarios_file(tmp_path)
+        ops = tmp_path / "ops.jsonl"
+        ops.write_text("\n".join(json.dumps(op) for op in [
+            {"op": "add", "email": "nuevo@test.cl", "nombre": "Nuevo",
+             "rol": "comprador", "password": "x", "cursos": [150]},
+            {"op": "add", "email": "ADMIN@test.cl", "nombre": "Dup",
+             "rol": "admin", "password": "x"},
+            {"op": "add-curso", "email": "comprador@test.cl", "curso": 143},
+            {"op": "remove", "email": "admin@test.cl"},
+            {"op": "password", "email": "noexiste@test.cl", "password": "x"},
+        ]), encoding="utf-8")
+        with patch("config.settings.USUARIOS_PATH", path), \
+             patch("src.web.user_manager.hash_password", lambda p, rounds=None: "hash"):
+            from src.web.user_manager import apply_batch, _load_users
+            result = apply_batch(ops)
+            assert result["aplicadas"] == 3
+            assert len(result["errores"]) == 2
+            usuarios = {u["email"]: u for u in _load_users()["usuarios"]}
+            assert set(usuarios) == {"comprador@test.cl", "nuevo@test.cl"}
+            assert usuarios["comprador@test.cl"]["cursos"] == [140, 143]
+
+    def test_batch_rechaza_lineas_que_no_son_objeto(self, tmp_path):
+        """Una línea JSON válida pero no objeto se reporta, no corta el batch."""
+        path = _make_usuarios_file(tmp_path)
+        ops = tmp_path / "ops.jsonl"
+        ops.write_text(
+            '"hola"\n[1, 2]\n'
+            '{"op": "add-curso", "email": "comprador@test.cl", "curso": 143}\n',
+            encoding="utf-8",
+        )
+        with patch("config.settings.USUARIOS_PATH", path):
+            from src.web.user_manager import apply_batch, _find_user_data
+            result = apply_batch(ops)
+            assert result["aplicadas"] == 1
+            assert [e.split(":")[0] for e in result["errores"]] == ["#1", "#2"]
+            assert _find_user_data("comprador@test.cl")["cursos"] == [140, 143]
+
+
+# ── Test 23: User manager log (append, replay, compactación) ──
+
+class TestUserManagerLog:
+    def test_cambios_van_al_log_y_se_reaplican(self, tmp_path):
+        """add_user/add_curso escriben en usuarios.jsonl y la lectura los reaplica."""
+        path = _make_usuarios_file(tmp_path)
+        snapshot = path.read_bytes()
+        with patch("config.settings.USUARIOS_PATH", path), \
+             patch("src.web.user_manager.hash_password", lambda p, rounds=None: "hash"):
+            from src.web import user_manager
+            assert user_manager.add_user("nuevo@test.cl", "Nuevo", "comprador", "x", cursos=[190])
+            assert user_manager.add_curso("comprador@test.cl", 191)
+            assert user_manager.remove_user("admin@test.cl")
+
+            assert path.read_bytes() == snapshot
+            assert len(path.with_suffix(".jsonl").read_text().splitlines()) == 3
+
+            usuarios = {u["email"]: u for u in user_manager._load_users()["usuarios"]}
+            assert set(usuarios) == {"comprador@test.cl", "nuevo@test.cl"}
+            assert usuarios["comprador@test.cl"]["cursos"] == [140, 191]
+            assert usuarios["nuevo@test.cl"]["cursos"] == [190]
+
+    def test_linea_truncada_del_log_se_ignora(self, tmp_path):
+        """Una escritura interrumpida no impide leer el resto del log."""
+        path = _make_usuarios_file(tmp_path)
+        path.with_suffix(".jsonl").write_text(
+            '{"op": "curso", "email": "comprador@test.cl", "curso": 150}\n{"op": "rem',
+            encoding="utf-8",
+        )
+        with patch("config.settings.USUARIOS_PATH", path):
+            from src.web.user_manager import _find_user_data
+            assert _find_user_data("comprador@test.cl")["cursos"] == [140, 150]
+            assert _find_user_data("admin@test.cl") is not None
+
+    def test_find_user_data_retorna_copia(self, tmp_path):
+        """Mutar el usuario retornado no altera el caché compartido."""
+        path = _make_usuarios_file(tmp_path)
+        with patch("config.settings.USUARIOS_PATH", path):
+            from src.web.user_manager import _find_user_data
+            usuario = _find_user_data("COMPRADOR@test.cl")
+            usuario["cursos"].append(999)
+            assert _find_user_data("comprador@test.cl")["cursos"] == [140]
+            assert _find_user_data("nadie@test.cl") is None
+
+    def test_compactacion_reescribe_snapshot(self, tmp_path):
+        """Al superar COMPACT_THRESHOLD el log se vuelca a usuarios.json."""
+        path = _make_usuarios_file(tmp_path)
+        with patch("config.settings.USUARIOS_PATH", path), \
+             patch("src.web.user_manager.COMPACT_THRESHOLD", 1):
+            from src.web import user_manager
+            assert user_manager.add_curso("comprador@test.cl", 150)
+
+            assert not path.with_suffix(".jsonl").exists()
+            data = json.loads(path.read_text(encoding="utf-8"))
+            usuarios = {u["email"]: u for u in data["usuarios"]}
+            assert usuarios["comprador@test.cl"]["cursos"] == [140, 150]
+
+    def test_coordinadores_incluyen_cambios_del_log(self, tmp_path):
+        """El pipeline ve coordinadores agregados que siguen solo en el log."""
+        path = _make_usuarios_file(tmp_path)
+        with patch("config.settings.USUARIOS_PATH", path), \
+             patch("src.web.user_manager.hash_password", lambda p, rounds=None: "hash"):
+            from src.web.user_manager import add_user
+            from src.ingest.compradores_reader import _leer_desde_json
+            assert add_user("nuevo@test.cl", "Nuevo", "comprador", "x", cursos=[190])
+
+            df = _leer_desde_json()
+            assert set(df["id_curso_moodle"]) == {"140", "190"}
+
+    def test_daemon_responde_error_en_lineas_invalidas(self, tmp_path):
+        """El daemon contesta error por línea inválida y sigue procesando."""
+        import io
+
+        path = _make_usuarios_file(tmp_path)
+        stdin = io.StringIO(
+            '[1, 2]\n'
+            'no es json\n'
+            '{"id": 7, "op": "add-curso", "email": "comprador@test.cl", "curso": 150}\n'
+            '{"id": 8, "op": "remove", "email": "admin@test.cl"}\n'
+        )
+        stdout = io.StringIO()
+        with patch("config.settings.USUARIOS_PATH", path):
+            from src.web.user_manager import run_daemon, _load_users
+            run_daemon(stdin=stdin, stdout=stdout)
+            respuestas = [json.loads(l) for l in stdout.getvalue().splitlines()]
+            assert [(r["id"], r["status"]) for r in respuestas] == [
+                (None, "error"), (None, "error"), (7, "ok"), (8, "ok"),
+            ]
+            usuarios = {u["email"]: u for u in _load_users()["usuarios"]}
+            assert set(usuarios) == {"comprador@test.cl"}
+            assert usuarios["comprador@test.cl"]["cursos"] == [140, 150]
@@ -0,0 +1,331 @@
+"""Tests del módulo de cobranzas contra una BD SQLite temporal."""
+
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import patch
+
+import bcrypt
+import orjson
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.cobranzas import models
+from src.cobranzas.credit_note_engine import ncs_afectadas_desde
+from src.cobranzas.models import get_db, init_db, insertar_documentos
+from src.cobranzas.payment_engine import DistribucionItem, anular_pago, registrar_pago
+from src.web import routes_cobranzas
+
+
+# ── Helpers ────────────────────────────────────────────────
+
+def _doc(tipo_doc, folio, monto_total, fecha="2026-03-10", **extra):
+    """Documento SII con los campos que exige insertar_documentos."""
+    doc = {
+        "tipo_doc": tipo_doc,
+        "tipo_doc_nombre": "Nota de Crédito" if tipo_doc == 61 else "Factura",
+        "tipo_venta": None,
+        "rut_cliente": "76.000.000-1",
+        "razon_social": "OTIC Prueba",
+        "folio": folio,
+        "fecha_docto": fecha,
+        "fecha_recepcion": None,
+        "fecha_acuse_recibo": None,
+        "monto_exento": monto_total,
+        "monto_neto": 0,
+        "monto_iva": 0,
+        "monto_total": monto_total,
+        "folio_referencia": None,
+        "tipo_doc_referencia": None,
+        "periodo_tributario": fecha[:7],
+        "archivo_origen": "test.csv",
+        "fecha_importacion": "2026-03-15 10:00:00",
+        "estado": "Pendiente",
+        "saldo_pendiente": 0 if tipo_doc == 61 else monto_total,
+    }
+    doc.update(extra)
+    return doc
+
+
+def _nc(folio, monto_total, folio_ref, fecha="2026-03-12"):
+    return _doc(61, folio, monto_total, fecha,
+                folio_referencia=folio_ref, tipo_doc_referencia=33)
+
+
+def _factura(conn, tipo_doc, folio):
+    return conn.execute(
+        "SELECT * FROM documentos_sii WHERE tipo_doc = ? AND folio = ?",
+        (tipo_doc, folio),
+    ).fetchone()
+
+
+# ── Fixtures ──────────────────────────────────────────────
+
+@pytest.fixture
+def cobranzas_db(tmp_path):
+    """BD de cobranzas vacía en tmp_path."""
+    with patch.object(models, "DB_PATH", tmp_path / "cobranzas.db"):
+        init_db()
+        yield tmp_path / "cobranzas.db"
+
+
+@pytest.fixture
+def admin_client(tmp_path, cobranzas_db):
+    """Cliente Flask con sesión de administrador sobre la BD temporal."""
+    usuarios_path = tmp_path / "usuarios.json"
+    usuarios_path.write_bytes(orjson.dumps({"usuarios": [{
+        "email": "admin@test.cl",
+        "password_hash": bcrypt.hashpw(b"admin123", bcrypt.gensalt(rounds=4)).decode(),
+        "nombre": "Admin Test",
+        "rol": "admin",
+        "cursos": [],
+    }]}))
+    with patch("config.settings.USUARIOS_PATH", usuarios_path), \
+         patch("config.settings.SII_CSV_PATH", tmp_path / "sii_csv"), \
+         patch("config.settings.TEMPLATES_PATH",
+               Path(__file__).resolve().parent.parent / "templates"):
+        from src.web.app import create_app
+        app = create_app()
+        app.config["TESTING"] = True
+        with app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess["_user_id"] = "admin@test.cl"
+                sess["_fresh"] = True
+            yield client
+
+
+# ── Test 1: Agregados mantenidos por triggers ──────────────
+
+class TestAgregados:
+    """monto_nc_cache / total_pagado_cache."""
+
+    def test_nc_insertada_antes_que_su_factura(self, cobranzas_db):
+        """La factura que llega después de su NC parte con monto_nc_cache correcto."""
+        with get_db() as conn:
+            insertar_documentos(conn, [_nc(900, 30_000, folio_ref=100)])
+            insertar_documentos(conn, [_doc(33, 100, 100_000)])
+            assert _factura(conn, 33, 100)["monto_nc_cache"] == 30_000
+
+    def test_nc_posterior_y_eliminada(self, cobranzas_db):
+        """Insertar y borrar una NC ajusta la factura referenciada."""
+        with get_db() as conn:
+            insertar_documentos(conn, [_doc(33, 100, 100_000)])
+            insertar_documentos(conn, [_nc(900, 30_000, folio_ref=100),
+                                       _nc(901, 10_000, folio_ref=100)])
+            assert _factura(conn, 33, 100)["monto_nc_cache"] == 40_000
+
+            conn.execute("DELETE FROM documentos_sii WHERE tipo_doc = 61 AND folio = 900")
+            assert _factura(conn, 33, 100)["monto_nc_cache"] == 10_000
+
+    def test_pago_anulado_restaura_total_pagado(self, cobranzas_db):
+        """Anular un pago descuenta su distribución de total_pagado_cache."""
+        with get_db() as conn:
+            insertar_documentos(conn, [_doc(33, 100, 100_000), _doc(33, 101, 50_000)])
+            f1 = _factura(conn, 33, 100)["id"]
+            f2 = _factura(conn, 33, 101)["id"]
+
+            res = registrar_pago(
+                conn, "2026-04-01", 80_000,
+                [DistribucionItem(f1, 60_000), DistribucionItem(f2, 20_000)],
+                "admin@test.cl",
+            )
+            assert res.ok, res.errores
+            assert _factura(conn, 33, 100)["total_pagado_cache"] == 60_000
+            assert _factura(conn, 33, 101)["total_pagado_cache"] == 20_000
+
+            assert anular_pago(conn, res.pago_id, "admin@test.cl")["ok"]
+            for folio, monto in ((100, 100_000), (101, 50_000)):
+                fila = _factura(conn, 33, folio)
+                assert fila["total_pagado_cache"] == 0
+                assert fila["saldo_pendiente"] == monto
+                assert fila["estado"] == "Pendiente"
+
+    def test_alter_rellena_columnas_nuevas(self, cobranzas_db):
+        """Una BD sin las columnas de agregados las recibe ya calculadas."""
+        with get_db() as conn:
+            insertar_documentos(conn, [_doc(33, 100, 100_000),
+                                       _nc(900, 30_000, folio_ref=100)])
+            f1 = _factura(conn, 33, 100)["id"]
+            res = registrar_pago(conn, "2026-04-01", 25_000,
+                                 [DistribucionItem(f1, 25_000)], "admin@test.cl")
+            assert res.ok, res.errores
+
+        # Simular el esquema anterior: sin triggers de agregados ni columnas
+        with sqlite3.connect(cobranzas_db) as conn:
+            for trigger in ("trg_nc_insert", "trg_nc_delete", "trg_factura_insert",
+                            "trg_pago_detalle_insert", "trg_pago_detalle_delete"):
+                conn.execute(f"DROP TRIGGER {trigger}")
+            conn.execute("ALTER TABLE documentos_sii DROP COLUMN monto_nc_cache")
+            conn.execute("ALTER TABLE documentos_sii DROP COLUMN total_pagado_cache")
+
+        init_db()
+        with get_db() as conn:
+            fila = _factura(conn, 33, 100)
+            assert fila["monto_nc_cache"] == 30_000
+            assert fila["total_pagado_cache"] == 25_000
+
+
+# ── Test 2: NC afectadas por una importación ───────────────
+
+class TestNcsAfectadas:
+    """ncs_afectadas_desde()."""
+
+    def test_incluye_nc_nuevas_y_previas_de_facturas_nuevas(self, cobranzas_db):
+        with get_db() as conn:
+            insertar_documentos(conn, [
+                _doc(33, 50, 10_000),
+                _nc(800, 1_000, folio_ref=50),     # ya aplicada a factura previa
+                _nc(801, 2_000, folio_ref=100),    # esperaba a la factura 100
+            ])
+            id_desde = conn.execute("SELECT MAX(id) FROM documentos_sii").fetchone()[0]
+            insertar_documentos(conn, [
+                _doc(33, 100, 100_000),
+                _nc(802, 3_000, folio_ref=50, fecha="2026-03-20"),
+            ])
+
+            ids = ncs_afectadas_desde(conn, id_desde)
+            folios = [conn.execute("SELECT folio FROM documentos_sii WHERE id = ?",
+                                   (i,)).fetchone()[0] for i in ids]
+            assert folios == [801, 802]
+
+
+# ── Test 3: Cursor de paginación y búsqueda ─────────────────
+
+class TestCursorYBusqueda:
+    """_codificar_cursor / _decodificar_cursor / _consulta_fts."""
+
+    def test_cursor_ida_y_vuelta(self):
+        cursor = routes_cobranzas._codificar_cursor("2026-03-10", 123, 45)
+        assert "=" not in cursor
+        assert routes_cobranzas._decodificar_cursor(cursor) == ("2026-03-10", 123, 45)
+
+    @pytest.mark.parametrize("cursor", ["basura!", "e30", "WzEsMl0", "WyJhIiwieCIsMV0"])
+    def test_cursor_invalido(self, cursor):
+        """Base64 roto, JSON que no es terna y folio no numérico."""
+        with pytest.raises(ValueError, match="cursor inválido"):
+            routes_cobranzas._decodificar_cursor(cursor)
+
+    def test_consulta_fts_escapa_comillas(self):
+        assert routes_cobranzas._consulta_fts('o"brien  (sa)') == '"o"* "brien"* "sa"*'
+        assert routes_cobranzas._consulta_fts('"*') == ""
+
+    def test_consulta_fts_con_comilla_es_valida(self, cobranzas_db):
+        with get_db() as conn:
+            insertar_documentos(conn, [_doc(33, 100, 1_000, razon_social='OTIC "Sur"')])
+            filas = conn.execute(
+                "SELECT rowid FROM documentos_sii_fts WHERE documentos_sii_fts MATCH ?",
+                (routes_cobranzas._consulta_fts('otic "sur'),),
+            ).fetchall()
+        assert len(filas) == 1
+
+
+# ── Test 4: API de listado de facturas ─────────────────────
+
+class TestListadoFacturas:
+    """GET /api/cobranzas/facturas."""
+
+    def test_paginas_sin_filas_repetidas(self, admin_client):
+        """Con fechas y folios empatados ninguna fila se repite ni se pierde."""
+        with get_db() as conn:
+            docs = [_doc(33, 100 + i, 1_000, fecha=f"2026-03-{10 + i % 3:02d}")
+                    for i in range(20)]
+            docs += [_doc(34, 100 + i, 1_000, fecha="2026-03-10") for i in range(5)]
+            insertar_documentos(conn, docs)
+
+        vistos, cursor, paginas = [], "", 0
+        while True:
+            resp = admin_client.get(f"/api/cobranzas/facturas?per_page=10&cursor={cursor}")
+            assert resp.status_code == 200
+            body = resp.get_json()
+            col_id = body["columns"].index("id")
+            vistos += [fila[col_id] for fila in body["data"]]
+            paginas += 1
+            cursor = body["next_cursor"]
+            if not cursor:
+                break
+
+        assert paginas == 3
+        assert len(vistos) == len(set(vistos)) == 25
+
+    def test_cursor_invalido_responde_400(self, admin_client):
+        resp = admin_client.get("/api/cobranzas/facturas?cursor=basura!")
+        assert resp.status_code == 400
+        assert resp.get_json()["error"] == "cursor inválido"
+
+    def test_busqueda_con_comilla(self, admin_client):
+        with get_db() as conn:
+            insertar_documentos(conn, [
+                _doc(33, 100, 1_000, razon_social="OTIC O'Higgins"),
+                _doc(33, 101, 1_000, razon_social="OTIC Norte"),
+            ])
+        for q in ("O'Higgins", 'higg"', '"'):
+            resp = admin_client.get("/api/cobranzas/facturas", query_string={"q": q})
+            assert resp.status_code == 200, q
+            folios = [f[3] for f in resp.get_json()["data"]]
+            assert folios == ([] if q == '"' else [100]), q
+
+
+# ── Test 5: Importación en segundo plano ───────────────────
+
+class TestImportacionJob:
+    """POST /api/cobranzas/importar + GET /api/cobranzas/importar/job/<id>."""
+
+    def _importar(self, admin_client, procesar):
+        executor = ThreadPoolExecutor(max_workers=1)
+        with patch.object(routes_cobranzas, "_import_executor", executor), \
+             patch.object(routes_cobranzas, "_procesar_importacion", procesar):
+            resp = admin_client.post(
+                "/api/cobranzas/importar",
+                data={"archivos": (BytesIO(b"x"), "RCV_VENTA_2026-03.csv")},
+                content_type="multipart/form-data",
+            )
+            executor.shutdown(wait=True)
+        assert resp.status_code == 202
+        job_id = resp.get_json()["job_id"]
+        assert resp.headers["Location"].endswith(f"/api/cobranzas/importar/job/{job_id}")
+        return job_id
+
+    def test_job_terminado_expone_resumen(self, admin_client, tmp_path):
+        recibido = {}
+
+        def procesar(rutas, usuario, ip):
+            recibido.update(rutas=rutas, usuario=usuario)
+            return {"archivos": 1, "insertados": 7}
+
+        job_id = self._importar(admin_client, procesar)
+        assert recibido["usuario"] == "admin@test.cl"
+        assert recibido["rutas"] == [tmp_path / "sii_csv" / "RCV_VENTA_2026-03.csv"]
+
+        body = admin_client.get(f"/api/cobranzas/importar/job/{job_id}").get_json()
+        assert body == {"ok": True, "status": "done", "job_id": job_id,
+                        "archivos": 1, "insertados": 7}
+
+    def test_job_con_error(self, admin_client):
+        def procesar(rutas, usuario, ip):
+            raise RuntimeError("CSV ilegible")
+
+        job_id = self._importar(admin_client, procesar)
+        body = admin_client.get(f"/api/cobranzas/importar/job/{job_id}").get_json()
+        assert body["status"] == "error"
+        assert body["error"] == "CSV ilegible"
+
+    def test_job_pendiente_visible_desde_la_bd(self, admin_client):
+        """El estado vive en la tabla importaciones, no en memoria del worker."""
+        with get_db() as conn:
+            models.crear_importacion(conn, "abc123", "otro@test.cl")
+        body = admin_client.get("/api/cobranzas/importar/job/abc123").get_json()
+        assert body == {"ok": True, "status": "pending", "job_id": "abc123"}
+
+        assert admin_client.get("/api/cobranzas/importar/job/fff").status_code == 404
+        assert admin_client.get("/api/cobranzas/importar/job/NO-HEX").status_code == 400
+
+    def test_conserva_solo_los_mas_recientes(self, cobranzas_db):
+        with get_db() as conn:
+            for i in range(5):
+                models.crear_importacion(conn, f"{i:x}", "admin@test.cl", conservar=3)
+            ids = {r[0] for r in conn.execute("SELECT job_id FROM importaciones")}
+        assert len(ids) == 3
+        assert "4" in ids
@@ -101,3 +101,47 @@ class TestCompradoresReader:
         df = leer_compradores()
         for col in ["id_curso_moodle", "comprador_nombre", "empresa", "email_comprador"]:
             assert col in df.columns, f"Falta columna {col}"
+
+
+class TestMoodleCompletionBatch:
+    """Progreso Moodle en lote vía tool_mobile_call_external_functions."""
+
+    @pytest.fixture(autouse=True)
+    def _batch_habilitado(self, monkeypatch):
+        from src.ingest import moodle_api_client as api
+        monkeypatch.setattr(api, "_batch_disponible", True)
+
+    def test_lote_calcula_progreso_por_usuario(self, monkeypatch):
+        import json
+        from src.ingest import moodle_api_client as api
+
+        llamadas = []
+
+        def fake_call(function, params=None):
+            llamadas.append((function, params))
+            return {"responses": [
+                {"error": False, "data": json.dumps({"statuses": [{"state": 1}, {"state": 0}]})},
+                {"error": True, "exception": json.dumps({"message": "sin tracking"})},
+            ]}
+
+        monkeypatch.setattr(api, "moodle_api_call", fake_call)
+        progresos = api.get_completion_statuses(7, [1, 2])
+
+        assert progresos == {1: 50.0, 2: 0.0}
+        assert len(llamadas) == 1
+        function, params = llamadas[0]
+        assert function == "tool_mobile_call_external_functions"
+        assert json.loads(params["requests[1][arguments]"]) == {"courseid": 7, "userid": 2}
+
+    def test_sin_funcion_de_lote_usa_llamadas_individuales(self, monkeypatch):
+        from src.ingest import moodle_api_client as api
+
+        def fake_call(function, params=None):
+            if function == "tool_mobile_call_external_functions":
+                raise api.MoodleAPIError("Access control exception")
+            return {"statuses": [{"state": 2}]}
+
+        monkeypatch.setattr(api, "moodle_api_call", fake_call)
+
+        assert api.get_completion_statuses(7, [1, 2]) == {1: 100.0, 2: 100.0}
+        assert api._batch_disponible is False
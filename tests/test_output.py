@@ -57,6 +57,15 @@ class TestJsonExporter:
                 loaded = json.load(f)
             assert loaded == result
 
+            # Sidecar con la metadata para /api/health
+            meta = json.loads((Path(tmpdir) / "datos_meta.json").read_text(encoding="utf-8"))
+            assert meta == result["metadata"]
+
+            # Copia precomprimida para /api/datos
+            import gzip
+            gz = (Path(tmpdir) / "test.json.gz").read_bytes()
+            assert gzip.decompress(gz) == out_path.read_bytes()
+
     def test_estructura_curso(self):
         from src.output.json_exporter import exportar_json
 
@@ -819,6 +819,36 @@ class TestMultipleEmailRecipients:
 
         assert resultado["status"] == "DRY-RUN"
 
+    def test_envio_individual_reutiliza_token_y_sesion(self):
+        """Un correo por destinatario, con un solo token y una sola Session."""
+        from src.reports.email_sender import enviar_correos_individuales
+
+        session = MagicMock()
+        session.__enter__.return_value = session
+        session.post.return_value.status_code = 202
+        with patch("src.reports.email_sender.obtener_token_azure", return_value="tok") as mock_token, \
+             patch("src.reports.email_sender.requests.Session", return_value=session), \
+             patch("config.settings.EMAIL_REMITENTE", "envios@test.cl"):
+            resultado = enviar_correos_individuales(
+                ["maria@test.cl", "pedro@test.cl, ana@test.cl"], "Test", "<p>Test</p>",
+                cc="jefe@test.cl, copia@test.cl",
+            )
+
+        assert resultado["status"] == "OK"
+        mock_token.assert_called_once()
+        destinos = [
+            c.kwargs["json"]["message"]["toRecipients"] for c in session.post.call_args_list
+        ]
+        assert destinos == [
+            [{"emailAddress": {"address": e}}]
+            for e in ("maria@test.cl", "pedro@test.cl", "ana@test.cl")
+        ]
+        cc = session.post.call_args.kwargs["json"]["message"]["ccRecipients"]
+        assert cc == [
+            {"emailAddress": {"address": "jefe@test.cl"}},
+            {"emailAddress": {"address": "copia@test.cl"}},
+        ]
+
 
 # ── Test 15: Orchestrator detiene en validación ──────────
 
@@ -6,6 +6,7 @@ sin autenticación. Los tests de autenticación están en test_auth.py.
 
 import json
 import sys
+from collections import Counter, defaultdict
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 
@@ -113,6 +114,20 @@ def app_client(json_file, tmp_path):
             yield client
 
 
+@pytest.fixture
+def mail_executor(tmp_path):
+    """Pool propio para los envíos de correo, para poder esperar a que terminen.
+
+    El estado de los envíos se escribe en un OUTPUT_PATH temporal.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    executor = ThreadPoolExecutor(max_workers=1)
+    with patch("src.web.routes._mail_executor", executor), \
+         patch("config.settings.OUTPUT_PATH", tmp_path / "output"):
+        yield executor
+    executor.shutdown(wait=True)
+
+
 @pytest.fixture
 def app_client_no_json(tmp_path):
     """Test client sin datos JSON (simula pipeline no ejecutado)."""
@@ -138,6 +153,15 @@ class TestIndexRoute:
         assert "text/html" in response.content_type
         assert b"Sistema de Gesti" in response.data  # título del dashboard
 
+    def test_dashboard_cacheado_usa_token_de_la_sesion(self, app_client):
+        """El HTML cacheado lleva siempre el token CSRF de la sesión actual."""
+        primera = app_client.get("/dashboard").get_data(as_text=True)
+        with app_client.session_transaction() as sess:
+            token = sess["_csrf_token"]
+        segunda = app_client.get("/dashboard").get_data(as_text=True)
+        assert f'content="{token}"' in segunda
+        assert segunda == primera
+
 
 # ── Test 2: API datos ────────────────────────────────────
 
@@ -154,6 +178,46 @@ class TestApiDatos:
         assert len(data["cursos"]) == 1
         assert len(data["cursos"][0]["estudiantes"]) == 2
 
+    def test_api_datos_recarga_si_cambia(self, app_client, json_file, sample_json_data):
+        """Si datos_procesados.json cambia en disco, /api/datos lo refleja."""
+        import os
+
+        app_client.get("/api/datos")
+        sample_json_data["metadata"]["total_cursos"] = 5
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(sample_json_data, f, ensure_ascii=False)
+        st = json_file.stat()
+        os.utime(json_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+        data = app_client.get("/api/datos").get_json()
+        assert data["metadata"]["total_cursos"] == 5
+
+    def test_api_datos_etag_304(self, app_client):
+        """Con If-None-Match igual al ETag, /api/datos retorna 304 sin cuerpo."""
+        first = app_client.get("/api/datos")
+        etag = first.headers.get("ETag")
+        assert etag
+
+        second = app_client.get("/api/datos", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.data == b""
+
+    def test_api_datos_gzip_precomprimido(self, app_client, json_file, sample_json_data):
+        """Si existe datos_procesados.json.gz al día, se envía comprimido."""
+        import gzip
+
+        gz_path = json_file.with_name(json_file.name + ".gz")
+        gz_path.write_bytes(gzip.compress(json_file.read_bytes()))
+
+        response = app_client.get("/api/datos", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert json.loads(gzip.decompress(response.data)) == sample_json_data
+
+        plano = app_client.get("/api/datos")
+        assert "Content-Encoding" not in plano.headers
+        assert plano.get_json() == sample_json_data
+
     def test_api_datos_sin_json(self, app_client_no_json):
         """Si no existe datos_procesados.json, retorna 404."""
         response = app_client_no_json.get("/api/datos")
@@ -181,6 +245,28 @@ class TestApiHealth:
         assert data["status"] == "ok"
         assert data["fecha_datos"] is None
 
+    def test_api_health_usa_sidecar(self, app_client, json_file):
+        """Health lee la fecha desde datos_meta.json sin parsear el JSON completo."""
+        (json_file.parent / "datos_meta.json").write_text(
+            json.dumps({"fecha_procesamiento": "2026-03-01T08:00:00"}), encoding="utf-8"
+        )
+        with patch("src.web.routes._get_datos_cached") as mock_cargar:
+            response = app_client.get("/api/health")
+        mock_cargar.assert_not_called()
+        assert response.get_json()["fecha_datos"] == "2026-03-01T08:00:00"
+
+    def test_api_health_sin_sidecar_no_parsea_todo(self, app_client):
+        """Sin sidecar, la fecha se toma del inicio del archivo."""
+        with patch("src.web.routes._get_datos_cached") as mock_cargar:
+            response = app_client.get("/api/health")
+        mock_cargar.assert_not_called()
+        assert response.get_json()["fecha_datos"] == "2026-02-10T23:37:18"
+
+    def test_api_health_cacheable(self, app_client):
+        """Health check permite caché pública de corta duración."""
+        response = app_client.get("/api/health")
+        assert response.headers["Cache-Control"] == "public, max-age=30"
+
 
 # ── Test 4: Enviar correo - validación ──────────────────
 
@@ -212,9 +298,9 @@ class TestApiEnviarCorreo:
         assert response.status_code == 400
         assert "cuerpo" in response.get_json()["error"].lower()
 
-    def test_envio_exitoso(self, app_client):
-        """POST /api/enviar-correo con datos válidos envía correo."""
-        with patch("src.reports.email_sender.enviar_correo") as mock_enviar:
+    def test_envio_exitoso(self, app_client, mail_executor):
+        """POST /api/enviar-correo con datos válidos encola el correo (202)."""
+        with patch("src.web.routes.enviar_correos_individuales") as mock_enviar:
             mock_enviar.return_value = {"status": "OK", "detalle": "Enviado"}
             response = app_client.post(
                 "/api/enviar-correo",
@@ -224,15 +310,17 @@ class TestApiEnviarCorreo:
                     "cuerpo": "Hola desde el dashboard",
                 },
             )
-        assert response.status_code == 200
+            mail_executor.shutdown(wait=True)
+        assert response.status_code == 202
         data = response.get_json()
-        assert data["status"] == "ok"
-        assert data["enviados"] == 2
+        assert data["status"] == "queued"
+        assert data["encolados"] == 2
         mock_enviar.assert_called_once()
+        assert mock_enviar.call_args.kwargs["destinatarios"] == ["juan@test.cl", "maria@test.cl"]
 
-    def test_envio_fallido(self, app_client):
-        """POST /api/enviar-correo con error retorna 500."""
-        with patch("src.reports.email_sender.enviar_correo") as mock_enviar:
+    def test_envio_fallido(self, app_client, mail_executor, caplog):
+        """Un error de envío en segundo plano queda registrado en el log."""
+        with patch("src.web.routes.enviar_correos_individuales") as mock_enviar:
             mock_enviar.return_value = {"status": "ERROR", "detalle": "Sin token"}
             response = app_client.post(
                 "/api/enviar-correo",
@@ -242,8 +330,69 @@ class TestApiEnviarCorreo:
                     "cuerpo": "Hola",
                 },
             )
-        assert response.status_code == 500
-        assert "error" in response.get_json()
+            mail_executor.shutdown(wait=True)
+        assert response.status_code == 202
+        assert "Sin token" in caplog.text
+
+    def test_estado_envio(self, app_client, mail_executor):
+        """GET /api/enviar-correo/<job_id> informa el resultado del envío."""
+        with patch("src.web.routes.enviar_correos_individuales") as mock_enviar:
+            mock_enviar.return_value = {"status": "ERROR", "detalle": "Sin token"}
+            response = app_client.post(
+                "/api/enviar-correo",
+                json={"destinatarios": ["juan@test.cl"], "asunto": "Test", "cuerpo": "Hola"},
+            )
+            mail_executor.shutdown(wait=True)
+
+        job_id = response.get_json()["job_id"]
+        assert response.headers["Location"].endswith(f"/api/enviar-correo/{job_id}")
+        estado = app_client.get(f"/api/enviar-correo/{job_id}").get_json()
+        assert estado["status"] == "ERROR"
+        assert estado["errores"] == ["Sin token"]
+        assert app_client.get("/api/enviar-correo/ffffffff").status_code == 404
+
+    def test_estado_envio_visible_desde_otro_worker(self, app_client, mail_executor):
+        """El estado se lee del archivo compartido, no de la memoria del worker."""
+        from src.web import routes
+
+        with patch("src.web.routes.enviar_correos_individuales") as mock_enviar:
+            mock_enviar.return_value = {"status": "OK", "detalle": "Enviado"}
+            job_id = app_client.post(
+                "/api/enviar-correo",
+                json={"destinatarios": ["juan@test.cl"], "asunto": "Test", "cuerpo": "Hola"},
+            ).get_json()["job_id"]
+            mail_executor.shutdown(wait=True)
+
+        assert routes._mail_status_path(job_id).exists()
+        estado = app_client.get(f"/api/enviar-correo/{job_id}").get_json()
+        assert estado == {"status": "OK", "job_id": job_id, "errores": []}
+
+    def test_purga_estados_envio_antiguos(self, tmp_path):
+        """Se borran los estados vencidos; uno ya borrado por otro worker se ignora."""
+        import os
+        from src.web import routes
+
+        salida = tmp_path / "output"
+        salida.mkdir()
+        viejo = salida / "mail_status_aaa.json"
+        reciente = salida / "mail_status_bbb.json"
+        viejo.write_bytes(b"{}")
+        reciente.write_bytes(b"{}")
+        vencido = routes.time.time() - routes.MAIL_STATUS_TTL - 60
+        os.utime(viejo, (vencido, vencido))
+
+        with patch("config.settings.OUTPUT_PATH", salida), \
+             patch.dict(routes._mail_prune, {"proxima": 0.0}):
+            routes._purgar_estados_mail()
+            assert not viejo.exists()
+            assert reciente.exists()
+
+            # Dentro del intervalo no se vuelve a recorrer el directorio
+            os.utime(reciente, (vencido, vencido))
+            routes._purgar_estados_mail()
+            assert reciente.exists()
+
+        assert routes._mtime_o_none(salida / "mail_status_ccc.json") is None
 
     def test_sin_json_body(self, app_client):
         """POST /api/enviar-correo sin body JSON retorna 400."""
@@ -254,6 +403,52 @@ class TestApiEnviarCorreo:
         )
         assert response.status_code == 400
 
+    def test_tipos_invalidos(self, app_client):
+        """Campos con tipos incorrectos retornan 400 (no 500)."""
+        response = app_client.post(
+            "/api/enviar-correo",
+            json={"destinatarios": "a@b.cl", "asunto": 1, "cuerpo": "Hola"},
+        )
+        assert response.status_code == 400
+        assert "tipos" in response.get_json()["error"].lower()
+
+    def test_email_invalido(self, app_client):
+        """Un destinatario o CC mal formado se rechaza antes de encolar."""
+        response = app_client.post(
+            "/api/enviar-correo",
+            json={"destinatarios": ["ok@test.cl"], "cc": ["sin arroba"],
+                  "asunto": "Test", "cuerpo": "Hola"},
+        )
+        assert response.status_code == 400
+        assert response.get_json()["error"] == "Email inválido: sin arroba"
+
+    def test_cuerpo_texto_a_html(self):
+        """El cuerpo se escapa y los saltos se convierten a párrafos/<br>."""
+        from src.web.routes import _texto_a_html
+
+        html = _texto_a_html("Hola <b>&</b>\nlinea\n\notro")
+        assert html == "<p>Hola &lt;b&gt;&amp;&lt;/b&gt;<br>linea</p><p>otro</p>"
+
+
+# ── Test 4b: Registro de rutas ──────────────────────────
+
+class TestRegistroRutas:
+    def test_rutas_sin_duplicados(self, app_client):
+        """Cada ruta y cada endpoint se registran una sola vez."""
+        rules = list(app_client.application.url_map.iter_rules())
+        firmas = [(r.rule, tuple(sorted(r.methods))) for r in rules]
+        assert len(firmas) == len(set(firmas))
+
+        # Un endpoint solo puede tener otra regla como alias con "/" final
+        rutas = defaultdict(set)
+        for r in rules:
+            rutas[r.endpoint].add(r.rule.rstrip("/") or "/")
+        assert {e: r for e, r in rutas.items() if len(r) > 1} == {}
+
+        endpoints = Counter(r.endpoint for r in rules)
+        for endpoint in ("api_refresh", "api_descargar_excel", "login"):
+            assert endpoints[endpoint] == 1, endpoint
+
 
 # ── Test 5: Security headers ────────────────────────────
 
@@ -272,13 +467,13 @@ class TestSecurityHeaders:
 # ── Test 6: Rate limiting ────────────────────────────────
 
 class TestRateLimiting:
-    def test_rate_limiting(self, app_client):
+    def test_rate_limiting(self, app_client, mail_executor):
         """Más de 10 envíos por minuto son rechazados con 429."""
         # Reset timestamps for clean test
         from src.web import routes
-        routes._email_timestamps.clear()
+        routes._window_state.clear()
 
-        with patch("src.reports.email_sender.enviar_correo") as mock_enviar:
+        with patch("src.web.routes.enviar_correos_individuales") as mock_enviar:
             mock_enviar.return_value = {"status": "OK", "detalle": "OK"}
 
             payload = {
@@ -290,14 +485,84 @@ class TestRateLimiting:
             # 10 envíos OK
             for i in range(10):
                 resp = app_client.post("/api/enviar-correo", json=payload)
-                assert resp.status_code == 200, f"Request {i+1} should succeed"
+                assert resp.status_code == 202, f"Request {i+1} should succeed"
 
             # El 11vo debe ser rechazado
             resp = app_client.post("/api/enviar-correo", json=payload)
             assert resp.status_code == 429
+            mail_executor.shutdown(wait=True)
 
         # Limpiar para no afectar otros tests
-        routes._email_timestamps.clear()
+        routes._window_state.clear()
+
+    def test_rate_limit_purga_ips_inactivas(self):
+        """La limpieza periódica elimina IPs sin envíos en la ventana."""
+        from src.web import routes
+        routes._window_state.clear()
+
+        routes._check_rate_limit("10.0.0.1")
+        routes._window_state["10.0.0.2"] = (0, 1, 0)  # ventana muy antigua
+        routes._purgar_ips_inactivas(routes.time.monotonic() + 2 * routes.RATE_LIMIT_WINDOW)
+
+        assert "10.0.0.1" not in routes._window_state
+        assert "10.0.0.2" not in routes._window_state
+
+    def test_rate_limit_concurrente(self):
+        """Con varios threads a la vez, nunca se admiten más de RATE_LIMIT_MAX."""
+        from concurrent.futures import ThreadPoolExecutor
+        from src.web import routes
+        routes._window_state.clear()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            resultados = list(pool.map(routes._check_rate_limit, ["10.0.0.7"] * 40))
+        assert resultados.count(False) == routes.RATE_LIMIT_MAX
+        routes._window_state.clear()
+
+    def test_rate_limit_tope_de_ips(self):
+        """Superado RATE_LIMIT_MAX_IPS se descarta la IP menos reciente."""
+        from src.web import routes
+        routes._window_state.clear()
+
+        with patch("src.web.routes.RATE_LIMIT_MAX_IPS", 2):
+            routes._check_rate_limit("10.0.0.1")
+            routes._check_rate_limit("10.0.0.2")
+            routes._check_rate_limit("10.0.0.1")
+            routes._check_rate_limit("10.0.0.3")
+        assert list(routes._window_state) == ["10.0.0.1", "10.0.0.3"]
+        routes._window_state.clear()
+
+    def test_rate_limit_ventana_anterior_pondera(self):
+        """Los envíos de la ventana anterior cuentan en proporción al solapamiento."""
+        from src.web import routes
+        routes._window_state.clear()
+
+        w = routes.RATE_LIMIT_WINDOW
+        with patch("src.web.routes.time.monotonic", return_value=100 * w + w / 2):
+            # 10 envíos en la ventana anterior → pesan 5 a mitad de la actual
+            routes._window_state["10.0.0.3"] = (99, 10, 0)
+            resultados = [routes._check_rate_limit("10.0.0.3") for _ in range(6)]
+        assert resultados == [False] * 5 + [True]
+        routes._window_state.clear()
+
+    def test_rate_limit_compartido_sqlite(self, tmp_path):
+        """Con RATE_LIMIT_DB_PATH el límite se comparte vía SQLite."""
+        from src.web import routes
+
+        db_path = tmp_path / "rate_limit.db"
+        with patch("config.settings.RATE_LIMIT_DB_PATH", db_path):
+            resultados = [routes._check_rate_limit("10.0.0.9") for _ in range(11)]
+            assert routes._check_rate_limit("10.0.0.10") is False
+
+            # Conexión reutilizada y sin DDL en las consultas siguientes
+            conn = routes._rate_limit_local.conn[1]
+            sentencias = []
+            conn.set_trace_callback(sentencias.append)
+            routes._check_rate_limit("10.0.0.10")
+            conn.set_trace_callback(None)
+            assert routes._rate_limit_local.conn[1] is conn
+        assert resultados == [False] * 10 + [True]
+        assert sentencias[0] == "BEGIN IMMEDIATE"
+        assert not any("CREATE" in s for s in sentencias)
 
 
 # ── Test 7: Dashboard carga datos vía fetch ──────────────